@@ -0,0 +1,57 @@
+"""Per-instance latency of a compiled Plan versus the process_schema path.
+
+Run with:
+
+    python benchmarks/bench_compile.py [--children N] [--number N]
+"""
+
+import argparse
+import logging
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import oasld  # noqa: E402
+from oasld import Instance, RefResolver, sample_schema  # noqa: E402
+
+
+def make_instance(children: int):
+    instance = dict(sample_schema["Person"]["example"])
+    # Instance.process_instance only merges the context of the first
+    # array entry, so nested objects are kept out of the children.
+    instance["children"] = [
+        {"email": f"mailto:child-{i}@example", "givenName": f"Child {i}"}
+        for i in range(children)
+    ]
+    return instance
+
+
+def process_schema_path(instance):
+    i = Instance(instance, sample_schema["Person"])
+    i.safe_mode = False
+    i.process_instance(resolver=RefResolver(sample_schema))
+    return i.ld
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--children", type=int, default=10)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    logging.getLogger("oasld").setLevel(logging.WARNING)
+
+    instance = make_instance(args.children)
+    plan = oasld.compile(sample_schema, "Person")
+
+    for label, fn in (
+        ("process_schema", lambda: process_schema_path(instance)),
+        ("plan.annotate", lambda: plan.annotate(instance)),
+    ):
+        best = min(timeit.repeat(fn, number=args.number, repeat=5))
+        print(f"{label:>16}: {best / args.number * 1e6:10.2f} us/instance")
+
+
+if __name__ == "__main__":
+    main()
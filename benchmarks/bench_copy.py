@@ -0,0 +1,77 @@
+"""Time and peak memory of annotating a large payload with and without copies.
+
+Run with:
+
+    python benchmarks/bench_copy.py [--size-mb N]
+"""
+
+import argparse
+import gc
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import oasld  # noqa: E402
+from oasld import Instance, RefResolver, sample_schema  # noqa: E402
+
+
+def make_instance(size_mb: int):
+    instance = dict(sample_schema["Person"]["example"])
+    child = {
+        "givenName": "Child",
+        "familyName": "Smith",
+        "description": "x" * 200,
+        "tags": ["a", "b", "c"],
+    }
+    n = size_mb * 2**20 // len(json.dumps(child))
+    instance["children"] = [
+        dict(deepcopy(child), email=f"mailto:child-{i}@example") for i in range(n)
+    ]
+    return instance
+
+
+def instance_deepcopy(instance):
+    i = Instance(instance, sample_schema["Person"])
+    i.safe_mode = False
+    i.process_instance(resolver=RefResolver(sample_schema))
+    return i.ld
+
+
+def measure(fn, instance):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(instance)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=10)
+    args = parser.parse_args()
+    logging.getLogger("oasld").setLevel(logging.WARNING)
+
+    instance = make_instance(args.size_mb)
+    plan = oasld.compile(sample_schema, "Person")
+    print(f"payload: {len(json.dumps(instance)) / 2**20:.1f} MB")
+
+    for label, fn in (
+        ("Instance (deepcopy)", instance_deepcopy),
+        ("plan.annotate", plan.annotate),
+        ("plan.annotate inplace", lambda x: plan.annotate(x, inplace=True)),
+    ):
+        elapsed, peak = measure(fn, instance)
+        print(f"{label:>22}: {elapsed * 1e3:9.1f} ms, peak {peak / 2**20:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
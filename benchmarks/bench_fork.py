@@ -0,0 +1,117 @@
+"""Unique memory of pre-fork worker processes, with and without a Registry.
+
+Each worker annotates an instance of every schema, runs a full
+garbage collection, as a long-running worker eventually does,
+and reports its unique set size (USS): the memory that is not
+shared with the other processes. Linux only.
+
+Run with:
+
+    python benchmarks/bench_fork.py [--copies N] [--workers N]
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks import synthetic  # noqa: E402
+from benchmarks.bench_load import make_schemas  # noqa: E402
+from oasld.registry import Registry  # noqa: E402
+
+
+def unique_memory(pid="self") -> int:
+    """Return the USS of a process in bytes, from /proc/<pid>/smaps_rollup."""
+    uss = 0
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        name, _, value = line.partition(":")
+        if name in ("Private_Clean", "Private_Dirty"):
+            uss += int(value.split()[0]) * 1024
+    return uss
+
+
+def make_instances(copies: int):
+    """Return {schema reference: instance} for the root schema
+    of each copy of the synthetic shapes in `make_schemas`.
+
+    The instances are small, so that the memory of the workers
+    is mostly the one of the schemas and of the Plans.
+    """
+    instances = {}
+    for copy in range(copies):
+        for name, (depth, width, fanout, cyclic) in synthetic.SHAPES.items():
+            root = "Node" if cyclic else "L0"
+            ref = f"#/components/schemas/{name.replace('-', '')}{copy}{root}"
+            instances[ref] = synthetic.instance(min(depth, 2), width, min(fanout, 2))
+    return instances
+
+
+def worker(copies: int, registry: Registry, instances) -> int:
+    """Annotate the instances and return the USS of the worker."""
+    if registry is None:
+        # Without a registry, each worker builds its own Plans.
+        oas = make_schemas(copies)
+        registry = Registry(oas, instances, safe_mode=False)
+    for ref, instance in instances.items():
+        json.dumps(registry.plan(ref).annotate(instance))
+    gc.collect()
+    return unique_memory()
+
+
+def fork_workers(workers: int, copies: int, registry, instances):
+    """Return the USS of each forked worker."""
+    children = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        if (pid := os.fork()) == 0:
+            os.close(read)
+            try:
+                os.write(write, str(worker(copies, registry, instances)).encode())
+            finally:
+                os._exit(0)
+        os.close(write)
+        children.append((pid, read))
+    ret = []
+    for pid, read in children:
+        with os.fdopen(read) as fp:
+            ret.append(int(fp.read() or 0))
+        os.waitpid(pid, 0)
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--mode", choices=("off", "shared", "frozen"), nargs="+", default=None
+    )
+    args = parser.parse_args()
+    logging.getLogger("oasld").setLevel(logging.ERROR)
+
+    oas = make_schemas(args.copies)
+    instances = make_instances(args.copies)
+    modes = args.mode or ("off", "shared", "frozen")
+    print(f"{len(oas['components']['schemas'])} schemas, {len(instances)} plans")
+    for mode in modes:
+        registry = None
+        if mode != "off":
+            registry = Registry(oas, instances, safe_mode=False)
+            if mode == "frozen":
+                registry.freeze()
+        uss = fork_workers(args.workers, args.copies, registry, instances)
+        if registry is not None and registry.frozen:
+            gc.unfreeze()
+        print(
+            f"{mode:>8}: {sum(uss) / len(uss) / 2**20:8.1f} MiB unique per worker,"
+            f" {sum(uss) / 2**20:8.1f} MiB for {len(uss)} workers"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Cold versus warm load time of a large schema file.
+
+Run with:
+
+    python benchmarks/bench_load.py [--copies N] [--number N]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import oasld.loader  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+
+
+def make_schemas(copies: int):
+    """Return an OAS document with `copies` renamed copies of the synthetic shapes."""
+    components = {}
+    for copy in range(copies):
+        for name, (depth, width, fanout, cyclic) in synthetic.SHAPES.items():
+            schemas, _ = synthetic.level_schemas(
+                depth, width, cyclic=cyclic, arrays=bool(fanout)
+            )
+            prefix = f"{name.replace('-', '')}{copy}"
+            text = yaml.safe_dump(schemas).replace(
+                "#/", f"#/components/schemas/{prefix}"
+            )
+            for schema_name, schema in yaml.safe_load(text).items():
+                components[f"{prefix}{schema_name}"] = schema
+    return {"openapi": "3.0.0", "components": {"schemas": components}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger("oasld").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Keep the schema cache out of the user cache directory.
+        os.environ["XDG_CACHE_HOME"] = tmpdir
+        path = Path(tmpdir) / "schemas.yaml"
+        path.write_text(yaml.safe_dump(make_schemas(args.copies)))
+        cache_path = oasld.loader._schema_cache_path(path)
+        print(f"{path.stat().st_size / 2**20:.1f} MiB of YAML")
+
+        def cold():
+            cache_path.unlink(missing_ok=True)
+            oasld.load_schemas(path)
+
+        for label, fn in (
+            ("yaml.safe_load", lambda: yaml.safe_load(path.read_text())),
+            ("load_schemas (no cache)", lambda: oasld.load_schemas(path, cache=False)),
+            ("load_schemas (cold)", cold),
+            ("load_schemas (warm)", lambda: oasld.load_schemas(path)),
+        ):
+            best = min(timeit.repeat(fn, number=args.number, repeat=3))
+            print(f"{label:>24}: {best / args.number * 1e3:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
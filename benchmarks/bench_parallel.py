@@ -0,0 +1,71 @@
+"""Scaling of annotate_parallel with the number of worker processes.
+
+Run with:
+
+    python benchmarks/bench_parallel.py [--records N] [--chunk-size N]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import oasld  # noqa: E402
+from oasld import sample_schema  # noqa: E402
+
+
+def make_instances(records: int):
+    birthplace = sample_schema["BirthPlace"]["example"]
+    for i in range(records):
+        yield {
+            "email": f"mailto:person-{i}@example",
+            "givenName": f"Name {i}",
+            "familyName": "Smith",
+            "birthplace": dict(birthplace),
+            "children": [{"email": f"mailto:child-{i}-{j}@example"} for j in range(3)],
+        }
+
+
+def consume(documents):
+    count = 0
+    for count, _ in enumerate(documents, 1):
+        pass
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    logging.getLogger("oasld").setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    consume(oasld.annotate_many(make_instances(args.records), "Person", sample_schema))
+    baseline = time.perf_counter() - start
+    print(f"{'in-process':>12}: {args.records / baseline:10.0f} records/s")
+
+    for jobs in args.jobs:
+        start = time.perf_counter()
+        consume(
+            oasld.annotate_parallel(
+                make_instances(args.records),
+                "Person",
+                sample_schema,
+                jobs=jobs,
+                chunk_size=args.chunk_size,
+            )
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"{f'{jobs} workers':>12}: {args.records / elapsed:10.0f} records/s"
+            f" (x{baseline / elapsed:.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Per-instance latency of Plan.triples versus the JSON-LD to rdflib route.
+
+Run with:
+
+    python benchmarks/bench_triples.py [--number N]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import timeit
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import oasld  # noqa: E402
+from oasld import sample_schema  # noqa: E402
+
+
+def jsonld_route(plan, instance):
+    from rdflib import Graph
+
+    g = Graph()
+    g.parse(data=json.dumps(plan.annotate(instance)), format="application/ld+json")
+    return g
+
+
+def triples_route(plan, instance):
+    from rdflib import Graph
+
+    g = Graph()
+    for triple in plan.triples(instance):
+        g.add(triple)
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+    logging.getLogger("oasld").setLevel(logging.WARNING)
+    warnings.simplefilter("ignore")
+
+    instance = sample_schema["Person"]["example"]
+    plan = oasld.compile(sample_schema, "Person")
+
+    for label, fn in (
+        ("JSON-LD + rdflib", lambda: jsonld_route(plan, instance)),
+        ("plan.triples + rdflib", lambda: triples_route(plan, instance)),
+        ("plan.to_ntriples", lambda: plan.to_ntriples(instance)),
+    ):
+        best = min(timeit.repeat(fn, number=args.number, repeat=5))
+        print(f"{label:>22}: {best / args.number * 1e6:10.2f} us/instance")
+
+
+if __name__ == "__main__":
+    main()
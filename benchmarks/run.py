@@ -0,0 +1,296 @@
+"""Benchmark the annotation, context merging and RDF conversion hot paths.
+
+Run the suite and save the results:
+
+    python benchmarks/run.py run --output results.json [-k FILTER]
+
+Compare two runs, exiting with 1 if any benchmark is slower
+than the baseline by more than the threshold:
+
+    python benchmarks/run.py compare baseline.json results.json [--threshold 1.2]
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import timeit
+import warnings
+from copy import deepcopy
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import oasld  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+from oasld import Counters, CountersTracer, Instance, RefResolver  # noqa: E402
+from oasld.columnar import ColumnarPlan, records_to_columns  # noqa: E402
+from oasld.export import export_ntriples  # noqa: E402
+from oasld.patch import PatchPlan  # noqa: E402
+from oasld.reverse import compile_reverse  # noqa: E402
+from oasld.validate import compile_validating  # noqa: E402
+from oasld.writer import WriterPlan  # noqa: E402
+
+
+def process_instance(schemas, schema_name, instance, tracer=None):
+    resolver = RefResolver(schemas)
+    ref = schema_name[1:] if schema_name.startswith("#") else f"/{schema_name}"
+    schema = resolver.resolve(ref)
+
+    def run():
+        i = Instance(instance, schema, tracer=tracer)
+        i.safe_mode = False
+        i.process_instance(resolver=resolver)
+        return i.ld
+
+    return run
+
+
+def jsonld_rdflib(ld):
+    from rdflib import Graph
+
+    data = json.dumps(ld)
+
+    def run():
+        g = Graph()
+        g.parse(data=data, format="application/ld+json")
+        return g
+
+    return run
+
+
+def two_pass(schemas, schema_name, plan, instance):
+    """Validate with jsonschema, then annotate."""
+    import jsonschema
+
+    resolver = RefResolver(schemas)
+    ref = schema_name[1:] if schema_name.startswith("#") else f"/{schema_name}"
+    validator = jsonschema.Draft4Validator(
+        resolver.resolve(ref), resolver=jsonschema.RefResolver.from_schema(schemas)
+    )
+
+    def run():
+        errors = list(validator.iter_errors(instance))
+        return plan.annotate(instance), errors
+
+    return run
+
+
+def reverse_graph(schemas, schema_name, plan, instance):
+    """Map the graph of the instance back to the instance."""
+    from rdflib import Graph
+
+    reverse = compile_reverse(schemas, schema_name, safe_mode=False)
+    graph = Graph()
+    for t in plan.triples(instance):
+        graph.add(t)
+
+    def run():
+        return reverse.from_graph(graph)
+
+    return run
+
+
+def export(plan, instance, records: int = 10):
+    """Export many copies of the instance as N-Triples."""
+    import io
+
+    instances = [instance] * records
+
+    def run():
+        return export_ntriples(instances, io.StringIO(), plan=plan)
+
+    return run
+
+
+def batch(plan, instance, records: int = 1000):
+    """Return the row-wise and the columnar conversion
+    of many copies of a flat instance, each with its own @id."""
+    rows = [dict(instance, id=f"https://example.org/n{i}") for i in range(records)]
+    columns = records_to_columns(rows)
+    columnar = ColumnarPlan(plan)
+
+    def row_wise():
+        return [t for row in rows for t in plan.triples(row)]
+
+    return row_wise, lambda: columnar.triples(columns)
+
+
+def patch(plan, instance):
+    """Return the re-annotation of a document after replacing
+    a property of its root."""
+    patcher = PatchPlan(plan)
+    document = plan.annotate(instance)
+    operations = [{"op": "replace", "path": "/p0", "value": "changed"}]
+    return lambda: patcher.apply(document, operations)
+
+
+def cases():
+    """Yield (name, callable) for each benchmark."""
+    for shape, schemas, schema_name, instance in synthetic.shapes():
+        plan = oasld.compile(schemas, schema_name, safe_mode=False)
+        validating = compile_validating(schemas, schema_name, safe_mode=False)
+        yield f"process_instance[{shape}]", process_instance(
+            schemas, schema_name, instance
+        )
+        yield f"process_instance.traced[{shape}]", process_instance(
+            schemas, schema_name, instance, tracer=CountersTracer(Counters())
+        )
+        yield f"plan.annotate[{shape}]", lambda p=plan, i=instance: p.annotate(i)
+        yield f"plan.annotate.pruned[{shape}]", lambda p=plan, i=instance: (
+            p.annotate(i, prune_context=True)
+        )
+        yield f"write.two_step[{shape}]", lambda p=plan, i=instance: json.dumps(
+            p.annotate(i)
+        ).encode()
+        yield f"write.fused[{shape}]", lambda w=WriterPlan(plan), i=instance: w.dumps(i)
+        yield f"deepcopy[{shape}]", lambda i=instance: deepcopy(i)
+        yield f"compile[{shape}]", lambda s=schemas, n=schema_name: oasld.compile(
+            s, n, safe_mode=False
+        )
+        yield f"plan.triples[{shape}]", lambda p=plan, i=instance: p.triples(i)
+        yield f"validate.two_pass[{shape}]", two_pass(
+            schemas, schema_name, plan, instance
+        )
+        yield f"validate.single_pass[{shape}]", lambda p=validating, i=instance: (
+            p.annotate_errors(i)
+        )
+        yield f"reverse.from_graph[{shape}]", reverse_graph(
+            schemas, schema_name, plan, instance
+        )
+        yield f"export.ntriples[{shape}]", export(plan, instance)
+        yield f"patch.replace[{shape}]", patch(plan, instance)
+        if shape == "flat":
+            row_wise, columnar = batch(plan, instance)
+            yield f"batch.row_wise[{shape}]", row_wise
+            yield f"batch.columnar[{shape}]", columnar
+        yield f"resolve.cold[{shape}]", lambda s=schemas, n=schema_name: RefResolver(
+            s
+        ).resolve(f"/{n}")
+        resolver = RefResolver(schemas)
+        yield f"resolve.warm[{shape}]", lambda r=resolver, n=schema_name: r.resolve(
+            f"/{n}"
+        )
+
+    for fixture, schemas, schema_name, example in synthetic.fixtures():
+        try:
+            process_instance(schemas, schema_name, example)()
+            plan = oasld.compile(schemas, schema_name, safe_mode=False)
+            validating = compile_validating(schemas, schema_name, safe_mode=False)
+        except Exception:
+            # Skip the examples that the current code cannot process.
+            continue
+        yield f"process_instance[{fixture}]", process_instance(
+            schemas, schema_name, example
+        )
+        yield f"plan.annotate[{fixture}]", lambda p=plan, i=example: p.annotate(i)
+        yield f"jsonld_rdflib[{fixture}]", jsonld_rdflib(plan.annotate(example))
+        yield f"plan.triples[{fixture}]", lambda p=plan, i=example: p.triples(i)
+        yield f"validate.two_pass[{fixture}]", two_pass(
+            schemas, schema_name, plan, example
+        )
+        yield f"validate.single_pass[{fixture}]", lambda p=validating, i=example: (
+            p.annotate_errors(i)
+        )
+
+
+def measure(fn, repeat: int, min_time: float):
+    timer = timeit.Timer(fn)
+    number = 1
+    while (elapsed := timer.timeit(number)) < min_time / 10:
+        number *= 2
+    number = max(1, int(number * min_time / elapsed))
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run(args) -> int:
+    logging.getLogger("oasld").setLevel(logging.ERROR)
+    warnings.simplefilter("ignore")
+    results = {}
+    for name, fn in cases():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(fn, args.repeat, args.min_time)
+        print(f"{name:<60} {results[name]['min'] * 1e6:12.2f} us")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        return report_regressions(
+            json.loads(Path(args.baseline).read_text()), report, args.threshold
+        )
+    return 0
+
+
+def compare(baseline: dict, results: dict, threshold: float):
+    """Yield (name, baseline, current, ratio, regressed) for the common benchmarks."""
+    for name, current in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        old = baseline["results"][name]["min"]
+        ratio = current["min"] / old if old else float("inf")
+        yield name, old, current["min"], ratio, ratio > threshold
+
+
+def report_regressions(baseline: dict, results: dict, threshold: float) -> int:
+    regressions = 0
+    for name, old, new, ratio, regressed in compare(baseline, results, threshold):
+        regressions += regressed
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:<60} {old * 1e6:12.2f} {new * 1e6:12.2f} us x{ratio:5.2f} {flag}")
+    print(f"{regressions} regressions over threshold x{threshold}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("-o", "--output", help="Save the results in this file.")
+    run_parser.add_argument("-k", "--filter", help="Only run matching benchmarks.")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Seconds for each repeat."
+    )
+    run_parser.add_argument("--baseline", help="Compare with these results.")
+    compare_parser = subparsers.add_parser("compare", help="Compare two results.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    for p in (run_parser, compare_parser):
+        p.add_argument(
+            "--threshold",
+            type=float,
+            default=1.2,
+            help="Flag benchmarks slower than baseline * threshold.",
+        )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        return run(args)
+    return report_regressions(
+        json.loads(Path(args.baseline).read_text()),
+        json.loads(Path(args.results).read_text()),
+        args.threshold,
+    )
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
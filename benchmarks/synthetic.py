@@ -0,0 +1,109 @@
+"""Synthetic schemas and instances for the benchmarks.
+
+Shapes vary in depth (nested objects), width (scalar properties),
+array fan-out and cyclic `$ref`s. Instances only nest objects outside
+arrays, since Instance.process_instance only merges the context
+of the first entry of an array.
+"""
+
+import json
+from pathlib import Path
+
+import yaml
+
+ROOTDIR = Path(__file__).parent.parent
+
+
+def level_schemas(depth: int, width: int, cyclic: bool = False, arrays: bool = True):
+    """Return the schemas of a `depth`-levels tree, or a cyclic one.
+
+    Each level has `width` scalar properties, a `child` object
+    and, with `arrays`, `items`: an array of objects of the next level.
+    The compiled @context has a scoped entry for each path
+    in the schema, so `child` and `items` double it at each level.
+    """
+    names = ["Node"] if cyclic else [f"L{i}" for i in range(depth + 1)]
+    schemas = {}
+    for i, name in enumerate(names):
+        sub = names[0] if cyclic else names[min(i + 1, depth)]
+        properties = {f"p{j}": {"type": "string"} for j in range(width)}
+        if cyclic or i < depth:
+            properties["child"] = {"$ref": f"#/{sub}"}
+            if arrays:
+                properties["items"] = {
+                    "type": "array",
+                    "items": {"$ref": f"#/{sub}"},
+                }
+        schemas[name] = {
+            "type": "object",
+            "x-jsonld-type": name,
+            "x-jsonld-context": {
+                "@vocab": f"https://example.org/{name.lower()}/",
+                "id": "@id",
+                "items": {"@container": "@set"},
+            },
+            "properties": properties,
+        }
+    return schemas, names[0]
+
+
+def instance(
+    depth: int, width: int, fanout: int, in_array: bool = False, path: str = "n"
+):
+    """Return an instance of `level_schemas`.
+
+    Each node has an `id` IRI, so that its RDF graph has no blank nodes.
+    """
+    node = {"id": f"https://example.org/{path}"}
+    node.update({f"p{j}": f"value {j}" for j in range(width)})
+    if depth > 0:
+        if not in_array:
+            node["child"] = instance(depth - 1, width, fanout, path=f"{path}/child")
+        if fanout:
+            node["items"] = [
+                instance(depth - 1, width, fanout, in_array=True, path=f"{path}/{i}")
+                for i in range(fanout)
+            ]
+    return node
+
+
+SHAPES = {
+    # name: (depth, width, fanout, cyclic)
+    "flat": (0, 50, 0, False),
+    "deep": (20, 3, 0, False),
+    "wide-array": (1, 5, 200, False),
+    "fan-out": (4, 3, 5, False),
+    "cyclic": (8, 3, 2, True),
+}
+
+
+def shapes():
+    """Yield (name, schemas, schema_name, instance) for each shape."""
+    for name, (depth, width, fanout, cyclic) in SHAPES.items():
+        schemas, schema_name = level_schemas(
+            depth, width, cyclic=cyclic, arrays=bool(fanout)
+        )
+        yield name, schemas, schema_name, instance(depth, width, fanout)
+
+
+def fixtures():
+    """Yield (name, schemas, schema_name, example) for the examples
+    of schemas.yaml and tests/*.oas3.yaml with an x-jsonld-context."""
+    schemas = yaml.safe_load((ROOTDIR / "schemas.yaml").read_text())
+    for schema_name, schema in schemas.items():
+        if "example" in schema:
+            yield f"schemas.yaml:{schema_name}", schemas, schema_name, schema["example"]
+    for path in sorted((ROOTDIR / "tests").glob("*.oas3.yaml")):
+        document = yaml.safe_load(path.read_text())
+        for schema_name, schema in (
+            document.get("components", {}).get("schemas", {}).items()
+        ):
+            if schema.get("x-jsonld-context") and isinstance(
+                schema.get("example"), dict
+            ):
+                ref = f"#/components/schemas/{schema_name}"
+                yield f"{path.name}:{schema_name}", document, ref, schema["example"]
+
+
+def size(instance) -> int:
+    return len(json.dumps(instance))
@@ -0,0 +1,77 @@
+"""Annotate JSON instances with the JSON-LD keywords of their schemas.
+
+`import oasld` only loads the annotation core: the other names are
+imported from their modules on first use, e.g. `oasld.annotate_stream`.
+"""
+
+from .core import (
+    CTX,
+    ContextCache,
+    Counters,
+    CountersTracer,
+    Instance,
+    Plan,
+    RefResolutionError,
+    RefResolver,
+    Tracer,
+    TraversalLimitError,
+    annotate_many,
+    compile,
+    counters,
+    process_schema,
+)
+
+# The names imported on first use, by module.
+_LAZY = {
+    "Build": "build",
+    "SCHEMA_CACHE_VERSION": "loader",
+    "load_schemas": "loader",
+    "to_ntriples": "rdf",
+    "annotate_stream": "stream",
+    "annotate_parallel": "parallel",
+    "compile_validating": "validate",
+    "compile_reverse": "reverse",
+    "compile_columnar": "columnar",
+    "ContextPruner": "prune",
+    "export_ntriples": "export",
+    "export_store": "export",
+    "compile_patch": "patch",
+    "compile_writer": "writer",
+    "Registry": "registry",
+    "lint_files": "lint",
+    "main": "cli",
+    "sample_schema": "samples",
+    "schema_json": "samples",
+}
+
+__all__ = [
+    "CTX",
+    "ContextCache",
+    "Counters",
+    "CountersTracer",
+    "Instance",
+    "Plan",
+    "RefResolutionError",
+    "RefResolver",
+    "Tracer",
+    "TraversalLimitError",
+    "annotate_many",
+    "compile",
+    "counters",
+    "process_schema",
+    *_LAZY,
+]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f"{__name__}.{_LAZY[name]}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
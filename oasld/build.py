@@ -0,0 +1,345 @@
+"""Compile all the components of a set of schema files,
+recompiling only the ones affected by a change."""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .core import ContextCache, Plan, RefResolver, _canonical_json, compile
+from .loader import _read_yaml
+
+log = logging.getLogger(__name__)
+
+SCHEMA_SUFFIXES = (".yaml", ".yml", ".json")
+
+# A component is identified by its file and its reference,
+# e.g. ("api/person.yaml", "#/components/schemas/Person").
+Component = Tuple[str, str]
+
+
+def _escape(name: str) -> str:
+    return name.replace("~", "~0").replace("/", "~1")
+
+
+def _components(document) -> Dict[str, Dict]:
+    """Return the schemas of a document by reference: the
+    `components/schemas` of an OAS document, or the top-level entries.
+
+    The schemas defined inline in the paths of an OAS document
+    are not components: they are only compiled when referenced.
+    """
+    if not isinstance(document, dict):
+        return {}
+    if "components" in document or "openapi" in document:
+        schemas = (document.get("components") or {}).get("schemas") or {}
+        prefix = "#/components/schemas/"
+    else:
+        schemas, prefix = document, "#/"
+    return {
+        f"{prefix}{_escape(name)}": schema
+        for name, schema in schemas.items()
+        if isinstance(schema, dict)
+    }
+
+
+def _component_of(fragment: str) -> str:
+    """Return the reference of the component containing a JSON pointer."""
+    parts = fragment.lstrip("/").split("/")
+    if parts[:2] == ["components", "schemas"] and len(parts) > 2:
+        return "#/" + "/".join(parts[:3])
+    return f"#/{parts[0]}"
+
+
+def _refs(schema) -> Iterable[str]:
+    todo = [schema]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, list):
+            todo.extend(node)
+        elif isinstance(node, dict):
+            if isinstance(ref := node.get("$ref"), str):
+                yield ref
+            todo.extend(node.values())
+
+
+def _expand(paths: Iterable[str]) -> List[str]:
+    """Return the schema files in paths, searching the directories recursively."""
+    ret = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            ret.extend(
+                os.path.normpath(p)
+                for p in sorted(path.rglob("*"))
+                if p.suffix in SCHEMA_SUFFIXES and not p.name.startswith(".")
+            )
+        else:
+            ret.append(os.path.normpath(path))
+    return ret
+
+
+_worker_resolvers = {}
+
+
+def _compile_worker(root: str, refs: List[str], safe_mode: bool):
+    """Compile the components of a root file in a worker process."""
+    if (resolver := _worker_resolvers.get(root)) is None:
+        schema, _ = _read_yaml(Path(root))
+        resolver = _worker_resolvers[root] = RefResolver(schema, base_uri=root)
+    return [_compile_one(resolver, (root, ref), safe_mode, cache=None) for ref in refs]
+
+
+def _compile_one(resolver: RefResolver, component: Component, safe_mode, cache):
+    try:
+        plan = compile(
+            resolver.schema,
+            component[1],
+            safe_mode=safe_mode,
+            resolver=resolver,
+            cache=cache,
+        )
+        return component, plan, None
+    except Exception as e:
+        # Any error of a malformed schema is reported for its component only.
+        return component, None, f"{type(e).__name__}: {e}"
+
+
+class Build:
+    """Compile all the components of a set of schema files.
+
+    Each file listed in `paths`, or found in their directories,
+    is a root: all its components are compiled into a Plan,
+    whose @context is in `cache`.
+    Files referenced via `$ref` are loaded, but their components
+    are only compiled if they are roots too.
+
+    The `$ref` dependencies between the components are tracked,
+    so that `update()` only recompiles the components affected by a change.
+
+    :param paths: schema files or directories.
+    :param jobs: the number of worker processes compiling the components.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        safe_mode: bool = True,
+        base_url: str = "",
+        jobs: int = 1,
+    ) -> None:
+        self.paths = list(paths)
+        self.safe_mode = safe_mode
+        self.jobs = jobs
+        self.cache = ContextCache(base_url=base_url)
+        self.resolvers: Dict[str, RefResolver] = {}
+        # The files loaded by each root, and their (mtime_ns, size, sha256).
+        self.sources: Dict[str, Dict[str, Tuple]] = {}
+        self.hashes: Dict[Component, str] = {}
+        self.dependencies: Dict[Component, Set[Component]] = {}
+        self.plans: Dict[Component, Plan] = {}
+        self.errors: Dict[Component, str] = {}
+
+    def _load(self, root: str) -> None:
+        schema, source = _read_yaml(Path(root))
+        resolver = RefResolver(schema, base_uri=root)
+        resolver.sources[""] = source
+        resolver.preload()
+        self.resolvers[root] = resolver
+        base = Path(root).parent
+        self.sources[root] = {
+            root if url == "" else os.path.normpath(base / url): source
+            for url, source in resolver.sources.items()
+        }
+
+    def _index(self) -> Set[Component]:
+        """Hash the components of all the loaded files and
+        find their dependencies. Return the changed components."""
+        hashes, dependencies = {}, {}
+        for root, resolver in self.resolvers.items():
+            base = Path(root).parent
+            for url, document in resolver.documents.items():
+                path = root if url == "" else os.path.normpath(base / url)
+                for ref, schema in _components(document).items():
+                    if (component := (path, ref)) in hashes:
+                        continue
+                    hashes[component] = hashlib.sha256(
+                        _canonical_json(schema).encode()
+                    ).hexdigest()
+                    dependencies[component] = {
+                        (
+                            path if not ref_url else os.path.normpath(base / ref_url),
+                            _component_of(fragment),
+                        )
+                        for ref_url, _, fragment in (
+                            r.partition("#") for r in _refs(schema)
+                        )
+                    } - {component}
+        changed = {
+            c
+            for c in hashes.keys() | self.hashes.keys()
+            if hashes.get(c) != self.hashes.get(c)
+        }
+        self.hashes, self.dependencies = hashes, dependencies
+        return changed
+
+    def dependents(self, components: Iterable[Component]) -> Set[Component]:
+        """Return the components and all the ones depending on them."""
+        reverse = defaultdict(set)
+        for component, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                reverse[dependency].add(component)
+        todo, ret = list(components), set(components)
+        while todo:
+            for dependent in reverse[todo.pop()] - ret:
+                ret.add(dependent)
+                todo.append(dependent)
+        return ret
+
+    def _compile(self, components: Iterable[Component]) -> None:
+        components = sorted(c for c in components if c[0] in self.resolvers)
+        if self.jobs > 1 and len(components) > 1:
+            results = self._compile_parallel(components)
+        else:
+            results = (
+                _compile_one(self.resolvers[c[0]], c, self.safe_mode, cache=self.cache)
+                for c in components
+            )
+        for component, plan, error in results:
+            self.plans.pop(component, None)
+            self.errors.pop(component, None)
+            if error:
+                self.errors[component] = error
+                continue
+            # Share the @context of the plans compiled by the workers.
+            plan._context = self.cache.add(plan.fingerprint, plan._context)
+            self.plans[component] = plan
+
+    def _compile_parallel(self, components: List[Component]):
+        from concurrent.futures import ProcessPoolExecutor
+
+        by_root = defaultdict(list)
+        for root, ref in components:
+            by_root[root].append(ref)
+        # Split the components of each root in about `jobs` chunks.
+        size = max(1, len(components) // self.jobs)
+        with ProcessPoolExecutor(self.jobs) as executor:
+            futures = [
+                executor.submit(
+                    _compile_worker,
+                    root,
+                    refs[i : i + size],  # noqa: E203
+                    self.safe_mode,
+                )
+                for root, refs in by_root.items()
+                for i in range(0, len(refs), size)
+            ]
+            for future in futures:
+                yield from future.result()
+
+    def build(self) -> Set[Component]:
+        """Compile all the components, and return them."""
+        self.resolvers.clear()
+        for root in _expand(self.paths):
+            self._load(root)
+        self._index()
+        self.plans.clear()
+        self.errors.clear()
+        components = {c for c in self.hashes if c[0] in self.resolvers}
+        self._compile(components)
+        return components
+
+    def changed_files(self) -> Set[str]:
+        """Return the files that changed since they were loaded,
+        including the new and the removed roots."""
+        changed = set(_expand(self.paths)) ^ set(self.resolvers)
+        for sources in self.sources.values():
+            for path, (mtime_ns, size, digest) in sources.items():
+                try:
+                    stat = os.stat(path)
+                    if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+                        continue
+                    with open(path, "rb") as fp:
+                        if hashlib.sha256(fp.read()).hexdigest() == digest:
+                            continue
+                except OSError:
+                    pass
+                changed.add(path)
+        return changed
+
+    def update(self, files: Iterable[str] = None) -> Set[Component]:
+        """Reload the changed files, and recompile the components
+        affected by the change. Return the recompiled components.
+
+        :param files: the changed files, by default `changed_files()`.
+        """
+        files = set(self.changed_files() if files is None else files)
+        if not files:
+            return set()
+        roots = set(_expand(self.paths))
+        for root in list(self.resolvers):
+            if root not in roots:
+                del self.resolvers[root], self.sources[root]
+            elif files & set(self.sources[root]):
+                self._load(root)
+        for root in roots - set(self.resolvers):
+            self._load(root)
+
+        affected = {
+            c
+            for c in self.dependents(self._index())
+            if c in self.hashes and c[0] in self.resolvers
+        }
+        for component in list(self.plans) + list(self.errors):
+            if component not in self.hashes or component[0] not in self.resolvers:
+                self.plans.pop(component, None)
+                self.errors.pop(component, None)
+        self._compile(affected)
+        return affected
+
+    def watch(self, interval: float = 1.0, callback=None) -> None:
+        """Poll the files for changes every `interval` seconds, and update.
+
+        :param callback: called with the recompiled components.
+        """
+        while True:
+            time.sleep(interval)
+            try:
+                components = self.update()
+            except Exception as e:
+                log.error("Cannot update: %s", e)
+                continue
+            if components and callback:
+                callback(components)
+
+    def index(self) -> Dict:
+        """Return the @context URL or the error of each component, by file."""
+        ret = defaultdict(dict)
+        for (path, ref), plan in self.plans.items():
+            ret[path][ref] = (
+                {"context": self.cache.url(plan.fingerprint)}
+                if plan._context is not None
+                else {}
+            )
+        for (path, ref), error in self.errors.items():
+            ret[path][ref] = {"error": error}
+        return {path: dict(sorted(refs.items())) for path, refs in sorted(ret.items())}
+
+    def save(self, directory: str) -> List[Path]:
+        """Write the @context documents of the compiled components
+        and their `index.json` in directory."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for fingerprint in sorted({p.fingerprint for p in self.plans.values()}):
+            if self.cache[fingerprint] is None:
+                continue
+            path = directory / f"{fingerprint}.jsonld"
+            path.write_text(json.dumps(self.cache.document(fingerprint), indent=2))
+            paths.append(path)
+        index = directory / "index.json"
+        index.write_text(json.dumps(self.index(), indent=2))
+        return paths + [index]
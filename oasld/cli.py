@@ -0,0 +1,217 @@
+"""The oasld command line."""
+
+from typing import List
+
+from .core import ContextCache, RefResolver, compile
+from .loader import _load_yaml
+from .stream import annotate_stream
+
+
+def _cli_annotate(args) -> int:
+    import sys
+
+    schemas = _load_yaml(args.schemas)
+    fp_in = sys.stdin if args.input == "-" else open(args.input)
+    fp_out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        annotate_stream(
+            fp_in,
+            fp_out,
+            schemas,
+            args.schema_name,
+            items_property=args.items_property,
+            input_format=args.input_format,
+            output_format=args.output_format,
+            safe_mode=not args.unsafe,
+            jobs=args.jobs,
+            chunk_size=args.chunk_size,
+            context_url=args.context_url,
+            resolver=RefResolver(schemas, base_uri=args.schemas),
+        )
+    finally:
+        for fp in (fp_in, fp_out):
+            if fp not in (sys.stdin, sys.stdout):
+                fp.close()
+    return 0
+
+
+def _cli_context(args) -> int:
+    schemas = _load_yaml(args.schemas)
+    cache = ContextCache(base_url=args.base_url)
+    resolver = RefResolver(schemas, base_uri=args.schemas)
+    for schema_name in args.schema_names:
+        plan = compile(
+            schemas,
+            schema_name,
+            safe_mode=not args.unsafe,
+            resolver=resolver,
+            cache=cache,
+        )
+        print(schema_name, cache.url(plan.fingerprint))
+    cache.save(args.output_dir)
+    return 0
+
+
+def _cli_build(args) -> int:
+    from .build import Build
+
+    def report(components):
+        for path, ref in sorted(components):
+            error = build.errors.get((path, ref))
+            print(f"{path}{ref}", error or "ok")
+        build.save(args.output_dir)
+
+    build = Build(
+        args.paths, safe_mode=not args.unsafe, base_url=args.base_url, jobs=args.jobs
+    )
+    report(build.build())
+    if args.watch:
+        try:
+            build.watch(args.interval, callback=report)
+        except KeyboardInterrupt:
+            pass
+    return 1 if build.errors and not args.watch else 0
+
+
+def _cli_export(args) -> int:
+    import sys
+
+    from .export import export_ntriples
+    from .stream import _read_instances
+
+    schemas = _load_yaml(args.schemas)
+    plan = compile(
+        schemas,
+        args.schema_name,
+        safe_mode=not args.unsafe,
+        resolver=RefResolver(schemas, base_uri=args.schemas),
+    )
+    fp_in = sys.stdin if args.input == "-" else open(args.input)
+    fp_out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        instances = _read_instances(
+            fp_in, args.input_format, args.items_property, 2**16
+        )
+        stats = export_ntriples(instances, fp_out, plan=plan, graph=args.graph)
+    finally:
+        for fp in (fp_in, fp_out):
+            if fp not in (sys.stdin, sys.stdout):
+                fp.close()
+    print(stats, file=sys.stderr)
+    return 0
+
+
+def _cli_lint(args) -> int:
+    from .lint import lint_files
+
+    findings = lint_files(args.paths)
+    for finding in findings:
+        print(finding)
+    return 1 if findings else 0
+
+
+def main(argv: List[str] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="oasld", description="Annotate JSON instances using OAS schemas."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    annotate = subparsers.add_parser(
+        "annotate", help="Annotate a JSON collection using the schema of its entries."
+    )
+    annotate.set_defaults(func=_cli_annotate)
+    annotate.add_argument("schemas", help="A YAML or JSON file with the schemas.")
+    annotate.add_argument(
+        "schema_name", help="The schema name, or a reference like #/components/..."
+    )
+    annotate.add_argument("-i", "--input", default="-", help="Defaults to stdin.")
+    annotate.add_argument("-o", "--output", default="-", help="Defaults to stdout.")
+    annotate.add_argument("--input-format", choices=("json", "ndjson"), default="json")
+    annotate.add_argument("--output-format", choices=("json", "ndjson"), default="json")
+    annotate.add_argument(
+        "--items-property", help="Annotate the array in this property of the input."
+    )
+    annotate.add_argument(
+        "-j", "--jobs", type=int, default=1, help="The number of worker processes."
+    )
+    annotate.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="The number of entries sent at once to a worker.",
+    )
+    annotate.add_argument(
+        "--context-url",
+        help="Reference the @context by this URL instead of embedding it.",
+    )
+
+    context = subparsers.add_parser(
+        "context",
+        help="Write the @context documents of the schemas, named by their fingerprint.",
+    )
+    context.set_defaults(func=_cli_context)
+    context.add_argument("schemas", help="A YAML or JSON file with the schemas.")
+    context.add_argument("schema_names", nargs="+")
+    context.add_argument("--base-url", default="", help="Where to publish them.")
+    context.add_argument("-o", "--output-dir", default=".")
+
+    build = subparsers.add_parser(
+        "build",
+        help="Write the @context documents of all the components, and their index.json.",
+    )
+    build.set_defaults(func=_cli_build)
+    build.add_argument("paths", nargs="+", help="Schema files or directories.")
+    build.add_argument("--base-url", default="", help="Where to publish them.")
+    build.add_argument("-o", "--output-dir", default=".")
+    build.add_argument(
+        "-j", "--jobs", type=int, default=1, help="The number of worker processes."
+    )
+    build.add_argument(
+        "--watch",
+        action="store_true",
+        help="Rebuild the components affected by a change of the files.",
+    )
+    build.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="How often --watch checks the files, in seconds.",
+    )
+
+    export = subparsers.add_parser(
+        "export",
+        help="Write the triples of a JSON collection as N-Triples, or N-Quads.",
+    )
+    export.set_defaults(func=_cli_export)
+    export.add_argument("schemas", help="A YAML or JSON file with the schemas.")
+    export.add_argument(
+        "schema_name", help="The schema name, or a reference like #/components/..."
+    )
+    export.add_argument("-i", "--input", default="-", help="Defaults to stdin.")
+    export.add_argument("-o", "--output", default="-", help="Defaults to stdout.")
+    export.add_argument("--input-format", choices=("json", "ndjson"), default="json")
+    export.add_argument(
+        "--items-property", help="Export the array in this property of the input."
+    )
+    export.add_argument(
+        "--graph",
+        help="Write N-Quads, naming the graph of each entry with this template,"
+        " e.g. urn:example:entry:{}, formatted with the entry index.",
+    )
+
+    lint = subparsers.add_parser(
+        "lint",
+        help="Check the x-jsonld-* keywords of the schemas, reporting all the findings.",
+    )
+    lint.set_defaults(func=_cli_lint)
+    lint.add_argument("paths", nargs="+", help="Schema files or directories.")
+
+    for subparser in (annotate, context, build, export):
+        subparser.add_argument(
+            "--unsafe",
+            action="store_true",
+            help="Skip nested contexts conflicting with the super-schema instead of failing.",
+        )
+    args = parser.parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,269 @@
+"""Convert batches of flat records to RDF a column at a time.
+
+The predicate, datatype and @base of each column are resolved once
+per ColumnarPlan, and each distinct value once per batch,
+instead of walking a dict per record. The records of a oneOf/anyOf
+schema are split by branch, and the columns of each branch are
+resolved in its type-scoped context.
+"""
+
+from typing import Dict, List, Tuple
+
+from .core import ContextCache, Plan, RefResolver, _Node, compile
+from .rdf import _ActiveContext, _TripleEmitter, to_ntriples
+
+_MISSING = object()
+_SCALARS = (str, int, float, bool)
+
+
+class _Column:
+    """How the values of a column are converted, resolved once."""
+
+    __slots__ = ("key", "predicate", "term", "active", "child")
+
+    def __init__(self, key: str, active: _ActiveContext, root) -> None:
+        self.key = key
+        self.predicate, self.term, self.active = active.property(key)
+        self.child = root.children.get(key)
+
+    def objects(self, values: List, emitter: _TripleEmitter) -> List:
+        """Return the object of each value: None, an object,
+        or a tuple of objects for the arrays."""
+        term, active, child = self.term, self.active, self.child
+        value, cache = emitter.value, {}
+        ret = []
+        append = ret.append
+        for v in values:
+            if v is None:
+                append(None)
+            elif type(v) in _SCALARS:
+                key = (type(v), v)
+                if (o := cache.get(key, _MISSING)) is _MISSING:
+                    o = cache[key] = value(v, term, active, child)
+                append(o)
+            elif isinstance(v, list) and term.type != "@json":
+                if term.container == "@list":
+                    append(emitter.list(v, term, active, child))
+                else:
+                    append(tuple(emitter.values(v, term, active, child)))
+            else:
+                append(value(v, term, active, child))
+        return ret
+
+    def subjects(self, values: List, emitter: _TripleEmitter) -> List:
+        """Return the subject of each @id, None if it is not an IRI,
+        or _MISSING if it is not a string."""
+        cache = {}
+        ret = []
+        for v in values:
+            if not isinstance(v, str):
+                ret.append(_MISSING)
+            elif (o := cache.get(v, _MISSING)) is _MISSING:
+                o = cache[v] = emitter.iri(self.active.expand(v, relative=True))
+                ret.append(o)
+            else:
+                ret.append(o)
+        return ret
+
+
+class _Branch:
+    """The columns of the records of a node, resolved once."""
+
+    __slots__ = ("node", "active", "types", "columns")
+
+    def __init__(self, node: _Node, active: _ActiveContext) -> None:
+        self.node = node
+        # The rdf:type of the schema, replacing the @type of the records.
+        self.types = None
+        if jtype := node.jtype:
+            o = None
+            if isinstance(jtype, str):
+                o = _TripleEmitter().iri(
+                    active.expand(jtype, vocab=True, relative=True)
+                )
+            self.types = () if o is None else (o,)
+            active = active.typed([jtype])
+        self.active = active
+        self.columns = {}
+
+    def column(self, key: str) -> _Column:
+        if (column := self.columns.get(key)) is None:
+            column = self.columns[key] = _Column(key, self.active, self.node)
+        return column
+
+
+class ColumnarPlan:
+    """Emit the triples of a batch of records given as columns.
+
+    The triples are the ones of `Plan.triples` for each record.
+    For flat records, they are also in the same order and the blank nodes
+    are created in the same order.
+    Create it with `compile_columnar()`.
+    """
+
+    def __init__(self, plan: Plan) -> None:
+        self.plan = plan
+        self._active = _ActiveContext().merge(plan._context)
+        self._branches = {}
+        self._root = self.branch(plan._root)
+
+    @property
+    def schema_name(self) -> str:
+        return self.plan.schema_name
+
+    @property
+    def fingerprint(self) -> str:
+        return self.plan.fingerprint
+
+    def column(self, key: str) -> _Column:
+        return self._root.column(key)
+
+    def branch(self, node: _Node) -> _Branch:
+        if (branch := self._branches.get(node)) is None:
+            branch = self._branches[node] = _Branch(node, self._active)
+        return branch
+
+    def _batches(self, columns: Dict, size: int) -> List[Tuple]:
+        """Return the (branch, row indexes, columns) of the records
+        of each oneOf/anyOf branch, or of all the records."""
+        root = self.plan._root
+        if root.variants is None or (key := root.variants[0]) not in columns:
+            return [(self._root, None, columns)]
+        rows = {}
+        for i, v in enumerate(columns[key]):
+            rows.setdefault(root.select({key: v}), []).append(i)
+        if len(rows) == 1:
+            return [(self.branch(next(iter(rows))), None, columns)]
+        return [
+            (
+                self.branch(node),
+                indexes,
+                {k: [v[i] for i in indexes] for k, v in columns.items()},
+            )
+            for node, indexes in rows.items()
+        ]
+
+    def _types_of(self, values: List, emitter: _TripleEmitter, cache: Dict) -> List:
+        """Return the tuple of rdf:type objects of each @type value."""
+        ret = []
+        for v in values:
+            types = []
+            for t in v if isinstance(v, list) else [v]:
+                if not isinstance(t, str):
+                    continue
+                if (o := cache.get(t, _MISSING)) is _MISSING:
+                    o = cache[t] = emitter.iri(
+                        self._active.expand(t, vocab=True, relative=True)
+                    )
+                if o is not None:
+                    types.append(o)
+            ret.append(tuple(types))
+        return ret
+
+    def triples(self, columns: Dict, bnode=None) -> List[Tuple]:
+        """Return the rdflib triples of the records.
+
+        :param columns: a dict of {property: values}, where the values
+            are lists, or arrays with a `tolist()` method like the ones
+            of NumPy, pandas or `array`. Missing values are None.
+        :param bnode: see `Plan.triples`.
+        """
+        emitter = _TripleEmitter(bnode)
+        columns = {
+            k: v.tolist() if hasattr(v, "tolist") else list(v)
+            for k, v in columns.items()
+        }
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        size = lengths.pop() if lengths else 0
+
+        type_cache = {}
+        # The converted batch of each record, and its index in the batch.
+        rows = [None] * size
+        for branch, indexes, batch in self._batches(columns, size):
+            converted = self._convert(branch, batch, emitter, type_cache)
+            for j, i in enumerate(range(size) if indexes is None else indexes):
+                rows[i] = (converted, j)
+        subjects = []
+        for (ids, _, _, _), j in rows:
+            s = ids[j]
+            subjects.append(emitter.BNode() if s is None or s is _MISSING else s)
+
+        triples = emitter.triples
+        append = triples.append
+        rdf_type = emitter.rdf_type
+        for ((_, row_types, types, values), j), subject in zip(rows, subjects):
+            if row_types is None:
+                row_types = types[j] if types else ()
+            for t in row_types:
+                append((subject, rdf_type, t))
+            for predicate, objects in values:
+                o = objects[j]
+                if o is None:
+                    continue
+                if type(o) is tuple:
+                    for item in o:
+                        append((subject, predicate, item))
+                else:
+                    append((subject, predicate, o))
+        return triples
+
+    def _convert(
+        self, branch: _Branch, columns: Dict, emitter: _TripleEmitter, type_cache
+    ) -> Tuple:
+        """Return the subjects, the rdf:type of the schema or None,
+        the rdf:types of each record and the (predicate, objects)
+        of the columns of a batch of records."""
+        ids, types, values = None, None, []
+        for k, v in columns.items():
+            column = branch.column(k)
+            predicate = column.predicate
+            if predicate == "@id":
+                # Like Plan.triples, the last @id wins.
+                subjects = column.subjects(v, emitter)
+                ids = (
+                    subjects
+                    if ids is None
+                    else [s if s is not _MISSING else i for s, i in zip(subjects, ids)]
+                )
+            elif predicate == "@type":
+                if branch.types is None:
+                    row_types = self._types_of(v, emitter, type_cache)
+                    types = (
+                        row_types
+                        if types is None
+                        else [a + b for a, b in zip(types, row_types)]
+                    )
+            elif predicate is not None:
+                values.append((predicate, column.objects(v, emitter)))
+        if ids is None:
+            ids = [None] * len(next(iter(columns.values()), ()))
+        return ids, branch.types, types, values
+
+    def to_ntriples(self, columns: Dict, graph=None) -> str:
+        """Return the N-Triples of the records, or their N-Quads in graph."""
+        return to_ntriples(self.triples(columns), graph=graph)
+
+
+def records_to_columns(records: List[Dict]) -> Dict[str, List]:
+    """Return the columns of a list of records, with None for missing values."""
+    keys = {}
+    for record in records:
+        keys.update(dict.fromkeys(record))
+    return {k: [record.get(k) for record in records] for k in keys}
+
+
+def compile_columnar(
+    schemas: Dict,
+    schema_name: str,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    cache: ContextCache = None,
+) -> ColumnarPlan:
+    """Compile a schema into a ColumnarPlan, see `compile()` for the parameters."""
+    return ColumnarPlan(
+        compile(
+            schemas, schema_name, safe_mode=safe_mode, resolver=resolver, cache=cache
+        )
+    )
@@ -0,0 +1,248 @@
+"""Flatten the allOf, oneOf and anyOf compositions of the schemas.
+
+Composed schemas are flattened once, at compile time, into views:
+schemas with the merged `properties`, `x-jsonld-context` and
+`x-jsonld-type` of their allOf members. Like sub-entries, the keywords
+of a schema take precedence, and the ones of its members are
+integrated when they are not already present: different values
+for the same term are conflicts. The x-jsonld-type of a schema
+overrides the ones of its members, which conflict when they differ.
+Two members declaring the same property conflict when its schemas
+differ in `type` or in any x-jsonld-* keyword.
+
+Each oneOf and anyOf branch is flattened together with the rest
+of the schema. The view of the schema has the properties of all
+the branches, but only the context of the schema: the compiler scopes
+the context of each branch to its x-jsonld-type, so that the branches
+can map the same property to different IRIs, and the x-jsonld-type
+of a branch overrides the one of the schema. The branch of an instance
+is selected by the value of a discriminator property: the OAS
+`discriminator`, or a property with a different `const` or
+single-valued `enum` in each branch.
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+_COMPOSITIONS = ("allOf", "oneOf", "anyOf", "discriminator")
+# The keywords merged by _Flattener.merge, the other ones are kept
+# when they are not already present.
+_MERGED = ("properties", "required", "x-jsonld-context", "x-jsonld-type")
+
+
+class _Flattener:
+    """Flatten the schemas visited by a compiler.
+
+    :param compiler: a `_Compiler`, resolving the `$ref`s
+        and handling the conflicts.
+    """
+
+    def __init__(self, compiler) -> None:
+        self.compiler = compiler
+        self.views = {}
+        # The discriminator property and the branch views by value, by view id.
+        self.variants: Dict[int, Tuple[str, Dict]] = {}
+        # The branch views, by view id.
+        self.branches: Dict[int, List[Dict]] = {}
+        self.pending = set()
+
+    def resolve(self, schema):
+        if isinstance(schema, dict) and isinstance(ref := schema.get("$ref"), str):
+            return self.compiler.resolver.resolve(ref.strip("#"))
+        return schema
+
+    def view(self, schema, where: Tuple[str, ...] = ()) -> Dict:
+        """Return the flattened view of schema, or schema
+        if it is not composed."""
+        if not isinstance(schema, dict) or not any(k in schema for k in _COMPOSITIONS):
+            return schema
+        if (ret := self.views.get(id(schema))) is not None:
+            return ret
+        if id(schema) in self.pending:
+            # A cyclic composition, e.g. a base schema mapping its subclasses.
+            return schema
+        self.pending.add(id(schema))
+        try:
+            ret = self._view(schema, where)
+        finally:
+            self.pending.discard(id(schema))
+        self.views[id(schema)] = ret
+        return ret
+
+    def _view(self, schema: Dict, where: Tuple[str, ...]) -> Dict:
+        members = [
+            self.view(self.resolve(m), where)
+            for m in schema.get("allOf", ())
+            if isinstance(m, dict)
+        ]
+        base = self.merge([schema, *members], where)
+        branches = [
+            (m, self.resolve(m))
+            for key in ("oneOf", "anyOf")
+            for m in schema.get(key, ())
+            if isinstance(m, dict)
+        ]
+        discriminator = schema.get("discriminator")
+        if not isinstance(discriminator, dict):
+            discriminator = {}
+        mapping = {
+            value: self.resolve({"$ref": ref})
+            for value, ref in (discriminator.get("mapping") or {}).items()
+            if isinstance(ref, str)
+        }
+        if not branches and not mapping:
+            return base
+
+        # The view of each branch, by the id of its schema.
+        views = {}
+        for _, branch in branches:
+            views[id(branch)] = self.merge(
+                [base, self.view(branch, where)], where, scoped=True
+            )
+        for target in mapping.values():
+            if id(target) not in views and id(target) not in self.pending:
+                views[id(target)] = self.view(target, where)
+        ret = self.merge([base, *views.values()], where, union=True)
+        self.branches[id(ret)] = list(views.values())
+        if lookup := self._lookup(discriminator, branches, mapping, views):
+            self.variants[id(ret)] = lookup
+        return ret
+
+    @staticmethod
+    def _lookup(discriminator: Dict, branches, mapping, views) -> Optional[Tuple]:
+        """Return (property, {value: branch view}), or None."""
+        if key := discriminator.get("propertyName"):
+            lookup = {}
+            for value, target in mapping.items():
+                if id(target) in views:
+                    lookup[value] = views[id(target)]
+            for member, branch in branches:
+                # Without a mapping, the value is the name of the schema.
+                if isinstance(ref := member.get("$ref"), str):
+                    lookup.setdefault(ref.rsplit("/", 1)[-1], views[id(branch)])
+            return key, lookup
+        # A property with a different constant value in each branch.
+        branch_views = [views[id(branch)] for _, branch in branches]
+        if not branch_views:
+            return None
+        for key in branch_views[0].get("properties", {}):
+            lookup = {}
+            for view in branch_views:
+                value = _constant(view.get("properties", {}).get(key))
+                if value is None or value in lookup:
+                    break
+                lookup[value] = view
+            else:
+                return key, lookup
+        return None
+
+    def merge(
+        self, schemas: List[Dict], where, union: bool = False, scoped: bool = False
+    ) -> Dict:
+        """Merge schemas, the first ones taking precedence.
+
+        :param union: merge alternative branches: only their properties
+            are merged, and their schemas are not conflicts.
+        :param scoped: merge a schema with one of its branches: the context
+            of the branch is scoped to its type, so its terms take precedence.
+        """
+        ret, properties, required = {}, {}, []
+        context, jtype = None, None
+        # The x-jsonld-type of the schema, or of the branch when scoped,
+        # takes precedence over the ones of the members.
+        owner = schemas[-1 if scoped else 0] if schemas else {}
+        for i, schema in enumerate(schemas):
+            for k, v in schema.items():
+                if k not in _MERGED and k not in _COMPOSITIONS:
+                    ret.setdefault(k, v)
+            for k, v in (schema.get("properties") or {}).items():
+                if k not in properties:
+                    properties[k] = v
+                elif not union and not self._same(properties[k], v):
+                    self._conflict(
+                        f"Conflicting schemas for property {k}", where + (k,)
+                    )
+            required.extend(
+                k for k in schema.get("required") or () if k not in required
+            )
+            if union and i:
+                # The branches have their own x-jsonld-type and context.
+                continue
+            v = None if schema is owner else schema.get("x-jsonld-type")
+            if v and v != jtype:
+                if jtype is None:
+                    jtype = v
+                else:
+                    self._conflict(
+                        f"Conflicting x-jsonld-type: {jtype!r} and {v!r}", where
+                    )
+            if v := schema.get("x-jsonld-context"):
+                if scoped and i and isinstance(context, dict) and isinstance(v, dict):
+                    context = {**context, **v}
+                else:
+                    context = self._merge_context(context, v, where)
+        if properties:
+            ret["properties"] = properties
+            ret.setdefault("type", "object")
+        if required:
+            ret["required"] = required
+        if context is not None:
+            ret["x-jsonld-context"] = context
+        jtype = owner.get("x-jsonld-type") or jtype
+        if jtype is not None:
+            ret["x-jsonld-type"] = jtype
+        return ret
+
+    def _same(self, a, b) -> bool:
+        """Return whether two property schemas annotate the same way."""
+        a, b = self.view(self.resolve(a)), self.view(self.resolve(b))
+        if a is b:
+            return True
+        if not isinstance(a, dict) or not isinstance(b, dict):
+            return a == b
+        if a.get("type") == b.get("type") == "array":
+            return self._same(a.get("items", {}), b.get("items", {}))
+        if "object" in (a.get("type"), b.get("type")):
+            return False
+        keys = {"type", *(k for k in (*a, *b) if k.startswith("x-jsonld-"))}
+        return all(a.get(k) == b.get(k) for k in keys)
+
+    def _merge_context(self, context, jcontext, where):
+        if context is None:
+            return dict(jcontext) if isinstance(jcontext, dict) else jcontext
+        if not isinstance(context, dict) or not isinstance(jcontext, dict):
+            if context != jcontext:
+                self.compiler.conflict(
+                    NotImplementedError(
+                        f"Possibly conflicting contexts between [{context}] and [{jcontext}]"
+                    ),
+                    where,
+                )
+            return context
+        for term, definition in jcontext.items():
+            if term not in context:
+                context[term] = definition
+            elif context[term] != definition:
+                self._conflict(f"Conflicting definitions of term {term}", where)
+        return context
+
+    def _conflict(self, message: str, where: Tuple[str, ...]) -> None:
+        if self.compiler.safe_mode:
+            self.compiler.conflict(ValueError(message), where)
+        else:
+            log.warning("%s, keeping the first one.", message)
+
+
+def _constant(schema):
+    """Return the constant value of a property schema, or None."""
+    if not isinstance(schema, dict):
+        return None
+    if "const" in schema:
+        value = schema["const"]
+    elif isinstance(enum := schema.get("enum"), list) and len(enum) == 1:
+        value = enum[0]
+    else:
+        return None
+    return value if isinstance(value, (str, int, bool)) else None
@@ -0,0 +1,1023 @@
+"""The annotation core: resolving references, annotating instances
+and compiling schemas into reusable Plans.
+
+This module only imports what the annotation needs:
+the loaders, the RDF engine and the parallel helpers
+are in their own modules.
+"""
+
+import hashlib
+import json
+import logging
+import posixpath
+import threading
+from collections import defaultdict
+from copy import deepcopy
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import unquote
+
+CTX = "@context"
+
+log = logging.getLogger(__name__)
+
+
+class RefResolutionError(LookupError):
+    pass
+
+
+class TraversalLimitError(ValueError):
+    pass
+
+
+class RefResolver:
+    """Resolve and cache `$ref`s.
+
+    Resolved references are cached by their string, and external
+    files are loaded once: a resolver can be shared between threads.
+
+    :param schema: the document resolving local references, e.g. "#/Person".
+    :param base_uri: the path of the schema file or of its directory,
+        used to load external references, e.g. "other.yaml#/Person".
+        An existing directory is used as is, even with a dotted name
+        like "api.v2"; other paths with a suffix are the schema file.
+    """
+
+    def __init__(self, schema: Dict, base_uri: str = ".") -> None:
+        self.schema = schema
+        self.base_path = Path(base_uri)
+        if self.base_path.suffix and not self.base_path.is_dir():
+            self.base_path = self.base_path.parent
+        self.documents = {"": schema}
+        # The (mtime_ns, size, sha256) of the loaded files, by url.
+        self.sources = {}
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def __getstate__(self) -> Dict:
+        # Resolvers are sent to worker processes without their lock.
+        with self.lock:
+            return {k: v for k, v in self.__dict__.items() if k != "lock"}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def cache_info(self) -> Dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.cache)}
+
+    def resolve(self, ref: str):
+        """Resolve a reference.
+
+        :param ref: either a JSON pointer in the local document, e.g. "/Person",
+            or a reference to an external file, e.g. "other.yaml#/Person".
+            A reference without "#" and without a leading "/" is the URL
+            of a whole external file, e.g. "other.yaml".
+        """
+        with self.lock:
+            try:
+                ret = self.cache[ref]
+                self.hits += 1
+                return ret
+            except KeyError:
+                self.misses += 1
+            if "#" in ref:
+                url, fragment = ref.split("#", 1)
+            elif ref.startswith("/") or not ref:
+                url, fragment = "", ref
+            else:
+                url, fragment = ref, ""
+            ret = self.cache[ref] = self.resolve_pointer(self.document(url), fragment)
+            return ret
+
+    def document(self, url: str) -> Dict:
+        if url not in self.documents:
+            from .loader import _read_yaml
+
+            try:
+                document, self.sources[url] = _read_yaml(self.base_path / url)
+            except OSError as e:
+                raise RefResolutionError(f"Cannot load {url}") from e
+            self.documents[url] = _rebase_refs(document, url)
+        return self.documents[url]
+
+    def preload(self) -> None:
+        """Load all the external files and resolve all the `$ref`s
+        reachable from the schema, skipping the unresolvable ones."""
+        todo, seen = list(self.documents.values()), set()
+        while todo:
+            node = todo.pop()
+            if isinstance(node, list):
+                todo.extend(node)
+            elif isinstance(node, dict) and id(node) not in seen:
+                seen.add(id(node))
+                if isinstance(ref := node.get("$ref"), str):
+                    try:
+                        todo.append(self.resolve(ref.strip("#")))
+                    except RefResolutionError:
+                        log.debug("Cannot resolve %s", ref)
+                todo.extend(node.values())
+
+    @staticmethod
+    def resolve_pointer(document, fragment: str):
+        fragment = unquote(fragment).lstrip("/")
+        parts = fragment.split("/") if fragment else []
+        for part in parts:
+            part = part.replace("~1", "/").replace("~0", "~")
+            if isinstance(document, list):
+                try:
+                    part = int(part)
+                except ValueError:
+                    pass
+            try:
+                document = document[part]
+            except (TypeError, LookupError):
+                raise RefResolutionError(f"Unresolvable JSON pointer: {fragment!r}")
+        return document
+
+
+def _rebase_refs(document, url: str):
+    """Make the references in an external document relative
+    to the base path, so that they can be shared with the cache."""
+    todo = [document]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, list):
+            todo.extend(node)
+        elif isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str):
+                ref_url, _, fragment = ref.partition("#")
+                if ref_url:
+                    ref_url = posixpath.normpath(
+                        posixpath.join(posixpath.dirname(url), ref_url)
+                    )
+                else:
+                    ref_url = url
+                node["$ref"] = f"{ref_url}#{fragment}"
+            todo.extend(node.values())
+    return document
+
+
+def _copy_json(instance):
+    """Copy the dicts and lists of a JSON value without recursion,
+    preserving the shared entries like deepcopy."""
+    if not isinstance(instance, (dict, list)):
+        return instance
+    copies = {id(instance): type(instance)()}
+    todo = [(instance, copies[id(instance)])]
+    while todo:
+        src, dst = todo.pop()
+        for k, v in src.items() if isinstance(src, dict) else enumerate(src):
+            if isinstance(v, (dict, list)):
+                if (copy := copies.get(id(v))) is None:
+                    copy = copies[id(v)] = type(v)()
+                    todo.append((v, copy))
+                v = copy
+            if isinstance(dst, dict):
+                dst[k] = v
+            else:
+                dst.append(v)
+    return copies[id(instance)]
+
+
+class Tracer:
+    """Receive the instrumentation events of the annotation.
+
+    The default methods do nothing: subclasses override the events
+    they are interested in. Schemas are identified by `name`,
+    that is the `$ref` of the schema, or its x-jsonld-type.
+    """
+
+    def resolve(self, ref: str, hit: bool, seconds: float) -> None:
+        """A `$ref` was resolved, from the resolver cache if `hit`."""
+
+    def merge_context(self, name: str) -> None:
+        """The x-jsonld-context of a schema was merged in the @context."""
+
+    def property(self, name: str, key: str, seconds: float) -> None:
+        """The sub-entry `key` of an instance was annotated."""
+
+    def instance(self, name: str, seconds: float, size: int) -> None:
+        """An instance with `size` entries was annotated."""
+
+
+class Counters:
+    """A thread-safe registry of counters and timings."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+
+    def add(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.values[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a timing as `{name}.count`, `{name}.seconds` and `{name}.max`."""
+        with self.lock:
+            self.values[f"{name}.count"] += 1
+            self.values[f"{name}.seconds"] += seconds
+            self.values[f"{name}.max"] = max(self.values[f"{name}.max"], seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            return dict(self.values)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+
+counters = Counters()
+
+
+class CountersTracer(Tracer):
+    """Export the instrumentation events to a Counters registry,
+    by default the module-level `counters`."""
+
+    def __init__(self, registry: Counters = None) -> None:
+        self.registry = counters if registry is None else registry
+
+    def resolve(self, ref, hit, seconds):
+        self.registry.add("resolve.hits" if hit else "resolve.misses")
+        self.registry.observe(f"resolve[{ref}]", seconds)
+
+    def merge_context(self, name):
+        self.registry.add(f"context.merges[{name}]")
+
+    def property(self, name, key, seconds):
+        self.registry.observe(f"property[{name}.{key}]", seconds)
+
+    def instance(self, name, seconds, size):
+        self.registry.observe(f"instance[{name}]", seconds)
+        self.registry.add(f"instance.size[{name}]", size)
+
+
+class Instance:
+    NO_CONTEXT = object()
+
+    def __init__(
+        self,
+        instance: Dict,
+        schema: Dict,
+        context: Dict = None,
+        parent: "Instance" = None,
+        inplace: bool = False,
+        tracer: Tracer = None,
+        name: str = None,
+    ) -> None:
+        """
+        :param tracer: receive the instrumentation events,
+            sub-entries use the tracer of their parent.
+        :param name: the name of the schema in the events,
+            by default its x-jsonld-type.
+        """
+        self.json_instance = instance
+        self.schema = schema
+        self.tracer = parent.tracer if parent else tracer
+        self.name = name or schema.get("x-jsonld-type") or "-"
+        # Only the root entry is copied, unless annotating in place.
+        self.ld = instance if parent is not None or inplace else _copy_json(instance)
+        self.parent = parent
+        self.safe_mode = self.parent.safe_mode if self.parent else True
+        if jtype := schema.get("x-jsonld-type"):
+            self.ld["@type"] = jtype
+
+        self.jcontext = schema.get("x-jsonld-context", {})
+
+        if context is Instance.NO_CONTEXT:
+            # Explicitly skipping context merge.
+            self.subentry_context_ref = Instance.NO_CONTEXT
+            return
+        if self.jcontext and self.tracer is not None:
+            self.tracer.merge_context(self.name)
+        if self.jcontext and not self.is_subentry:
+            # Initialize.
+            self.subentry_context_ref = {CTX: deepcopy(self.jcontext)}
+        else:
+            self.subentry_context_ref = self.merge_context(
+                self.jcontext, context, self.safe_mode
+            )
+
+    @staticmethod
+    def merge_context(jcontext, context, safe_mode: bool):
+        """Merge the x-jsonld-context of a sub-entry into the
+        context of its property, and return the latter."""
+        if not jcontext:
+            return context
+        if CTX in context or ():
+            if safe_mode:
+                raise ValueError(
+                    "Cannot overwrite a @context defined in the super-schema"
+                )
+            else:
+                log.warning("Skipping nested context because it is already defined.")
+        elif isinstance(context, dict):
+            # Merge in the passed context
+            context[CTX] = deepcopy(jcontext)
+        elif isinstance(context, str):
+            if isinstance(jcontext, dict):
+                log.warning(
+                    "The parent entry defines a string context, while the child has a dict context"
+                )
+            raise NotImplementedError(
+                f"Possibly conflicting contexts between the instance [{jcontext}] and its parent [{context}]"
+            )
+        else:
+            raise NotImplementedError("An sub-entry MUST have a context")
+        return context
+
+    def is_decontext(self):
+        return self.subentry_context_ref is Instance.NO_CONTEXT
+
+    @property
+    def is_subentry(self):
+        return self.parent is not None
+
+    def resolve(self, resolver: RefResolver, ref: str):
+        if self.tracer is None:
+            return resolver.resolve(ref.strip("#"))
+        misses = resolver.misses
+        start = perf_counter()
+        ret = resolver.resolve(ref.strip("#"))
+        self.tracer.resolve(ref, resolver.misses == misses, perf_counter() - start)
+        return ret
+
+    def subentry(self, ld, schema: Dict, context, name: str, depth: int) -> "_Frame":
+        """Return the traversal frame of a sub-entry:
+        it is the equivalent of a sub-entry Instance."""
+        name = name or schema.get("x-jsonld-type") or "-"
+        if jtype := schema.get("x-jsonld-type"):
+            ld["@type"] = jtype
+        jcontext = schema.get("x-jsonld-context", {})
+        if context is not Instance.NO_CONTEXT:
+            if jcontext and self.tracer is not None:
+                self.tracer.merge_context(name)
+            context = self.merge_context(jcontext, context, self.safe_mode)
+        frame = _Frame(ld, schema["properties"], jcontext, context, name, depth)
+        if self.tracer is not None:
+            frame.instance_start = perf_counter()
+        return frame
+
+    def process_instance(
+        self, resolver: RefResolver, max_depth: int = None, max_nodes: int = None
+    ):
+        """Annotate the instance, traversing its sub-entries
+        with an explicit stack instead of recursion.
+
+        :param max_depth: raise TraversalLimitError on sub-entries
+            nested deeper than this.
+        :param max_nodes: raise TraversalLimitError when annotating
+            more than this number of objects.
+        """
+        tracer = self.tracer
+        root = _Frame(
+            self.ld,
+            self.schema["properties"],
+            self.jcontext,
+            self.subentry_context_ref,
+            self.name,
+            0,
+        )
+        if tracer is not None:
+            root.instance_start = perf_counter()
+        nodes = 1
+        stack = [root]
+        while stack:
+            frame = stack[-1]
+            if frame.items is not None:
+                # Annotate the next entry of an array.
+                subinstance = next(frame.items, _END)
+                if subinstance is _END:
+                    frame.items = None
+                else:
+                    log.debug("Integrating context id %s", id(frame.subcontext))
+                    nodes = self._check_limits(frame, nodes, max_depth, max_nodes)
+                    stack.append(
+                        self.subentry(
+                            subinstance,
+                            frame.subschema,
+                            frame.subcontext,
+                            frame.subname,
+                            frame.depth + 1,
+                        )
+                    )
+                    # Only merge context for the first processing entry.
+                    # This can be somewhat limitative because the traversing process
+                    # depends on the subinstance properties and not on the ones
+                    # of the schema.
+                    frame.subcontext = Instance.NO_CONTEXT
+                    continue
+            if frame.key is not None:
+                # All the sub-entries of the property are annotated.
+                if tracer is not None:
+                    tracer.property(frame.name, frame.key, perf_counter() - frame.start)
+                frame.key = None
+
+            for k, v in frame.entries:
+                process_keywords = {"@context", "@type"} - set(
+                    frame.jcontext.get(k) or {}
+                )
+                property_schema = frame.properties.get(k, {})
+                log.debug(
+                    "Looking for %s on %s => %s", process_keywords, k, property_schema
+                )
+                if tracer is not None:
+                    frame.start = perf_counter()
+                name = None
+                if schema_ref := property_schema.get("$ref"):
+                    name = schema_ref
+                    property_schema = self.resolve(resolver, schema_ref)
+                if all(
+                    (
+                        property_schema.get("type") in ("object", "array"),
+                        process_keywords,
+                    )
+                ):
+                    frame.key = k
+                    if property_schema["type"] == "array":
+                        frame.subname = property_schema["items"]["$ref"]
+                        frame.subschema = self.resolve(resolver, frame.subname)
+                        frame.subcontext = (
+                            Instance.NO_CONTEXT
+                            if frame.context is Instance.NO_CONTEXT
+                            else frame.context[CTX][k]
+                        )
+                        frame.items = iter(v)
+                    elif property_schema["type"] == "object":
+                        subcontext = frame.context[CTX].setdefault(k, {})
+                        nodes = self._check_limits(frame, nodes, max_depth, max_nodes)
+                        stack.append(
+                            self.subentry(
+                                v, property_schema, subcontext, name, frame.depth + 1
+                            )
+                        )
+                    else:
+                        raise NotImplementedError
+                    break
+            else:
+                # All the properties are annotated.
+                stack.pop()
+                if frame is root and not self.is_subentry:
+                    self.ld[CTX] = self.subentry_context_ref[CTX]
+                if tracer is not None:
+                    tracer.instance(
+                        frame.name, perf_counter() - frame.instance_start, len(frame.ld)
+                    )
+
+    @staticmethod
+    def _check_limits(frame: "_Frame", nodes: int, max_depth, max_nodes) -> int:
+        if max_depth is not None and frame.depth >= max_depth:
+            raise TraversalLimitError(f"The instance is nested deeper than {max_depth}")
+        if max_nodes is not None and nodes >= max_nodes:
+            raise TraversalLimitError(f"The instance has more than {max_nodes} objects")
+        return nodes + 1
+
+
+_END = object()
+
+
+class _Frame:
+    """The traversal state of a single object in Instance.process_instance."""
+
+    __slots__ = (
+        "ld",
+        "properties",
+        "jcontext",
+        "context",
+        "name",
+        "depth",
+        "entries",
+        "key",
+        "start",
+        "instance_start",
+        "items",
+        "subschema",
+        "subcontext",
+        "subname",
+    )
+
+    def __init__(self, ld, properties, jcontext, context, name, depth) -> None:
+        self.ld = ld
+        self.properties = properties
+        self.jcontext = jcontext
+        self.context = context
+        self.name = name
+        self.depth = depth
+        self.entries = iter(ld.items())
+        # The property being annotated, and its array entries.
+        self.key = None
+        self.start = self.instance_start = 0.0
+        self.items = None
+
+
+def process_schema(schema_name, schemas, tracer: Tracer = None):
+    schema = schemas[schema_name]
+    example = schema["example"]
+    instance = Instance(example, schema, tracer=tracer, name=schema_name)
+    instance.safe_mode = False
+
+    resolver = RefResolver(schemas)
+    instance.process_instance(resolver=resolver)
+    return instance
+
+
+class _Node:
+    """The annotation actions of a single schema.
+
+    Nodes are shared between all the properties referencing
+    the same schema, so cyclic schemas produce cyclic nodes.
+    """
+
+    __slots__ = ("jtype", "actions", "children", "variants")
+
+    def __init__(self, jtype=None) -> None:
+        self.jtype = jtype
+        # A tuple of (property, is_array, _Node).
+        self.actions = ()
+        self.children = {}
+        # The discriminator property and the _Node of each of its values,
+        # for oneOf and anyOf compositions.
+        self.variants = None
+
+    def select(self, instance: Dict) -> "_Node":
+        """Return the node of the oneOf/anyOf branch of the instance,
+        or self."""
+        if self.variants is None:
+            return self
+        key, nodes = self.variants
+        value = instance.get(key)
+        if isinstance(value, (str, int, bool)):
+            return nodes.get(value, self)
+        return self
+
+    def apply(self, ld: Dict) -> None:
+        node = self if self.variants is None else self.select(ld)
+        if node.jtype:
+            ld["@type"] = node.jtype
+        for k, is_array, child in node.actions:
+            v = ld.get(k)
+            if is_array:
+                if isinstance(v, list):
+                    for item in v:
+                        if isinstance(item, dict):
+                            child.apply(item)
+            elif isinstance(v, dict):
+                child.apply(v)
+
+    def copy(self, instance: Dict) -> Dict:
+        """Like apply, but only copy the annotated entries,
+        sharing the rest of the instance."""
+        node = self if self.variants is None else self.select(instance)
+        ld = dict(instance)
+        if node.jtype:
+            ld["@type"] = node.jtype
+        for k, is_array, child in node.actions:
+            v = ld.get(k)
+            if is_array:
+                if isinstance(v, list):
+                    ld[k] = [
+                        child.copy(item) if isinstance(item, dict) else item
+                        for item in v
+                    ]
+            elif isinstance(v, dict):
+                ld[k] = child.copy(v)
+        return ld
+
+
+class Plan:
+    """A schema compiled once and reused to annotate many instances.
+
+    Create it with `compile()`.
+    """
+
+    __slots__ = (
+        "schema_name",
+        "fingerprint",
+        "_root",
+        "_context",
+        "_active",
+        "_pruner",
+    )
+
+    def __init__(
+        self, schema_name: str, root: _Node, context, fingerprint: str = None
+    ) -> None:
+        self.schema_name = schema_name
+        # A content hash of the schemas used to compile the Plan.
+        self.fingerprint = fingerprint
+        self._root = root
+        self._context = context
+        self._active = None
+        self._pruner = None
+
+    @property
+    def context(self):
+        """The merged @context fragment, or None for unannotated schemas."""
+        return deepcopy(self._context)
+
+    def annotate(
+        self,
+        instance: Dict,
+        inplace: bool = False,
+        with_context: bool = True,
+        context_url: str = None,
+        tracer: Tracer = None,
+        prune_context: bool = False,
+    ) -> Dict:
+        """Return the JSON-LD version of the instance.
+
+        The result shares with the instance all the entries
+        that are not annotated, and with the other results the @context:
+        callers must not modify them.
+
+        :param inplace: annotate the passed instance instead of a copy.
+        :param with_context: add the @context to the result.
+        :param context_url: reference the @context by this URL
+            instead of embedding it, see `ContextCache`.
+        :param tracer: receive the `Tracer.instance` event.
+        :param prune_context: embed only the terms of the @context
+            used by the instance, see `ContextPruner`.
+        """
+        if tracer is not None:
+            start = perf_counter()
+        if inplace:
+            ld = instance
+            self._root.apply(ld)
+        else:
+            ld = self._root.copy(instance)
+        if with_context and self._context is not None:
+            if prune_context and not context_url:
+                ld[CTX] = self.pruner.prune(ld)
+            else:
+                ld[CTX] = context_url or self._context
+        if tracer is not None:
+            tracer.instance(self.schema_name, perf_counter() - start, len(ld))
+        return ld
+
+    @property
+    def pruner(self):
+        """The `ContextPruner` of the @context, created on first use."""
+        if self._pruner is None:
+            from .prune import ContextPruner
+
+            self._pruner = ContextPruner(self._context)
+        return self._pruner
+
+    def triples(self, instance: Dict, bnode=None) -> List[Tuple]:
+        """Return the rdflib triples of the instance.
+
+        The triples are emitted directly from the instance and
+        the compiled @context, without JSON-LD expansion.
+
+        :param bnode: create the blank nodes instead of rdflib.BNode,
+            called with the label of the "_:" identifiers, if any.
+        """
+        from .rdf import _ActiveContext, _TripleEmitter
+
+        if self._active is None:
+            self._active = _ActiveContext().merge(self._context)
+        emitter = _TripleEmitter(bnode)
+        emitter.node(instance, self._root, self._active)
+        return emitter.triples
+
+    def to_ntriples(self, instance: Dict, graph=None) -> str:
+        """Return the N-Triples of the instance, or its N-Quads in graph."""
+        from .rdf import to_ntriples
+
+        return to_ntriples(self.triples(instance), graph=graph)
+
+
+class _Compiler:
+    def __init__(self, resolver: RefResolver, safe_mode: bool) -> None:
+        from .compose import _Flattener
+
+        self.resolver = resolver
+        self.safe_mode = safe_mode
+        self.nodes = {}
+        self.pending = set()
+        # The visited schemas, in a deterministic order.
+        self.schemas = []
+        self.flattener = _Flattener(self)
+        self.view = self.flattener.view
+
+    def subschemas(self, schema: Dict):
+        """Yield (property, is_array, subschema) for each sub-entry
+        that Instance.process_instance would descend into."""
+        jcontext = schema.get("x-jsonld-context") or {}
+        for k, property_schema in schema.get("properties", {}).items():
+            term = jcontext.get(k) if isinstance(jcontext, dict) else None
+            if not isinstance(term, dict):
+                term = None
+            if not {"@context", "@type"} - set(term or {}):
+                continue
+            if schema_ref := property_schema.get("$ref"):
+                property_schema = self.resolver.resolve(schema_ref.strip("#"))
+            property_schema = self.view(property_schema, (k,))
+            if property_schema.get("type") == "object":
+                yield k, False, property_schema
+            elif property_schema.get("type") == "array":
+                items = property_schema.get("items", {})
+                if schema_ref := items.get("$ref"):
+                    items = self.resolver.resolve(schema_ref.strip("#"))
+                items = self.view(items, (k,))
+                if items.get("type", "object") == "object":
+                    yield k, True, items
+
+    def node(self, schema: Dict) -> _Node:
+        key = id(schema)
+        if key in self.nodes:
+            return self.nodes[key]
+        node = self.nodes[key] = _Node(schema.get("x-jsonld-type"))
+        self.schemas.append(schema)
+        self.pending.add(key)
+        actions = []
+        for k, is_array, subschema in self.subschemas(schema):
+            subnode = self.node(subschema)
+            # Skip sub-entries that have nothing to annotate.
+            if (
+                subnode.jtype
+                or subnode.actions
+                or subnode.variants
+                or id(subschema) in self.pending
+            ):
+                actions.append((k, is_array, subnode))
+        node.actions = tuple(actions)
+        node.children = {k: subnode for k, _, subnode in actions}
+        if variants := self.flattener.variants.get(key):
+            k, views = variants
+            node.variants = (k, {v: self.node(view) for v, view in views.items()})
+        self.pending.discard(key)
+        return node
+
+    def conflict(self, error: Exception, where: Tuple[str, ...]) -> None:
+        """Handle a conflict between the contexts of a schema
+        and of its sub-entry at the `where` property path."""
+        raise error
+
+    def merge_context(
+        self, schema: Dict, context, path: frozenset, where: Tuple[str, ...] = ()
+    ) -> None:
+        """Merge the x-jsonld-context of the schema sub-entries into context.
+
+        The merge follows the same rules of Instance.__init__,
+        but it is driven by the schema instead of the instance.
+        A cyclic sub-entry gets the context of its schema, without
+        descending further: scoped contexts propagate to the nested nodes.
+        """
+        for k, _, subschema in self.subschemas(schema):
+            jcontext = subschema.get("x-jsonld-context")
+            if not isinstance(context, dict):
+                if jcontext:
+                    self.conflict(
+                        NotImplementedError(
+                            f"Possibly conflicting contexts between the instance [{jcontext}] and its parent [{context}]"
+                        ),
+                        where + (k,),
+                    )
+                continue
+            term = context.setdefault(k, {})
+            if jcontext:
+                if isinstance(term, dict):
+                    if CTX not in term:
+                        term[CTX] = deepcopy(jcontext)
+                    elif id(subschema) in path:
+                        pass
+                    elif self.safe_mode:
+                        self.conflict(
+                            ValueError(
+                                "Cannot overwrite a @context defined in the super-schema"
+                            ),
+                            where + (k,),
+                        )
+                    else:
+                        log.warning(
+                            "Skipping nested context because it is already defined."
+                        )
+                elif isinstance(term, str):
+                    self.conflict(
+                        NotImplementedError(
+                            f"Possibly conflicting contexts between the instance [{jcontext}] and its parent [{term}]"
+                        ),
+                        where + (k,),
+                    )
+                else:
+                    self.conflict(
+                        NotImplementedError("An sub-entry MUST have a context"),
+                        where + (k,),
+                    )
+            if id(subschema) in path or not isinstance(term, dict):
+                continue
+            subcontext = term.setdefault(CTX, {})
+            self.merge_context(
+                subschema, subcontext, path | {id(subschema)}, where + (k,)
+            )
+            if not subcontext:
+                del term[CTX]
+        for view in self.flattener.branches.get(id(schema), ()):
+            self.merge_branch(view, context, path, where)
+
+    def merge_branch(
+        self, view: Dict, context, path: frozenset, where: Tuple[str, ...]
+    ) -> None:
+        """Add to context the one of a oneOf/anyOf branch view,
+        scoped to its x-jsonld-type.
+
+        The type-scoped context propagates to the nested nodes,
+        and only has the terms that differ from context, or all
+        of them when the branch changes a keyword like @vocab.
+        """
+        jcontext = view.get("x-jsonld-context")
+        if not jcontext or id(view) in path or jcontext == context:
+            return
+        if not isinstance(jcontext, dict) or not isinstance(context, dict):
+            self.conflict(
+                NotImplementedError(
+                    f"Possibly conflicting contexts between the branch [{jcontext}] and its parent [{context}]"
+                ),
+                where,
+            )
+            return
+        branch = deepcopy(jcontext)
+        self.merge_context(view, branch, path | {id(view)}, where)
+        if all(context.get(k) == v for k, v in branch.items() if k.startswith("@")):
+            branch = {k: v for k, v in branch.items() if context.get(k) != v}
+            if not branch:
+                return
+        scoped = {**branch, "@propagate": True}
+        jtype = view.get("x-jsonld-type")
+        if not isinstance(jtype, str):
+            error = "A oneOf/anyOf branch with its own x-jsonld-context MUST have an x-jsonld-type"
+        elif not isinstance(term := context.get(jtype, {}), (str, dict)):
+            error = f"Conflicting definitions of term {jtype}"
+        else:
+            if isinstance(term, str):
+                term = {"@id": term}
+            if term.get(CTX, scoped) == scoped:
+                vocab = branch.get("@vocab")
+                if "@id" not in term and ":" not in jtype and isinstance(vocab, str):
+                    # Expand the type like in the context of the branch.
+                    term = {"@id": vocab + jtype, **term}
+                context[jtype] = {**term, CTX: scoped}
+                return
+            error = f"Conflicting contexts for x-jsonld-type {jtype}"
+        if self.safe_mode:
+            self.conflict(ValueError(error), where)
+        else:
+            log.warning("%s, skipping the context of the branch.", error)
+
+
+def _canonical_json(obj) -> str:
+    return json.dumps(
+        obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+
+
+def compile(
+    schemas: Dict,
+    schema_name: str,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    cache: "ContextCache" = None,
+) -> Plan:
+    """Compile a schema into a reusable annotation Plan.
+
+    :param schemas: the schemas used to resolve `$ref`s.
+    :param schema_name: either a key of `schemas` or a reference
+        such as `#/components/schemas/Person`.
+    :param safe_mode: raise when a nested context overwrites
+        the one defined in the super-schema, instead of skipping it.
+    :param resolver: a RefResolver for `schemas`, to share its cache.
+    :param cache: reuse the merged @context of a schema with the same
+        fingerprint, and add the new ones to the cache.
+    """
+    return _compile(schemas, schema_name, safe_mode, resolver, cache)[0]
+
+
+def _compile(
+    schemas: Dict,
+    schema_name: str,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    cache: "ContextCache" = None,
+) -> Tuple[Plan, _Compiler]:
+    """Return the Plan and the compiler with the flattened views."""
+    resolver = resolver or RefResolver(schemas)
+    if schema_name.startswith("#"):
+        schema = resolver.resolve(schema_name.strip("#"))
+    else:
+        schema = schemas[schema_name]
+
+    compiler = _Compiler(resolver, safe_mode)
+    schema = compiler.view(schema)
+    root = compiler.node(schema)
+    # The fingerprint only depends on the schemas reachable from schema.
+    fingerprint = hashlib.sha256(
+        _canonical_json([safe_mode, compiler.schemas]).encode()
+    ).hexdigest()
+    if cache is not None and fingerprint in cache:
+        return Plan(schema_name, root, cache[fingerprint], fingerprint), compiler
+
+    context = None
+    jcontext = schema.get("x-jsonld-context")
+    if jcontext or id(schema) in compiler.flattener.branches:
+        # The contexts of the oneOf/anyOf branches are scoped to their type.
+        context = deepcopy(jcontext) if jcontext else {}
+        compiler.merge_context(schema, context, frozenset({id(schema)}))
+        context = context or None
+    if cache is not None:
+        context = cache.add(fingerprint, context)
+    return Plan(schema_name, root, context, fingerprint), compiler
+
+
+class ContextCache:
+    """Merged @context by Plan fingerprint.
+
+    Plans compiled from the same schemas share the same @context,
+    which can be published as a standalone document and referenced
+    by URL instead of being embedded in each instance.
+
+    :param base_url: the URL where the context documents are published.
+    """
+
+    def __init__(self, base_url: str = "") -> None:
+        self.base_url = base_url
+        self.contexts = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self.contexts
+
+    def __getitem__(self, fingerprint: str):
+        return self.contexts[fingerprint]
+
+    def add(self, fingerprint: str, context):
+        """Add a context, and return the cached one."""
+        with self.lock:
+            return self.contexts.setdefault(fingerprint, context)
+
+    def url(self, fingerprint: str) -> str:
+        return f"{self.base_url}{fingerprint}.jsonld"
+
+    def document(self, fingerprint: str) -> Dict:
+        """Return the context document to be published at url(fingerprint)."""
+        return {CTX: self.contexts[fingerprint]}
+
+    def save(self, directory: str) -> List[Path]:
+        """Write all the context documents in directory."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for fingerprint in list(self.contexts):
+            if self.contexts[fingerprint] is None:
+                continue
+            path = directory / f"{fingerprint}.jsonld"
+            path.write_text(json.dumps(self.document(fingerprint), indent=2))
+            paths.append(path)
+        return paths
+
+
+def _linked_context(plan: Plan, context_url: str = None):
+    if plan._context is None:
+        return None
+    return context_url or plan.context
+
+
+def annotate_many(
+    instances: Iterable[Dict],
+    schema_name: str,
+    schemas: Dict,
+    with_context: bool = True,
+    inplace: bool = False,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    context_url: str = None,
+):
+    """Annotate many instances of the same schema.
+
+    The schema is compiled once, and all the documents share the same @context.
+
+    :param with_context: add the @context to each document. If False,
+        return a tuple with the @context and the documents.
+    :param inplace: annotate the passed instances instead of a copy.
+    :param context_url: reference the @context by this URL instead of embedding it.
+    :return: an iterator over the annotated documents.
+    """
+    plan = compile(schemas, schema_name, safe_mode=safe_mode, resolver=resolver)
+    documents = (
+        plan.annotate(
+            instance,
+            inplace=inplace,
+            with_context=with_context,
+            context_url=context_url,
+        )
+        for instance in instances
+    )
+    if with_context:
+        return documents
+    return _linked_context(plan, context_url), documents
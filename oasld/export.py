@@ -0,0 +1,189 @@
+"""Export many instances as N-Triples, N-Quads or to rdflib stores,
+without parsing each of them as JSON-LD."""
+
+import itertools
+import json
+import logging
+import secrets
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .core import CTX, Plan
+from .rdf import _ActiveContext, _TripleEmitter, to_ntriples
+
+log = logging.getLogger(__name__)
+
+
+class ExportStats:
+    """The number of exported records, triples and bytes, and the elapsed time.
+
+    `bytes` is the size of the output encoded as UTF-8,
+    the encoding of N-Triples and N-Quads.
+    """
+
+    def __init__(self) -> None:
+        self.records = 0
+        self.triples = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def rate(self, count: int) -> float:
+        return count / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.records} records, {self.triples} triples in {self.seconds:.3f}s"
+            f" ({self.rate(self.records):.0f} records/s,"
+            f" {self.rate(self.triples):.0f} triples/s)"
+        )
+
+
+class _BNodes:
+    """Create the blank nodes of an export.
+
+    Labels are unique across the records and the batches of an export,
+    and a random prefix keeps them apart from the ones of other exports.
+    The "_:" identifiers of the instances are relabelled per record.
+    """
+
+    def __init__(self, prefix: str = None) -> None:
+        from rdflib import BNode
+
+        self.BNode = BNode
+        self.prefix = prefix or f"b{secrets.token_hex(4)}x"
+        self.counter = itertools.count()
+        self.labels = {}
+
+    def __call__(self, label: str = None):
+        if label is None:
+            return self.BNode(f"{self.prefix}{next(self.counter)}")
+        if (node := self.labels.get(label)) is None:
+            node = self.labels[label] = self()
+        return node
+
+    def reset(self) -> None:
+        """Start a new record."""
+        self.labels.clear()
+
+
+def _record_triples(
+    instances: Iterable[Dict], plan: Plan, bnodes: _BNodes
+) -> Iterator[Tuple[int, Dict, List]]:
+    """Yield (index, instance, triples) for each instance.
+
+    Without a plan, the instances must be annotated and embed their @context.
+    """
+    root = _ActiveContext()
+    # The active context of the last @context, and of its canonical form.
+    last, contexts = (None, None), {}
+    for index, instance in enumerate(instances):
+        bnodes.reset()
+        if plan is not None:
+            yield index, instance, plan.triples(instance, bnode=bnodes)
+            continue
+        context = instance.get(CTX)
+        if context is None or context is not last[0]:
+            # Instances parsed from JSON do not share their @context.
+            key = json.dumps(context, sort_keys=True)
+            if (active := contexts.get(key)) is None:
+                active = contexts[key] = root.merge(context)
+            last = context, active
+        instance = {k: v for k, v in instance.items() if k != CTX}
+        emitter = _TripleEmitter(bnodes)
+        emitter.node(instance, None, last[1])
+        yield index, instance, emitter.triples
+
+
+def _graph_name(graph, index: int, instance: Dict):
+    from rdflib import URIRef
+
+    if graph is None:
+        return None
+    return URIRef(graph(index, instance) if callable(graph) else graph.format(index))
+
+
+def _write(fp, text: str) -> int:
+    """Write text to fp and return its size in UTF-8."""
+    fp.write(text)
+    return len(text) if text.isascii() else len(text.encode())
+
+
+def export_ntriples(
+    instances: Iterable[Dict],
+    fp,
+    plan: Plan = None,
+    graph=None,
+    buffer_size: int = 2**20,
+) -> ExportStats:
+    """Write the triples of the instances as N-Triples,
+    or as N-Quads when a graph is given.
+
+    :param instances: plain instances of plan, or annotated instances.
+    :param fp: a text file.
+    :param plan: the Plan of the instances.
+    :param graph: the name of the graph of each record, either
+        a template like "urn:example:record:{}" formatted with the
+        record index, or a callable(index, instance) returning the name.
+    :param buffer_size: write to fp in chunks of about this many characters.
+    """
+    stats = ExportStats()
+    start = perf_counter()
+    bnodes = _BNodes()
+    buffer, size = [], 0
+    for index, instance, triples in _record_triples(instances, plan, bnodes):
+        text = to_ntriples(triples, graph=_graph_name(graph, index, instance))
+        buffer.append(text)
+        size += len(text)
+        stats.records += 1
+        stats.triples += len(triples)
+        if size >= buffer_size:
+            stats.bytes += _write(fp, "".join(buffer))
+            buffer, size = [], 0
+    stats.bytes += _write(fp, "".join(buffer))
+    stats.seconds = perf_counter() - start
+    log.info("Exported %s", stats)
+    return stats
+
+
+def export_store(
+    instances: Iterable[Dict],
+    store,
+    plan: Plan = None,
+    graph=None,
+    batch_size: int = 10_000,
+) -> ExportStats:
+    """Add the triples of the instances to an rdflib Graph or Dataset,
+    e.g. backed by oxrdflib, in batches of `batch_size` triples.
+
+    :param store: an rdflib Graph or, to use `graph`, a Dataset.
+    See `export_ntriples` for the other parameters.
+    """
+    stats = ExportStats()
+    start = perf_counter()
+    if graph is not None and not store.context_aware:
+        raise ValueError("Named graphs require a context-aware store, e.g. a Dataset")
+    if not store.context_aware:
+        default = store
+    else:
+        # rdflib 7 deprecates the default_context of a Dataset.
+        default = getattr(store, "default_graph", None)
+        if default is None:
+            default = store.default_context
+    bnodes = _BNodes()
+    batch = []
+    for index, instance, triples in _record_triples(instances, plan, bnodes):
+        if graph is not None:
+            context = store.get_context(_graph_name(graph, index, instance))
+        else:
+            context = default
+        batch.extend((s, p, o, context) for s, p, o in triples)
+        stats.records += 1
+        stats.triples += len(triples)
+        if len(batch) >= batch_size:
+            store.addN(batch)
+            batch = []
+    if batch:
+        store.addN(batch)
+    stats.seconds = perf_counter() - start
+    log.info("Exported %s", stats)
+    return stats
@@ -0,0 +1,141 @@
+"""Check the x-jsonld-* keywords of many schemas at once, offline.
+
+Schemas are validated against the bundled `vocab/jsonld-dialect.json`
+and compiled to find the nested contexts that Instance would reject,
+and the conflicts between the members of allOf, oneOf and anyOf.
+"""
+
+import json
+from copy import deepcopy
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from .build import _components, _escape, _expand, _refs
+from .core import RefResolutionError, RefResolver, _Compiler
+from .loader import _read_yaml
+from .validate import _store_validator
+
+# The wheel ships the vocab/ directory of the repository as oasld/vocab.
+VOCAB_DIR = Path(__file__).parent / "vocab"
+if not VOCAB_DIR.is_dir():
+    VOCAB_DIR = Path(__file__).parent.parent / "vocab"
+DIALECT_URI = "https://ioggstream.github.io/draft-polli-restapi-ld-keywords/vocab/jsonld-dialect.json"
+META_URI = "https://ioggstream.github.io/draft-polli-restapi-ld-keywords/vocab/jsonld-meta.json"
+
+
+class Finding(NamedTuple):
+    file: str
+    ref: str
+    kind: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.file}{self.ref}: {self.kind}: {self.message}"
+
+
+_validator = None
+
+
+def dialect_validator():
+    """Return a validator of the x-jsonld dialect, built once.
+
+    The dialect and its meta-schema are bundled, and the
+    JSON Schema meta-schemas are bundled in jsonschema,
+    so no `$schema` is fetched from the network.
+    """
+    global _validator
+    if _validator is None:
+        import jsonschema
+
+        store = {
+            META_URI: json.loads((VOCAB_DIR / "jsonld-meta.json").read_text()),
+            DIALECT_URI: json.loads((VOCAB_DIR / "jsonld-dialect.json").read_text()),
+        }
+        dialect = store[DIALECT_URI]
+        Validator = jsonschema.validators.validator_for(dialect)
+        _validator = _store_validator(Validator, dialect, store, DIALECT_URI)
+    return _validator
+
+
+def _is_boolean_subschema(error) -> bool:
+    """Return whether error only rejects a boolean subschema,
+    e.g. `additionalProperties: false`.
+
+    JSON Schema allows them, but the meta-schema of the
+    x-jsonld keywords is `"type": "object"`, and it applies
+    to every subschema of the dialect.
+    """
+    return (
+        error.validator == "type"
+        and isinstance(error.instance, bool)
+        and error.schema.get("$id") == META_URI
+    )
+
+
+class _Linter(_Compiler):
+    """A compiler recording the context conflicts instead of raising."""
+
+    def __init__(self, resolver: RefResolver) -> None:
+        super().__init__(resolver, safe_mode=True)
+        self.conflicts: List[Tuple[Tuple[str, ...], Exception]] = []
+
+    def conflict(self, error, where):
+        self.conflicts.append((where, error))
+
+
+def _lint_schema(resolver: RefResolver, ref: str, schema: Dict) -> Iterable[Tuple]:
+    """Yield (ref, kind, message) for each finding in a schema."""
+    for error in dialect_validator().iter_errors(schema):
+        if _is_boolean_subschema(error):
+            continue
+        path = "".join(f"/{_escape(str(p))}" for p in error.absolute_path)
+        yield f"{ref}{path}", "dialect", error.message
+
+    for schema_ref in sorted(set(_refs(schema))):
+        try:
+            resolver.resolve(schema_ref.strip("#"))
+        except RefResolutionError as e:
+            yield ref, "ref", f"{schema_ref}: {e}"
+
+    linter = _Linter(resolver)
+    try:
+        # Flattening the compositions records their conflicts.
+        schema = linter.view(schema)
+        jcontext = schema.get("x-jsonld-context")
+        if jcontext or id(schema) in linter.flattener.branches:
+            context = deepcopy(jcontext) if jcontext else {}
+            linter.merge_context(schema, context, frozenset({id(schema)}))
+    except RefResolutionError:
+        # Already reported.
+        pass
+    for where, error in linter.conflicts:
+        yield ref, "context", f"{'.'.join(where)}: {error}"
+
+
+def lint(schemas: Dict, base_uri: str = ".", file: str = "") -> List[Finding]:
+    """Return all the findings in the schemas of a document.
+
+    :param schemas: an OAS document, or a document with schemas at the top-level.
+    :param base_uri: the path of the document, used to load external references.
+    :param file: the name of the document in the findings.
+    """
+    resolver = RefResolver(schemas, base_uri=base_uri)
+    return [
+        Finding(file, *finding)
+        for ref, schema in _components(schemas).items()
+        for finding in _lint_schema(resolver, ref, schema)
+    ]
+
+
+def lint_files(paths: Iterable[str]) -> List[Finding]:
+    """Return all the findings in the schema files,
+    searching the directories recursively."""
+    findings = []
+    for path in _expand(paths):
+        try:
+            document, _ = _read_yaml(Path(path))
+        except Exception as e:
+            findings.append(Finding(path, "", "load", str(e)))
+            continue
+        findings.extend(lint(document, base_uri=path, file=path))
+    return findings
@@ -0,0 +1,155 @@
+"""Load YAML schema files, caching the parsed files on disk."""
+
+import hashlib
+import json
+import logging
+import os
+import stat
+from pathlib import Path
+from typing import Dict
+
+from .core import RefResolver
+
+log = logging.getLogger(__name__)
+
+
+def _read_yaml(path: Path):
+    """Return the parsed YAML file and its (mtime_ns, size, sha256)."""
+    import yaml
+
+    try:
+        # The C loader is many times faster, when libyaml is available.
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+
+    st = path.stat()
+    data = path.read_bytes()
+    document = yaml.load(data, Loader=SafeLoader)
+    return document, (st.st_mtime_ns, st.st_size, hashlib.sha256(data).hexdigest())
+
+
+SCHEMA_CACHE_VERSION = 2
+
+
+def _schema_cache_dir() -> Path:
+    """Return the user cache directory, e.g. ~/.cache/oasld."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "oasld"
+
+
+def _schema_cache_path(path: Path) -> Path:
+    digest = hashlib.sha256(str(path.resolve()).encode()).hexdigest()
+    return _schema_cache_dir() / f"{digest}.json"
+
+
+def _private_dir(directory: Path) -> bool:
+    """Create directory if missing, and return whether only
+    the current user can write to it."""
+    try:
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = directory.stat()
+    except OSError:
+        return False
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        return False
+    return not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _read_schema_cache(path: Path):
+    """Return the cached state of a resolver for path,
+    or None if the cache is missing or its sources changed."""
+    cache_path = _schema_cache_path(path)
+    if not _private_dir(cache_path.parent):
+        return None
+    try:
+        with cache_path.open("rb") as fp:
+            state = json.load(fp)
+        if state.get("version") != SCHEMA_CACHE_VERSION:
+            return None
+        if state.get("path") != str(path.resolve()):
+            return None
+        if not isinstance(state["documents"][""], dict) or not all(
+            isinstance(ref, str) for ref in state["refs"]
+        ):
+            raise ValueError("Invalid documents or refs")
+        for url, (mtime_ns, size, digest) in state["sources"].items():
+            source = path if url == "" else path.parent / url
+            st = source.stat()
+            # Only hash the files whose mtime or size changed.
+            if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+                if hashlib.sha256(source.read_bytes()).hexdigest() != digest:
+                    return None
+    except OSError:
+        return None
+    except Exception as e:
+        # A corrupted, partial or incompatible cache is rebuilt.
+        log.warning("Ignoring the schema cache of %s: %r", path, e)
+        return None
+    return state
+
+
+def _write_schema_cache(path: Path, resolver: "RefResolver") -> None:
+    state = {
+        "version": SCHEMA_CACHE_VERSION,
+        "path": str(path.resolve()),
+        "sources": resolver.sources,
+        "documents": resolver.documents,
+        # The resolved references, resolved again when loading
+        # so that they are the same objects of the documents.
+        "refs": list(resolver.cache),
+    }
+    try:
+        data = json.dumps(state)
+    except (TypeError, ValueError) as e:
+        log.warning("Cannot cache the schemas of %s: %s", path, e)
+        return
+    if json.loads(data)["documents"] != resolver.documents:
+        # E.g. YAML documents with non-string keys.
+        log.warning("Cannot cache the schemas of %s as JSON", path)
+        return
+    cache_path = _schema_cache_path(path)
+    if not _private_dir(cache_path.parent):
+        log.warning("Not caching the schemas in %s: not private", cache_path.parent)
+        return
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}")
+    try:
+        with tmp_path.open("w") as fp:
+            fp.write(data)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log.warning("Cannot write the schema cache %s: %s", cache_path, e)
+        tmp_path.unlink(missing_ok=True)
+
+
+def load_schemas(path: str, cache: bool = True) -> RefResolver:
+    """Load a YAML or JSON schema file, with all its external references.
+
+    The returned resolver has all the files loaded and all the `$ref`s
+    resolved: pass `resolver.schema` and the resolver to `compile()`.
+
+    :param cache: keep the parsed files as JSON in the user cache directory,
+        e.g. ~/.cache/oasld, reused while the files have the same mtime
+        or content.
+    """
+    path = Path(path)
+    if cache and (state := _read_schema_cache(path)) is not None:
+        resolver = RefResolver(state["documents"][""], base_uri=path)
+        resolver.documents = state["documents"]
+        resolver.sources = {url: tuple(v) for url, v in state["sources"].items()}
+        for ref in state["refs"]:
+            resolver.resolve(ref)
+        resolver.hits = resolver.misses = 0
+        return resolver
+
+    schema, source = _read_yaml(path)
+    resolver = RefResolver(schema, base_uri=path)
+    resolver.sources[""] = source
+    resolver.preload()
+    if cache:
+        _write_schema_cache(path, resolver)
+    return resolver
+
+
+def _load_yaml(path: str) -> Dict:
+    return _read_yaml(Path(path))[0]
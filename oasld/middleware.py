@@ -0,0 +1,472 @@
+"""WSGI and ASGI middlewares serving JSON responses as JSON-LD.
+
+The responses of the routes mapped to a schema are annotated
+according to the `Accept` request header:
+
+- `application/json` returns the response unchanged;
+- `application/ld+json` embeds the @context in the response;
+- `application/ld+json; profile="http://www.w3.org/ns/json-ld#context"`
+  references the @context by URL, and the middleware serves
+  the context documents under `context_path`.
+
+Responses whose schema is an array of objects are returned
+as a JSON-LD document with the entries in @graph.
+"""
+
+import asyncio
+import codecs
+import json
+import re
+import threading
+from functools import partial
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from .core import CTX, ContextCache, Plan, RefResolver, compile
+from .registry import CONTEXT_PATH, Registry
+from .stream import _encode_documents, _read_instances
+
+JSON = "application/json"
+JSONLD = "application/ld+json"
+LINKED_PROFILE = "http://www.w3.org/ns/json-ld#context"
+PLAIN, INLINE, LINKED = "plain", "inline", "linked"
+
+
+def parse_accept(accept: str) -> List[Tuple[str, Dict[str, str], float]]:
+    """Return (media type, parameters, quality) for each entry of an Accept header."""
+    ret = []
+    for entry in accept.split(","):
+        media_type, *params = entry.split(";")
+        media_type = media_type.strip().lower()
+        if not media_type:
+            continue
+        parameters = {}
+        for param in params:
+            name, _, value = param.partition("=")
+            parameters[name.strip().lower()] = value.strip().strip('"')
+        try:
+            q = float(parameters.pop("q", 1))
+        except ValueError:
+            q = 0.0
+        ret.append((media_type, parameters, q))
+    return ret
+
+
+def negotiate(accept: str) -> str:
+    """Return the representation preferred by an Accept header:
+    one of PLAIN, INLINE and LINKED.
+
+    Clients that do not ask for JSON-LD get PLAIN.
+    """
+    best, best_q = PLAIN, 0.0
+    for media_type, parameters, q in parse_accept(accept or ""):
+        if media_type == JSONLD:
+            profiles = parameters.get("profile", "").split()
+            mode = LINKED if LINKED_PROFILE in profiles else INLINE
+        elif media_type in (JSON, "application/*", "*/*"):
+            mode = PLAIN
+        else:
+            continue
+        # On equal quality, the first entry wins.
+        if q > best_q:
+            best, best_q = mode, q
+    return best
+
+
+def _template_regex(path: str):
+    """Return the regular expression of an OAS path template, e.g. `/persons/{id}`."""
+    parts = re.split(r"(\{[^}/]+\})", path)
+    return re.compile(
+        "".join("[^/]+" if part.startswith("{") else re.escape(part) for part in parts)
+        + "$"
+    )
+
+
+class _ChunksReader:
+    """A text file reading the byte chunks of a response body."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read(self, size: int = -1) -> str:
+        for chunk in self.chunks:
+            if text := self.decoder.decode(chunk):
+                return text
+        return self.decoder.decode(b"", final=True)
+
+
+def _batched(texts: Iterable[str], size: int) -> Iterator[bytes]:
+    """Join the texts in chunks of at least `size` bytes."""
+    buffer, length = [], 0
+    for text in texts:
+        buffer.append(text.encode())
+        length += len(buffer[-1])
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+class Annotator:
+    """Annotate the response bodies of the routes mapped to a schema.
+
+    Plans are compiled on first use, or by `warm()`,
+    and are shared by all the requests.
+
+    :param schemas: the schemas used to resolve `$ref`s, e.g. an OAS document.
+    :param routes: a mapping from paths to either a schema reference,
+        such as `#/components/schemas/Person`, or an array schema
+        with `items` referencing one. Paths can be OAS templates
+        such as `/persons/{id}`.
+    :param context_path: the path where the linked @context documents are served,
+        by default CONTEXT_PATH.
+    :param chunk_size: the size of the chunks of the annotated bodies.
+    :param registry: reuse the Plans and the @contexts of a Registry
+        built from the same schemas, e.g. before forking the workers.
+        Its `context_path` is used, and `context_path` must be
+        the same if passed.
+    """
+
+    def __init__(
+        self,
+        schemas: Dict,
+        routes: Dict[str, Union[str, Dict]],
+        context_path: str = None,
+        safe_mode: bool = True,
+        chunk_size: int = 2**16,
+        registry: Registry = None,
+    ) -> None:
+        self.schemas = schemas
+        self.safe_mode = safe_mode
+        self.chunk_size = chunk_size
+        self.resolver = RefResolver(schemas)
+        if registry is not None:
+            if context_path not in (None, registry.contexts.base_url):
+                raise ValueError(
+                    f"context_path {context_path} differs from the one"
+                    f" of the registry: {registry.contexts.base_url}"
+                )
+            self.contexts = registry.contexts
+            self.plans = dict(registry.plans)
+        else:
+            if context_path is None:
+                context_path = CONTEXT_PATH
+            self.contexts = ContextCache(base_url=context_path)
+            self.plans = {}
+        self.routes = [
+            (_template_regex(path), target)
+            for path, schema in routes.items()
+            if (target := self.target_of(schema))
+        ]
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_openapi(cls, oas: Dict, **kwargs) -> "Annotator":
+        """Map the paths of an OAS document to the schema
+        of their `200` `application/json` GET response."""
+        routes = {}
+        for path, item in oas.get("paths", {}).items():
+            response = item.get("get", {}).get("responses", {}).get("200", {})
+            if schema := response.get("content", {}).get(JSON, {}).get("schema"):
+                routes[path] = schema
+        return cls(oas, routes, **kwargs)
+
+    def target_of(self, schema: Union[str, Dict]):
+        """Return (schema reference, is_array) for a route, or None."""
+        if isinstance(schema, str):
+            ref = schema
+            if ref.startswith("#"):
+                schema = self.resolver.resolve(ref.strip("#"))
+            else:
+                schema = self.schemas[ref]
+            if schema.get("type") != "array":
+                return ref, False
+        if ref := schema.get("$ref"):
+            return self.target_of(ref)
+        if schema.get("type") == "array":
+            if ref := schema.get("items", {}).get("$ref"):
+                return ref, True
+        return None
+
+    def target(self, path: str):
+        """Return (schema reference, is_array) for a request path, or None."""
+        for regex, target in self.routes:
+            if regex.match(path):
+                return target
+        return None
+
+    def plan(self, ref: str) -> Plan:
+        if (plan := self.plans.get(ref)) is None:
+            with self.lock:
+                if (plan := self.plans.get(ref)) is None:
+                    plan = self.plans[ref] = compile(
+                        self.schemas,
+                        ref,
+                        safe_mode=self.safe_mode,
+                        resolver=self.resolver,
+                        cache=self.contexts,
+                    )
+        return plan
+
+    def warm(self) -> None:
+        """Compile the Plans of all the routes."""
+        for _, (ref, _) in self.routes:
+            self.plan(ref)
+
+    def context_document(self, path: str):
+        """Return the encoded context document served at path, or None."""
+        prefix = self.contexts.base_url
+        if not (path.startswith(prefix) and path.endswith(".jsonld")):
+            return None
+        fingerprint = path[len(prefix) : -len(".jsonld")]  # noqa: E203
+        if fingerprint not in self.contexts or self.contexts[fingerprint] is None:
+            return None
+        return json.dumps(self.contexts.document(fingerprint)).encode()
+
+    def context(self, plan: Plan, mode: str):
+        """Return the @context of the responses annotated with plan:
+        either the merged context, its URL, or None."""
+        if (context := self.contexts[plan.fingerprint]) is None:
+            return None
+        return self.contexts.url(plan.fingerprint) if mode == LINKED else context
+
+    def stream(
+        self, chunks: Iterable[bytes], target: Tuple[str, bool], mode: str
+    ) -> Iterator[bytes]:
+        """Annotate a body, yielding chunks of the result.
+
+        Arrays are annotated one entry at a time while the body is read.
+        """
+        ref, is_array = target
+        if not is_array:
+            yield self.annotate(b"".join(chunks), target, mode)
+            return
+        plan = self.plan(ref)
+        instances = _read_instances(
+            _ChunksReader(chunks), "json", None, self.chunk_size
+        )
+        documents = (
+            plan.annotate(instance, inplace=True, with_context=False)
+            for instance in instances
+        )
+        yield from _batched(
+            _encode_documents(documents, self.context(plan, mode), "json"),
+            self.chunk_size,
+        )
+
+    def annotate(self, body: bytes, target: Tuple[str, bool], mode: str) -> bytes:
+        """Annotate a whole body."""
+        ref, is_array = target
+        plan = self.plan(ref)
+        instance = json.loads(body)
+        if is_array:
+            documents = (
+                plan.annotate(entry, inplace=True, with_context=False)
+                for entry in instance
+            )
+            return "".join(
+                _encode_documents(documents, self.context(plan, mode), "json")
+            ).encode()
+        ld = plan.annotate(instance, inplace=True, with_context=False)
+        if (context := self.context(plan, mode)) is not None:
+            ld[CTX] = context
+        return json.dumps(ld).encode()
+
+
+def _is_json(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() == JSON
+
+
+class WSGIMiddleware:
+    """Annotate the JSON responses of a WSGI application.
+
+    The bodies of array responses are streamed,
+    the other ones are read in full before being annotated.
+
+    :param app: the WSGI application.
+    :param annotator: an Annotator.
+    """
+
+    def __init__(self, app, annotator: Annotator) -> None:
+        self.app = app
+        self.annotator = annotator
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if (document := self.annotator.context_document(path)) is not None:
+            start_response(
+                "200 OK",
+                [("Content-Type", JSONLD), ("Content-Length", str(len(document)))],
+            )
+            return [document]
+        target = self.annotator.target(path)
+        if target is None or environ.get("REQUEST_METHOD", "GET") != "GET":
+            return self.app(environ, start_response)
+
+        mode = negotiate(environ.get("HTTP_ACCEPT", ""))
+        response = []
+
+        def capture(status, headers, exc_info=None):
+            response[:] = [status, headers, exc_info]
+            return self._write_unsupported
+
+        body = self.app(environ, capture)
+        chunks = iter(body)
+        if not response:
+            # The application starts the response on the first chunk.
+            first = next(chunks, b"")
+            chunks = chain([first], chunks)
+        status, headers, exc_info = response
+        content_type = next((v for k, v in headers if k.lower() == "content-type"), "")
+        vary = _vary(v for k, v in headers if k.lower() == "vary")
+        headers = [(k, v) for k, v in headers if k.lower() != "vary"]
+        headers.append(("Vary", vary))
+        if mode == PLAIN or not status.startswith("200") or not _is_json(content_type):
+            start_response(status, headers, exc_info)
+            return _closing(chunks, body)
+
+        headers = [
+            (k, v)
+            for k, v in headers
+            if k.lower() not in ("content-type", "content-length")
+        ]
+        headers.append(("Content-Type", JSONLD))
+        start_response(status, headers, exc_info)
+        return _closing(self.annotator.stream(chunks, target, mode), body)
+
+    @staticmethod
+    def _write_unsupported(data):
+        raise NotImplementedError("The write() callable is not supported.")
+
+
+def _vary(values: Iterable[str]) -> str:
+    """Return the Vary header listing the fields in values and Accept.
+
+    A `*` value already covers Accept, and is kept unchanged.
+    """
+    fields = [f.strip() for value in values for f in value.split(",") if f.strip()]
+    if "*" in fields or any(f.lower() == "accept" for f in fields):
+        return ", ".join(fields)
+    return ", ".join([*fields, "Accept"])
+
+
+def _closing(chunks, body):
+    """Yield the chunks, then close the body returned by the application."""
+    try:
+        yield from chunks
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+
+
+class ASGIMiddleware:
+    """Annotate the JSON responses of an ASGI application.
+
+    Bodies larger than `offload_threshold` bytes are annotated
+    in `executor`, so that they do not block the event loop.
+
+    :param app: the ASGI application.
+    :param annotator: an Annotator.
+    :param offload_threshold: the size in bytes above which bodies
+        are annotated in the executor.
+    :param executor: a concurrent.futures.Executor, by default
+        the one of the event loop.
+    """
+
+    def __init__(
+        self,
+        app,
+        annotator: Annotator,
+        offload_threshold: int = 2**16,
+        executor=None,
+    ) -> None:
+        self.app = app
+        self.annotator = annotator
+        self.offload_threshold = offload_threshold
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        if (document := self.annotator.context_document(path)) is not None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", JSONLD.encode()),
+                        (b"content-length", str(len(document)).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": document})
+            return
+        target = self.annotator.target(path)
+        if target is None or scope.get("method", "GET") != "GET":
+            return await self.app(scope, receive, send)
+
+        accept = b",".join(v for k, v in scope.get("headers", ()) if k == b"accept")
+        mode = negotiate(accept.decode("latin-1"))
+        start, chunks = None, []
+
+        async def annotate_send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", ())
+                vary = _vary(
+                    v.decode("latin-1") for k, v in headers if k.lower() == b"vary"
+                )
+                headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+                headers.append((b"vary", vary.encode("latin-1")))
+                content_type = next(
+                    (v for k, v in headers if k.lower() == b"content-type"), b""
+                )
+                message = dict(message, headers=headers)
+                if (
+                    mode == PLAIN
+                    or message["status"] != 200
+                    or not _is_json(content_type.decode("latin-1"))
+                ):
+                    return await send(message)
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                return await send(message)
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            chunks.clear()
+            if len(body) > self.offload_threshold:
+                loop = asyncio.get_running_loop()
+                body = await loop.run_in_executor(
+                    self.executor,
+                    partial(self.annotator.annotate, body, target, mode),
+                )
+            else:
+                body = self.annotator.annotate(body, target, mode)
+            headers = [
+                (k, v)
+                for k, v in start["headers"]
+                if k.lower() not in (b"content-type", b"content-length")
+            ]
+            headers += [
+                (b"content-type", JSONLD.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            await send(dict(start, headers=headers))
+            size = self.annotator.chunk_size
+            for offset in range(0, len(body), size):
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": body[offset : offset + size],  # noqa: E203
+                        "more_body": offset + size < len(body),
+                    }
+                )
+
+        await self.app(scope, receive, annotate_send)
@@ -0,0 +1,81 @@
+"""Annotate instances in a pool of processes."""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List
+
+from .core import CTX, Plan, RefResolver, _linked_context, compile
+
+_worker_plan = None
+
+
+def _init_worker(
+    schemas: Dict, schema_name: str, safe_mode: bool, resolver: RefResolver = None
+) -> None:
+    global _worker_plan
+    _worker_plan = compile(schemas, schema_name, safe_mode=safe_mode, resolver=resolver)
+
+
+def _annotate_chunk(chunk: List[Dict]) -> List[Dict]:
+    return [
+        _worker_plan.annotate(instance, inplace=True, with_context=False)
+        for instance in chunk
+    ]
+
+
+def _annotate_chunks(
+    plan: Plan, instances, schemas, safe_mode, jobs, chunk_size, resolver=None
+):
+    instances = iter(instances)
+    with ProcessPoolExecutor(
+        jobs,
+        initializer=_init_worker,
+        initargs=(schemas, plan.schema_name, safe_mode, resolver),
+    ) as executor:
+        # Bound the chunks in flight to keep memory flat.
+        pending = deque()
+        try:
+            while chunk := list(islice(instances, chunk_size)):
+                pending.append(executor.submit(_annotate_chunk, chunk))
+                if len(pending) > 2 * jobs:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def annotate_parallel(
+    instances: Iterable[Dict],
+    schema_name: str,
+    schemas: Dict,
+    jobs: int = None,
+    chunk_size: int = 1000,
+    with_context: bool = True,
+    safe_mode: bool = True,
+    context_url: str = None,
+    resolver: RefResolver = None,
+):
+    """Like `annotate_many()`, but annotate the instances in a pool of processes.
+
+    The schemas are sent once to each worker, which compiles them.
+    The instances are sent in chunks and the documents are returned
+    in the same order of the instances.
+
+    :param jobs: the number of worker processes, defaults to the number of CPUs.
+    :param chunk_size: the number of instances sent at once to a worker.
+    """
+    plan = compile(schemas, schema_name, safe_mode=safe_mode, resolver=resolver)
+    jobs = jobs or os.cpu_count() or 1
+    documents = _annotate_chunks(
+        plan, instances, schemas, safe_mode, jobs, chunk_size, resolver
+    )
+    context = _linked_context(plan, context_url)
+    if not with_context:
+        return context, documents
+    if context is None:
+        return documents
+    return (dict(document, **{CTX: context}) for document in documents)
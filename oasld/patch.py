@@ -0,0 +1,685 @@
+"""Re-annotate documents changed by a JSON Patch or a merge patch,
+and compute the triples added and removed by the change.
+
+Only the patched values are annotated, using the schema nodes of
+their pointers, and only the properties owning the patched pointers
+are converted to triples, before and after the change.
+Blank nodes are labelled by the JSON pointer of their object relative
+to the closest object with an IRI, so unchanged blank nodes have
+the same label before and after the change.
+"""
+
+import hashlib
+from collections import Counter
+from copy import deepcopy
+from typing import Dict, List, NamedTuple, Tuple
+
+from .build import _escape
+from .core import CTX, ContextCache, Plan, RefResolver, compile
+from .rdf import _ActiveContext, _TripleEmitter
+
+_MISSING = object()
+
+
+class PatchError(ValueError):
+    """The patch is invalid, or cannot be applied to the document."""
+
+
+class Update(NamedTuple):
+    document: Dict
+    added: List[Tuple]
+    removed: List[Tuple]
+
+
+def _pointer(segments) -> str:
+    return "".join(f"/{_escape(str(s))}" for s in segments)
+
+
+def _segments(pointer: str) -> Tuple[str, ...]:
+    if pointer == "":
+        return ()
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return tuple(
+        s.replace("~1", "/").replace("~0", "~") for s in pointer[1:].split("/")
+    )
+
+
+def _index(segment: str, size: int) -> int:
+    if segment.isdigit() and (segment == "0" or not segment.startswith("0")):
+        index = int(segment)
+        if index < size:
+            return index
+    raise PatchError(f"Invalid array index: {segment}")
+
+
+def _get(document, segments):
+    value = document
+    for s in segments:
+        if isinstance(value, dict):
+            if s not in value:
+                raise PatchError(f"Missing member: {_pointer(segments)}")
+            value = value[s]
+        elif isinstance(value, list):
+            value = value[_index(s, len(value))]
+        else:
+            raise PatchError(f"Missing member: {_pointer(segments)}")
+    return value
+
+
+def _kinds(document, segments) -> List[bool]:
+    """Return whether each container on the path to the last segment
+    is an object, i.e. True, or an array."""
+    kinds = []
+    value = document
+    for s in segments:
+        kinds.append(isinstance(value, dict))
+        value = _get(value, (s,))
+    return kinds
+
+
+def _update(container, segments, fn):
+    """Return a copy of container where fn changed the parent
+    of the last segment, copying only the containers on the path."""
+    s = segments[0]
+    if isinstance(container, dict):
+        ret = dict(container)
+        if len(segments) > 1:
+            ret[s] = _update(_get(container, (s,)), segments[1:], fn)
+            return ret
+    elif isinstance(container, list):
+        ret = list(container)
+        if len(segments) > 1:
+            index = _index(s, len(container))
+            ret[index] = _update(container[index], segments[1:], fn)
+            return ret
+    else:
+        raise PatchError(f"Missing member: {_pointer(segments)}")
+    fn(ret, s)
+    return ret
+
+
+def _add(document, segments, value):
+    if not segments:
+        return value
+
+    def add(parent, s):
+        if isinstance(parent, dict):
+            parent[s] = value
+        elif s == "-":
+            parent.append(value)
+        else:
+            parent.insert(_index(s, len(parent) + 1), value)
+
+    return _update(document, segments, add)
+
+
+def _remove(document, segments):
+    if not segments:
+        raise PatchError("Cannot remove the whole document")
+
+    def remove(parent, s):
+        if isinstance(parent, dict):
+            if s not in parent:
+                raise PatchError(f"Missing member: {_pointer(segments)}")
+            del parent[s]
+        else:
+            del parent[_index(s, len(parent))]
+
+    return _update(document, segments, remove)
+
+
+def _replace(document, segments, value):
+    _get(document, segments)
+    if not segments:
+        return value
+
+    def replace(parent, s):
+        if isinstance(parent, dict):
+            parent[s] = value
+        else:
+            parent[_index(s, len(parent))] = value
+
+    return _update(document, segments, replace)
+
+
+def _merge_operations(target, patch, segments=()) -> List[Dict]:
+    """Return the JSON Patch operations of an RFC 7386 merge patch."""
+    if not isinstance(patch, dict) or not isinstance(target, dict):
+        return [
+            {"op": "replace", "path": _pointer(segments), "value": _merge({}, patch)}
+        ]
+    operations = []
+    for k, v in patch.items():
+        path = segments + (k,)
+        if v is None:
+            if k in target:
+                operations.append({"op": "remove", "path": _pointer(path)})
+        elif isinstance(v, dict) and isinstance(target.get(k), dict):
+            operations.extend(_merge_operations(target[k], v, path))
+        else:
+            operations.append(
+                {"op": "add", "path": _pointer(path), "value": _merge({}, v)}
+            )
+    return operations
+
+
+def _merge(target, patch):
+    if not isinstance(patch, dict):
+        return patch
+    ret = dict(target) if isinstance(target, dict) else {}
+    for k, v in patch.items():
+        if v is None:
+            ret.pop(k, None)
+        else:
+            ret[k] = _merge(ret.get(k), v)
+    return ret
+
+
+def _label(name: str, *parts: str) -> str:
+    digest = hashlib.blake2b("\0".join((name,) + parts).encode(), digest_size=10)
+    return f"b{digest.hexdigest()}"
+
+
+def _entries_context(value: Dict, active, node=None, merge: bool = True):
+    """Return the active context of the entries of an object,
+    with its type-scoped contexts, like `_TripleEmitter.node`.
+
+    :param node: the plan node of the object, if any.
+    :param merge: merge the @context of the object.
+    """
+    if active.nested is not None:
+        active = active.nested
+    if merge and CTX in value:
+        active = active.merge(value[CTX])
+    if node is not None and (jtype := node.select(value).jtype):
+        return active.typed([jtype])
+    types = []
+    for k, v in value.items():
+        if active.property(k)[0] == "@type":
+            types.extend(v if isinstance(v, list) else [v])
+    return active.typed(types) if types else active
+
+
+def _named_items(emitter, items: List, active, iris: Dict) -> Tuple[List, Dict]:
+    """Return the IRI of each item, or None, and the items by IRI.
+
+    :param iris: the IRIs of the items already seen, by the id
+        of the item and of its active context.
+    """
+    ret, groups = [], {}
+    for item in items:
+        iri = None
+        if isinstance(item, dict):
+            key = (id(item), id(active))
+            if (iri := iris.get(key, _MISSING)) is _MISSING:
+                iri = iris[key] = emitter.named(item, active)
+        if iri is not None:
+            groups.setdefault(iri, []).append(item)
+        ret.append(iri)
+    return ret, groups
+
+
+def _count_iris(emitter, todo: List[Tuple]) -> Counter:
+    """Count the IRIs of the objects in the (value, active context)s."""
+    ret = Counter()
+    while todo:
+        value, active = todo.pop()
+        if isinstance(value, list):
+            todo.extend((v, active) for v in value)
+        elif isinstance(value, dict) and "@value" not in value:
+            active = _entries_context(value, active)
+            for k, v in value.items():
+                predicate, _, value_active = active.property(k)
+                if predicate == "@id" and isinstance(v, str):
+                    iri = emitter.iri(value_active.expand(v, relative=True))
+                    if isinstance(iri, emitter.URIRef):
+                        ret[iri] += 1
+                elif isinstance(v, (dict, list)):
+                    todo.append((v, value_active))
+    return ret
+
+
+def _same_items(items: List, other: List) -> bool:
+    """Return whether items and other have the same values."""
+    return all(any(a is b or a == b for b in other) for a in items) and all(
+        any(a is b or a == b for a in items) for b in other
+    )
+
+
+class _PointerEmitter(_TripleEmitter):
+    """Label the blank nodes by the JSON pointer of their object,
+    relative to the closest object with an IRI, and the cells
+    of the @lists by their position.
+
+    The pointers are tracked while walking the document, so that
+    the same Python object at different pointers gets different labels.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__()
+        self.name = name
+        self.new = self.BNode
+        self.BNode = self.bnode
+        # The pointer of the value being emitted.
+        self.pointer = ""
+        self.owner = ""
+        # The IRI and the pointer of the closest object with an IRI.
+        self.scope = ("", "")
+        self.lists = {}
+        self.cell = None
+
+    def named(self, instance: Dict, active, merge: bool = True, node=None):
+        """Return the IRI of an object, or None."""
+        active = _entries_context(instance, active, node, merge)
+        subject = None
+        for k, v in instance.items():
+            predicate, _, value_active = active.property(k)
+            if predicate == "@id" and isinstance(v, str):
+                subject = self.iri(value_active.expand(v, relative=True))
+        return subject if isinstance(subject, self.URIRef) else None
+
+    def relative(self, pointer: str) -> Tuple[str, str]:
+        iri, base = self.scope
+        return iri, pointer[len(base) :]  # noqa: E203
+
+    def bnode(self, label: str = None):
+        if label is not None:
+            return self.new(_label(self.name, f"_:{label}"))
+        if self.cell is None:
+            return self.new()
+        key, count = self.cell
+        self.cell = key, count + 1
+        return self.new(_label(self.name, *key, str(count)))
+
+    def blank(self, instance: Dict):
+        return self.new(_label(self.name, *self.relative(self.owner)))
+
+    def node(self, instance, plan_node, active):
+        pointer, owner, scope = self.pointer, self.owner, self.scope
+        self.owner = pointer
+        if (iri := self.named(instance, active, node=plan_node)) is not None:
+            self.scope = (str(iri), pointer)
+        try:
+            return super().node(instance, plan_node, active)
+        finally:
+            self.pointer, self.owner, self.scope = pointer, owner, scope
+
+    def properties(self, subject, values, plan_node) -> None:
+        pointer = self.pointer
+        for value in values:
+            self.pointer = f"{pointer}/{_escape(value[0])}"
+            super().properties(subject, [value], plan_node)
+        self.pointer = pointer
+
+    def values(self, items, term, active, plan_node):
+        pointer = self.pointer
+        for i, item in enumerate(items):
+            self.pointer = f"{pointer}/{i}"
+            if isinstance(item, list):
+                yield from self.values(item, term, active, plan_node)
+            elif (o := self.value(item, term, active, plan_node)) is not None:
+                yield o
+        self.pointer = pointer
+
+    def list(self, items, term, active, plan_node):
+        key = self.relative(self.owner) + (str(term.iri),)
+        count = self.lists[key] = self.lists.get(key, -1) + 1
+        cell = self.cell
+        self.cell = (key + (str(count),), 0)
+        try:
+            return super().list(items, term, active, plan_node)
+        finally:
+            self.cell = cell
+
+
+class PatchPlan:
+    """Apply patches to documents annotated by a Plan.
+
+    Create it with `compile_patch()`.
+    """
+
+    def __init__(self, plan: Plan) -> None:
+        self.plan = plan
+        self._active = _ActiveContext().merge(plan._context)
+        self._actions = {}
+
+    @property
+    def schema_name(self) -> str:
+        return self.plan.schema_name
+
+    @property
+    def fingerprint(self) -> str:
+        return self.plan.fingerprint
+
+    def _action(self, node, key: str):
+        """Return (is_array, node) of a property of node."""
+        actions = self._actions.get(id(node))
+        if actions is None:
+            actions = self._actions[id(node)] = {k: (a, n) for k, a, n in node.actions}
+        return actions.get(key, (False, None))
+
+    def _annotate(self, value, segments):
+        """Annotate a value inserted at segments."""
+        node, is_array = self.plan._root, False
+        for s in segments:
+            if node is None:
+                return value
+            if is_array:
+                is_array = False
+            else:
+                is_array, node = self._action(node, s)
+        if node is None:
+            return value
+        if is_array:
+            if not isinstance(value, list):
+                return value
+            return [node.copy(i) if isinstance(i, dict) else i for i in value]
+        if not isinstance(value, dict):
+            return value
+        return node.copy(value)
+
+    def _locate(self, document, segments, emitter: _PointerEmitter = None):
+        """Return (value, node, active context) at segments,
+        or (_MISSING, None, None).
+
+        :param emitter: set its scope to the one of the value.
+        """
+        value, node, active = document, self.plan._root, self._active
+        for i, s in enumerate(segments):
+            if isinstance(value, dict):
+                merge = value is not document
+                if emitter is not None:
+                    iri = emitter.named(value, active, merge, node)
+                    if iri is not None:
+                        emitter.scope = (str(iri), _pointer(segments[:i]))
+                if s not in value:
+                    return _MISSING, None, None
+                active = _entries_context(value, active, node, merge).property(s)[2]
+                if node is not None:
+                    node = node.select(value).children.get(s)
+                value = value[s]
+            elif isinstance(value, list):
+                try:
+                    value = value[_index(s, len(value))]
+                except PatchError:
+                    return _MISSING, None, None
+            else:
+                return _MISSING, None, None
+        return value, node, active
+
+    def _is_id(self, document, segments, key: str) -> bool:
+        """Return whether key is the @id of the object at segments."""
+        if key == CTX:
+            return True
+        value, node, active = self._locate(document, segments)
+        if not isinstance(value, dict):
+            return False
+        active = _entries_context(value, active, node, value is not document)
+        return active.property(key)[0] == "@id"
+
+    def _anchor(self, documents, segments, kinds, shifted: bool):
+        """Return the path of the property owning segments, optionally
+        ending with an array index, or () for the whole document."""
+        while segments:
+            # The innermost object containing the pointer.
+            owner = max(i for i, is_object in enumerate(kinds) if is_object)
+            if shifted and not all(kinds):
+                # Array indexes changed: use the outermost array.
+                owner = kinds.index(False) - 1
+                while owner >= 0 and not kinds[owner]:
+                    owner -= 1
+                if owner < 0:
+                    return ()
+                return segments[: owner + 1]
+            path, key = segments[:owner], segments[owner]
+            if any(self._is_id(d, path, key) for d in documents):
+                # The subject changes: re-emit the owner of the object.
+                segments, kinds = path, kinds[:owner]
+                continue
+            if len(segments) == owner + 2 and not kinds[owner + 1]:
+                return segments
+            return segments[: owner + 1]
+        return ()
+
+    def _emit(
+        self, document, anchors, name: str, other=None, iris: Dict = None
+    ) -> List[Tuple]:
+        """Return the triples of the anchors of the document.
+
+        :param other: the other version of the document: the objects
+            with an IRI in both versions of an array are skipped.
+        :param iris: see `_named_items`, shared by the two versions.
+        """
+        emitter = _PointerEmitter(name)
+        iris = {} if iris is None else iris
+        for anchor in anchors:
+            emitter.scope = ("", "")
+            if not anchor:
+                partial = {k: v for k, v in document.items() if k != CTX}
+                emitter.pointer = ""
+                emitter.node(partial, self.plan._root, self._active)
+                continue
+            path, key, index = anchor
+            value, node, active = self._locate(document, path, emitter)
+            if not isinstance(value, dict):
+                continue
+            merge = value is not document
+            value_active = _entries_context(value, active, node, merge)
+            partial = {CTX: value[CTX]} if merge and CTX in value else {}
+            partial.update(
+                (k, v)
+                for k, v in value.items()
+                if value_active.property(k)[0] in ("@id", "@type")
+            )
+            if key in value:
+                other_value = _MISSING
+                if other is not None and index is None:
+                    other_value = self._locate(other, path + (key,))[0]
+                partial[key] = self._values(
+                    emitter,
+                    value[key],
+                    index,
+                    value_active.property(key),
+                    other_value,
+                    iris,
+                )
+            emitter.pointer = _pointer(path)
+            if node is not None:
+                node = node.select(value)
+            emitter.node(partial, node, active)
+        return emitter.triples
+
+    @staticmethod
+    def _values(emitter, v, index, property, other, iris):
+        """Return the values of an anchor: the skipped items
+        are replaced by None, to keep the pointers of the others."""
+        _, term, active = property
+        if index is not None:
+            i = int(index)
+            if not isinstance(v, list) or i >= len(v):
+                return []
+            return [None] * i + [v[i]]
+        if (
+            not isinstance(v, list)
+            or not isinstance(other, list)
+            or term.container == "@list"
+        ):
+            return v
+        # Objects with an IRI have the same triples at any index:
+        # skip the IRIs with the same objects in both versions.
+        names, groups = _named_items(emitter, v, active, iris)
+        other_groups = _named_items(emitter, other, active, iris)[1]
+        skipped = {
+            iri
+            for iri, items in groups.items()
+            if _same_items(items, other_groups.get(iri, []))
+        }
+        if not skipped:
+            return v
+        return [None if iri in skipped else item for item, iri in zip(v, names)]
+
+    def _anchors(self, old, new, touched, shifted: bool) -> List:
+        paths = set()
+        for segments, kinds in touched:
+            paths.add(self._anchor((old, new), segments, kinds, shifted))
+        kept = []
+        for path in sorted(paths, key=len):
+            if not any(path[: len(k)] == k for k in kept):
+                kept.append(path)
+        anchors = []
+        for path in kept:
+            if not path:
+                return [()]
+            if len(path) > 1 and self._item_anchor(old, new, path):
+                anchors.append((path[:-2], path[-2], path[-1]))
+            else:
+                while len(path) > 1 and not self._is_key(old, new, path):
+                    path = path[:-1]
+                anchors.append((path[:-1], path[-1], None))
+        return anchors
+
+    def _is_key(self, old, new, path) -> bool:
+        return not any(
+            isinstance(self._locate(d, path[:-1])[0], list) for d in (old, new)
+        )
+
+    def _item_anchor(self, old, new, path) -> bool:
+        """Return whether path is an object of an unordered array
+        in both documents, so that only its own triples change."""
+        if self._is_key(old, new, path):
+            return False
+        for d in (old, new):
+            container, node, active = self._locate(d, path[:-2])
+            if not isinstance(container, dict):
+                return False
+            active = _entries_context(container, active, node, container is not d)
+            if active.property(path[-2])[1].container == "@list":
+                return False
+            item = self._locate(d, path)[0]
+            if item is not _MISSING and not isinstance(item, dict):
+                return False
+        return True
+
+    def _duplicates(self, document: Dict) -> bool:
+        """Return whether two objects of a document have the same IRI."""
+        root = {k: v for k, v in document.items() if k != CTX}
+        iris = _count_iris(_TripleEmitter(), [(root, self._active)])
+        return max(iris.values(), default=0) > 1
+
+    def triples(self, document: Dict, name: str = "") -> List[Tuple]:
+        """Return the triples of an annotated document,
+        with the blank nodes labelled like in `apply` and `merge`.
+
+        :param name: the name of the document, e.g. its URL,
+            to keep apart the blank nodes of different documents.
+        """
+        return self._emit(document, [()], name)
+
+    def apply(self, document: Dict, patch: List[Dict], name: str = "") -> Update:
+        """Apply an RFC 6902 JSON Patch to an annotated document.
+
+        The document is not modified: the result shares with it
+        the values outside the patched pointers.
+        The added and removed triples assume that each triple
+        is asserted by a single property of the documents, e.g. that
+        the added values do not repeat the IRI of another object.
+        When a "copy" repeats one, the whole documents are compared.
+
+        :param name: see `triples`.
+        :raises PatchError: if an operation fails, like a failed "test".
+        """
+        old, new = document, document
+        touched, shifted = [], False
+        # Whether the patch copies values, maybe objects with an IRI.
+        duplicates = False
+        for operation in patch:
+            if not isinstance(operation, dict) or "path" not in operation:
+                raise PatchError(f"Invalid operation: {operation!r}")
+            op = operation.get("op")
+            segments = _segments(operation["path"])
+            if op == "test":
+                if _get(new, segments) != self._annotate(
+                    operation.get("value"), segments
+                ):
+                    raise PatchError(f"Test failed: {operation['path']}")
+                continue
+            if op in ("move", "copy"):
+                if "from" not in operation:
+                    raise PatchError(f"Missing from: {operation!r}")
+                source = _segments(operation["from"])
+                if op == "move" and segments[: len(source)] == source:
+                    if segments != source:
+                        raise PatchError(f"Cannot move into itself: {operation}")
+                    continue
+                value = _get(new, source)
+                if op == "move":
+                    kinds = _kinds(new, source)
+                    shifted = shifted or not kinds[-1]
+                    touched.append((source, kinds))
+                    new = _remove(new, source)
+                else:
+                    value = deepcopy(value)
+                    duplicates = True
+                value = self._annotate(value, segments)
+                op = "add"
+            elif op in ("add", "replace"):
+                if "value" not in operation:
+                    raise PatchError(f"Missing value: {operation!r}")
+                value = self._annotate(operation["value"], segments)
+            elif op != "remove":
+                raise PatchError(f"Invalid operation: {operation!r}")
+            if not segments and isinstance(value, dict) and CTX in new:
+                # Keep the @context of the document.
+                value = {**value, CTX: new[CTX]}
+            if segments:
+                kinds = _kinds(new, segments[:-1]) + [
+                    isinstance(_get(new, segments[:-1]), dict)
+                ]
+                shifted = shifted or (op in ("add", "remove") and not kinds[-1])
+            else:
+                kinds = []
+            touched.append((segments, kinds))
+            if op == "add":
+                new = _add(new, segments, value)
+            elif op == "replace":
+                new = _replace(new, segments, value)
+            else:
+                new = _remove(new, segments)
+        if not touched:
+            return Update(new, [], [])
+        if duplicates and self._duplicates(new):
+            # The triples of an object are asserted at many pointers.
+            anchors = [()]
+        else:
+            anchors = self._anchors(old, new, touched, shifted)
+        return self._delta(old, new, anchors, name)
+
+    def merge(self, document: Dict, patch, name: str = "") -> Update:
+        """Apply an RFC 7386 merge patch to an annotated document,
+        see `apply`."""
+        return self.apply(document, _merge_operations(document, patch), name)
+
+    def _delta(self, old, new, anchors, name: str) -> Update:
+        iris = {}
+        before = self._emit(old, anchors, name, new, iris)
+        after = self._emit(new, anchors, name, old, iris)
+        before_set, after_set = set(before), set(after)
+        removed = list(dict.fromkeys(t for t in before if t not in after_set))
+        added = list(dict.fromkeys(t for t in after if t not in before_set))
+        return Update(new, added, removed)
+
+
+def compile_patch(
+    schemas: Dict,
+    schema_name: str,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    cache: ContextCache = None,
+) -> PatchPlan:
+    """Compile a schema into a PatchPlan, see `compile()` for the parameters."""
+    return PatchPlan(
+        compile(
+            schemas, schema_name, safe_mode=safe_mode, resolver=resolver, cache=cache
+        )
+    )
@@ -0,0 +1,183 @@
+"""Prune a merged @context to the terms used by a document.
+
+The pruned context keeps the keywords (e.g. @vocab, @base) of the kept
+contexts, the terms used as keys, as @type or as @id-typed values
+in the document, the prefixes of the compact IRIs, and the scoped
+contexts of the keys, pruned in turn. It expands the document
+to the same RDF.
+"""
+
+import threading
+from typing import Dict, Set, Tuple
+
+from .core import CTX
+
+# The aliases and the type coercions of the keys
+# whose values may reference terms.
+_VALUE_IDS = ("@id", "@type")
+_VALUE_TYPES = ("@id", "@vocab")
+
+
+def _add(names: Set[str], value: str, terms: Set[str]) -> None:
+    """Add value and its prefix, if they are terms."""
+    if value in terms:
+        names.add(value)
+    if (i := value.find(":")) > 0 and value[:i] in terms:
+        names.add(value[:i])
+
+
+def _references(definition, names: Set[str], scoped: bool = False) -> None:
+    """Add the terms and prefixes that a definition may reference,
+    including the ones of its scoped contexts if `scoped`."""
+    if isinstance(definition, str):
+        names.add(definition)
+        if (i := definition.find(":")) > 0:
+            names.add(definition[:i])
+    elif isinstance(definition, dict):
+        for k, v in definition.items():
+            if scoped or k != CTX:
+                _references(v, names, scoped)
+    elif isinstance(definition, list):
+        for v in definition:
+            _references(v, names, scoped)
+
+
+class ContextPruner:
+    """Prune a @context to the terms used by each document.
+
+    The pruned variants are memoized by the terms that the documents use,
+    so documents with the same keys share the same pruned context:
+    callers must not modify it.
+
+    :param context: a merged @context, e.g. `Plan.context`.
+    :param max_variants: the number of memoized variants.
+    """
+
+    def __init__(self, context, max_variants: int = 1024) -> None:
+        self.context = context
+        self.max_variants = max_variants
+        # All the terms, the ones with a scoped context, and the keys
+        # whose string values may be terms or compact IRIs, e.g. @type.
+        self.terms = set()
+        self.scoped = set()
+        self.value_keys = {"@id", "@type"}
+        self._collect(context)
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def _collect(self, context) -> None:
+        for c in context if isinstance(context, list) else [context]:
+            if not isinstance(c, dict):
+                continue
+            for k, v in c.items():
+                if k.startswith("@"):
+                    continue
+                self.terms.add(k)
+                definition = v if isinstance(v, dict) else {"@id": v}
+                if definition.get("@id") in _VALUE_IDS or (
+                    definition.get("@type") in _VALUE_TYPES
+                ):
+                    self.value_keys.add(k)
+                if isinstance(v, dict) and v.get(CTX) is not None:
+                    self.scoped.add(k)
+                    self._collect(v[CTX])
+
+    def names(self, document) -> Tuple[Set[str], Dict[str, Set[str]]]:
+        """Return the terms used in the document, and the ones used
+        in the values of each key with a scoped context."""
+        terms, scoped_keys, value_keys = self.terms, self.scoped, self.value_keys
+        scoped = {}
+
+        def walk(value, keys: Set[str], names: Set[str], strings: bool) -> None:
+            """Add the keys of the value to keys, and the terms
+            of its relevant strings to names."""
+            if isinstance(value, list):
+                for v in value:
+                    if type(v) is str:
+                        if strings:
+                            _add(names, v, terms)
+                    elif isinstance(v, (dict, list)):
+                        walk(v, keys, names, strings)
+                return
+            keys.update(value)
+            for k, v in value.items():
+                if type(v) is str:
+                    if k in value_keys:
+                        _add(names, v, terms)
+                elif not isinstance(v, (dict, list)):
+                    continue
+                elif k in scoped_keys:
+                    sub_keys, sub_names = set(), set()
+                    walk(v, sub_keys, sub_names, k in value_keys)
+                    sub_names |= self._terms(sub_keys)
+                    scoped.setdefault(k, set()).update(sub_names)
+                    names |= sub_names
+                else:
+                    walk(v, keys, names, k in value_keys)
+
+        keys, names = set(), set()
+        if isinstance(document, (dict, list)):
+            walk(document, keys, names, False)
+        names |= self._terms(keys)
+        return names, scoped
+
+    def _terms(self, keys: Set[str]) -> Set[str]:
+        """Return the terms and the prefixes of the compact IRIs in keys."""
+        names = keys & self.terms
+        for k in keys:
+            if ":" in k:
+                _add(names, k, self.terms)
+        return names
+
+    def prune(self, document):
+        """Return the @context pruned to the terms used by the document."""
+        if not isinstance(self.context, (dict, list)):
+            return self.context
+        names, scoped = self.names(document)
+        key = (
+            frozenset(names),
+            frozenset((k, frozenset(v)) for k, v in scoped.items()),
+        )
+        if (ret := self._variants.get(key)) is not None:
+            return ret
+        # Pruning is deterministic: concurrent misses compute the same variant.
+        ret = self._prune(self.context, names, scoped)[0]
+        with self._lock:
+            if key not in self._variants and len(self._variants) >= self.max_variants:
+                # Evict the oldest variant.
+                del self._variants[next(iter(self._variants))]
+            return self._variants.setdefault(key, ret)
+
+    def _prune(self, context, names: Set[str], scoped: Dict[str, Set[str]]):
+        """Return the pruned context, and the terms it references
+        that may be defined in the enclosing contexts."""
+        items = context if isinstance(context, list) else [context]
+        kept = [{} for _ in items]
+        required = set()
+        changed = True
+        while changed:
+            changed = False
+            for c, pruned in zip(items, kept):
+                if not isinstance(c, dict):
+                    continue
+                for k, v in c.items():
+                    if k in pruned or not (
+                        k.startswith("@") or k in names or k in required
+                    ):
+                        continue
+                    if isinstance(v, dict) and v.get(CTX) is not None:
+                        if k in scoped:
+                            sub, sub_required = self._prune(v[CTX], scoped[k], scoped)
+                            v = {**v, CTX: sub}
+                            required |= sub_required
+                        else:
+                            # Only used as a value, e.g. as a @type.
+                            _references(v[CTX], required, scoped=True)
+                    _references(v, required)
+                    pruned[k] = v
+                    changed = True
+        ret = [
+            {k: pruned[k] for k in c if k in pruned} if isinstance(c, dict) else c
+            for c, pruned in zip(items, kept)
+        ]
+        return (ret if isinstance(context, list) else ret[0]), required
@@ -0,0 +1,450 @@
+"""Emit RDF triples from instances and compiled @contexts,
+without JSON-LD expansion."""
+
+import json
+import re
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from .core import CTX, _Node
+
+XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+_IRI_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.\-]*:")
+_GEN_DELIMS = tuple(":/?#[]@")
+_UNSUPPORTED_KEYWORDS = ("@import", "@reverse")
+_UNSUPPORTED_CONTAINERS = ("@language", "@index", "@id", "@type", "@graph")
+
+
+def _remove_dot_segments(path: str) -> str:
+    output = []
+    for segment in path.split("/"):
+        if segment == "..":
+            if len(output) > 1:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if path.split("/")[-1] in (".", ".."):
+        output.append("")
+    return "/".join(output)
+
+
+def _resolve_iri(base: str, ref: str) -> str:
+    """Resolve a relative reference according to RFC 3986,
+    which, unlike urljoin, supports any scheme (e.g. urn:, mailto:)."""
+    if _IRI_SCHEME.match(ref) or not base:
+        return ref
+    b = urlsplit(base)
+    r = urlsplit(ref)
+    netloc, query = b.netloc, b.query
+    if ref.startswith("//"):
+        return f"{b.scheme}:{ref}"
+    if not r.path:
+        path = b.path
+        if "?" in ref:
+            query = r.query
+    else:
+        query = r.query
+        if r.path.startswith("/"):
+            path = _remove_dot_segments(r.path)
+        elif netloc and not b.path:
+            path = _remove_dot_segments("/" + r.path)
+        else:
+            path = _remove_dot_segments(b.path[: b.path.rfind("/") + 1] + r.path)
+    iri = (
+        f"{b.scheme}://{netloc}"
+        if base.startswith(f"{b.scheme}://")
+        else f"{b.scheme}:"
+    )
+    iri += path
+    if query:
+        iri += f"?{query}"
+    if r.fragment:
+        iri += f"#{r.fragment}"
+    return iri
+
+
+class _Term:
+    __slots__ = ("iri", "type", "container", "language", "context")
+
+    def __init__(self, iri, type=None, container=None, language=False, context=None):
+        self.iri = iri
+        self.type = type
+        self.container = container
+        # False means: use the default @language.
+        self.language = language
+        self.context = context
+
+
+class _ActiveContext:
+    """The subset of a JSON-LD active context used to emit triples.
+
+    Scoped contexts and property lookups are memoized,
+    so each of them is processed once per Plan.
+    """
+
+    def __init__(
+        self, vocab=None, base=None, language=None, terms=None, nested=None
+    ) -> None:
+        self.vocab = vocab
+        self.base = base
+        self.language = language
+        self.terms = terms or {}
+        # The active context of the nested node objects, when
+        # a context does not propagate to them, see `typed`.
+        self.nested = nested
+        self.scoped = {}
+        self.properties = {}
+        self.types = {}
+
+    def merge(self, context) -> "_ActiveContext":
+        if context is None:
+            return self
+        key = id(context)
+        if (hit := self.scoped.get(key)) is None:
+            # Keep a reference to the context, so that its id is not reused.
+            hit = self.scoped[key] = (context, self._merge(context))
+        return hit[1]
+
+    def _merge(self, context, propagate: bool = True) -> "_ActiveContext":
+        if isinstance(context, list):
+            active = self
+            for c in context:
+                active = active._merge(c, propagate)
+            return active
+        if isinstance(context, str):
+            raise NotImplementedError(f"Remote contexts are not supported: {context}")
+        if unsupported := set(context) & set(_UNSUPPORTED_KEYWORDS):
+            raise NotImplementedError(f"Unsupported keywords: {unsupported}")
+
+        active = _ActiveContext(
+            self.vocab, self.base, self.language, dict(self.terms), self.nested
+        )
+        if context.get("@propagate", propagate) is False and active.nested is None:
+            active.nested = self
+        if "@base" in context:
+            base = context["@base"]
+            active.base = None if base is None else _resolve_iri(self.base, base)
+        if "@vocab" in context:
+            vocab = context["@vocab"]
+            active.vocab = (
+                None
+                if vocab is None
+                else active.expand(vocab, vocab=True, relative=True)
+            )
+        if "@language" in context:
+            active.language = context["@language"]
+        pending = {k: v for k, v in context.items() if not k.startswith("@")}
+        while pending:
+            active.define(next(iter(pending)), pending)
+        return active
+
+    def typed(self, types) -> "_ActiveContext":
+        """Return the active context of the entries of a node object
+        of types, with their type-scoped contexts.
+
+        Unless they set @propagate, the type-scoped contexts
+        do not apply to the nested node objects.
+        """
+        if len(types) == 1 and isinstance(types[0], str):
+            key = types[0]
+        else:
+            key = tuple(t for t in types if isinstance(t, str))
+        if (ret := self.types.get(key)) is not None:
+            return ret
+        active = self
+        for t in sorted(key if isinstance(key, tuple) else [key]):
+            if (term := self.terms.get(t)) is not None and term.context is not None:
+                active = active._merge(term.context, propagate=False)
+        ret = self.types[key] = active
+        return ret
+
+    def define(self, term: str, pending: Dict) -> None:
+        """Define term, and before it the prefixes it depends on."""
+        value = pending.pop(term)
+        if isinstance(value, str):
+            value = {"@id": value}
+        elif value is None:
+            value = {"@id": None}
+        if "@reverse" in value:
+            raise NotImplementedError(f"Unsupported @reverse in term: {term}")
+
+        iri = value.get("@id", term)
+        if isinstance(iri, str) and ":" in iri:
+            prefix = iri.split(":", 1)[0]
+            if prefix in pending and prefix != term:
+                self.define(prefix, pending)
+        if iri is not None:
+            iri = (
+                self.expand(iri, vocab=True) if iri != term else self.expand_term(term)
+            )
+
+        type_ = value.get("@type")
+        if type_ and type_ not in ("@id", "@vocab", "@json", "@none"):
+            type_ = self.expand(type_, vocab=True)
+        container = value.get("@container")
+        if isinstance(container, list):
+            container = "@list" if "@list" in container else None
+        if container in _UNSUPPORTED_CONTAINERS:
+            raise NotImplementedError(f"Unsupported @container in term: {term}")
+        self.terms[term] = _Term(
+            iri,
+            type=type_,
+            container=container if container == "@list" else None,
+            language=value.get("@language", False),
+            context=value.get("@context"),
+        )
+
+    def expand_term(self, term: str):
+        if ":" in term:
+            return self.expand(term, vocab=True)
+        return self.vocab + term if self.vocab is not None else None
+
+    def expand(self, value: str, vocab: bool = False, relative: bool = False):
+        """Expand a term, compact IRI or relative IRI.
+
+        :param vocab: the value can be a term, or be relative to @vocab.
+        :param relative: the value can be relative to @base.
+        """
+        if value.startswith("@"):
+            return value
+        if vocab and (term := self.terms.get(value)) is not None:
+            return term.iri
+        if ":" in value:
+            prefix, suffix = value.split(":", 1)
+            if prefix == "_" or suffix.startswith("//"):
+                return value
+            if (term := self.terms.get(prefix)) is not None and term.iri:
+                if term.iri.endswith(_GEN_DELIMS):
+                    return term.iri + suffix
+            if _IRI_SCHEME.match(value):
+                return value
+        if vocab and self.vocab is not None:
+            return self.vocab + value
+        if relative and self.base is not None:
+            return _resolve_iri(self.base, value)
+        return value
+
+    def property(self, key: str):
+        """Return (predicate, term, active context of the value) for key.
+
+        The predicate is either an URIRef, "@id", "@type" or None
+        when the key is not mapped to an absolute IRI.
+        """
+        try:
+            return self.properties[key]
+        except KeyError:
+            pass
+        from rdflib import URIRef
+
+        term = self.terms.get(key)
+        if term is None:
+            term = _Term(key if key.startswith("@") else self.expand_term(key))
+        if term.iri in ("@id", "@type"):
+            predicate = term.iri
+        elif term.iri and _IRI_SCHEME.match(term.iri):
+            predicate = URIRef(term.iri)
+        else:
+            predicate = None
+        active = self.merge(term.context)
+        if term.context is not None and self.nested is not None:
+            active.nested = self.nested.merge(term.context)
+        ret = self.properties[key] = (predicate, term, active)
+        return ret
+
+
+class _TripleEmitter:
+    """Emit the triples of a plain instance annotated by a Plan."""
+
+    def __init__(self, bnode=None) -> None:
+        import rdflib
+
+        self.URIRef = rdflib.URIRef
+        self.BNode = bnode or rdflib.BNode
+        self.Literal = rdflib.Literal
+        self.rdf_type = rdflib.RDF.type
+        self.rdf_first = rdflib.RDF.first
+        self.rdf_rest = rdflib.RDF.rest
+        self.rdf_nil = rdflib.RDF.nil
+        self.rdf_json = rdflib.RDF.JSON
+        self.triples = []
+
+    def iri(self, value: str):
+        if value.startswith("_:"):
+            return self.BNode(value[2:])
+        if _IRI_SCHEME.match(value):
+            return self.URIRef(value)
+        return None
+
+    def blank(self, instance: Dict):
+        """Return the subject of a node object without @id."""
+        return self.BNode()
+
+    def node(self, instance: Dict, plan_node: _Node, active: _ActiveContext):
+        """Emit the triples of a node object and return its subject."""
+        if active.nested is not None:
+            active = active.nested
+        if CTX in instance:
+            active = active.merge(instance[CTX])
+        types = None
+        if plan_node is not None:
+            plan_node = plan_node.select(instance)
+            if jtype := plan_node.jtype:
+                types = [jtype]
+        if types is not None:
+            if (typed := active.types.get(jtype)) is None:
+                typed = active.typed(types)
+            subject, values, _ = self.entries(instance, typed)
+        else:
+            subject, values, types = self.entries(instance, active)
+            if types and (typed := active.typed(types)) is not active:
+                subject, values, _ = self.entries(instance, typed)
+        if subject is None:
+            subject = self.blank(instance)
+
+        triples = self.triples
+        for t in types:
+            if isinstance(t, str):
+                if o := self.iri(active.expand(t, vocab=True, relative=True)):
+                    triples.append((subject, self.rdf_type, o))
+
+        self.properties(subject, values, plan_node)
+        return subject
+
+    def entries(self, instance: Dict, active: _ActiveContext) -> Tuple:
+        """Return the subject, the (key, predicate, term, active, value)
+        of the properties and the types of a node object."""
+        subject = None
+        types = []
+        values = []
+        for k, v in instance.items():
+            predicate, term, value_active = active.property(k)
+            if predicate == "@id":
+                if isinstance(v, str):
+                    subject = self.iri(value_active.expand(v, relative=True))
+            elif predicate == "@type":
+                types.extend(v if isinstance(v, list) else [v])
+            elif predicate is not None and v is not None:
+                values.append((k, predicate, term, value_active, v))
+        return subject, values, types
+
+    def properties(self, subject, values: List[Tuple], plan_node) -> None:
+        """Emit the triples of the (key, predicate, term, active, value)
+        of a node object."""
+        triples = self.triples
+        children = plan_node.children if plan_node is not None else {}
+        for k, predicate, term, value_active, v in values:
+            child = children.get(k)
+            if isinstance(v, list):
+                if term.container == "@list":
+                    triples.append(
+                        (subject, predicate, self.list(v, term, value_active, child))
+                    )
+                    continue
+                for o in self.values(v, term, value_active, child):
+                    triples.append((subject, predicate, o))
+            elif (o := self.value(v, term, value_active, child)) is not None:
+                triples.append((subject, predicate, o))
+
+    def values(self, items: List, term: _Term, active: _ActiveContext, plan_node):
+        for item in items:
+            if isinstance(item, list):
+                yield from self.values(item, term, active, plan_node)
+            elif (o := self.value(item, term, active, plan_node)) is not None:
+                yield o
+
+    def list(self, items: List, term: _Term, active: _ActiveContext, plan_node):
+        head = self.rdf_nil
+        for o in reversed(list(self.values(items, term, active, plan_node))):
+            node = self.BNode()
+            self.triples.append((node, self.rdf_first, o))
+            self.triples.append((node, self.rdf_rest, head))
+            head = node
+        return head
+
+    def value(self, v, term: _Term, active: _ActiveContext, plan_node):
+        """Return the object of a value, or None if it is dropped."""
+        type_ = term.type
+        if type_ == "@json":
+            return self.Literal(
+                json.dumps(v, sort_keys=True, separators=(",", ":")),
+                datatype=self.rdf_json,
+            )
+        if isinstance(v, dict):
+            if "@value" in v:
+                return self.value_object(v, active)
+            if "@list" in v:
+                return self.list(v["@list"], term, active, plan_node)
+            return self.node(v, plan_node, active)
+        if isinstance(v, str):
+            if type_ in ("@id", "@vocab"):
+                return self.iri(
+                    active.expand(v, vocab=type_ == "@vocab", relative=True)
+                )
+            if type_ and type_ != "@none":
+                return self.Literal(v, datatype=self.URIRef(type_))
+            language = active.language if term.language is False else term.language
+            return self.Literal(v, lang=language) if language else self.Literal(v)
+        if isinstance(v, (bool, int, float)):
+            if type_ and type_ not in ("@id", "@vocab", "@none"):
+                return self.Literal(v, datatype=self.URIRef(type_))
+            return self.Literal(v)
+        return None
+
+    def value_object(self, v: Dict, active: _ActiveContext):
+        value = v["@value"]
+        if value is None:
+            return None
+        if datatype := v.get("@type"):
+            datatype = active.expand(datatype, vocab=True, relative=True)
+            return self.Literal(value, datatype=self.URIRef(datatype))
+        if language := v.get("@language"):
+            return self.Literal(value, lang=language)
+        return self.Literal(value)
+
+
+def _nt_literal(term) -> str:
+    lexical = (
+        str(term)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+    if term.language:
+        return f'"{lexical}"@{term.language}'
+    if term.datatype and term.datatype != XSD_STRING:
+        return f'"{lexical}"^^<{term.datatype}>'
+    return f'"{lexical}"'
+
+
+def _nt_term(term) -> str:
+    from rdflib import BNode, Literal
+
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    if not isinstance(term, Literal):
+        return f"<{term}>"
+    return _nt_literal(term)
+
+
+def to_ntriples(triples, graph=None) -> str:
+    """Serialize triples as N-Triples, or as N-Quads in graph."""
+    from rdflib import BNode, Literal
+
+    suffix = " .\n" if graph is None else f" {_nt_term(graph)} .\n"
+    lines = []
+    append = lines.append
+    # Subjects and predicates repeat: serialize each of them once.
+    nodes = {}
+    for s, p, o in triples:
+        if (subject := nodes.get(s)) is None:
+            subject = nodes[s] = f"_:{s}" if type(s) is BNode else f"<{s}>"
+        if (predicate := nodes.get(p)) is None:
+            predicate = nodes[p] = f"<{p}>"
+        if type(o) is Literal:
+            append(f"{subject} {predicate} {_nt_literal(o)}{suffix}")
+        else:
+            if (obj := nodes.get(o)) is None:
+                obj = nodes[o] = _nt_term(o)
+            append(f"{subject} {predicate} {obj}{suffix}")
+    return "".join(lines)
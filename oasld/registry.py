@@ -0,0 +1,85 @@
+"""Share compiled Plans between pre-fork worker processes.
+
+Build a Registry in the parent process, e.g. while the application
+is imported by `gunicorn --preload`, and freeze it right before
+forking: the workers then share the memory of the schemas, of the
+Plans and of their @contexts copy-on-write, instead of compiling
+their own copies.
+
+    registry = Registry(oas, ["#/components/schemas/Person"]).freeze()
+    annotator = Annotator.from_openapi(oas, registry=registry)
+"""
+
+import gc
+from types import MappingProxyType
+from typing import Dict, Iterable
+
+from .core import ContextCache, Plan, RefResolver, compile
+
+# The path where the middlewares serve the linked @contexts by default.
+CONTEXT_PATH = "/.well-known/jsonld/"
+
+
+class Registry:
+    """Plans compiled once, and read-only afterwards.
+
+    :param schemas: the schemas used to resolve `$ref`s, e.g. an OAS document.
+    :param refs: the schemas to compile, see `compile()`.
+    :param resolver: a RefResolver for `schemas`, to share its cache.
+    :param context_path: the path where the linked @contexts are served,
+        the default one of `Annotator`, see `ContextCache`.
+    """
+
+    def __init__(
+        self,
+        schemas: Dict,
+        refs: Iterable[str],
+        safe_mode: bool = True,
+        resolver: RefResolver = None,
+        context_path: str = CONTEXT_PATH,
+    ) -> None:
+        self.schemas = schemas
+        self.safe_mode = safe_mode
+        self.contexts = ContextCache(base_url=context_path)
+        resolver = resolver or RefResolver(schemas)
+        self.plans = MappingProxyType(
+            {
+                ref: compile(
+                    schemas,
+                    ref,
+                    safe_mode=safe_mode,
+                    resolver=resolver,
+                    cache=self.contexts,
+                )
+                for ref in refs
+            }
+        )
+        self.frozen = False
+
+    def __contains__(self, ref: str) -> bool:
+        return ref in self.plans
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+    def plan(self, ref: str) -> Plan:
+        """Return the Plan of ref.
+
+        :raises KeyError: if ref was not compiled.
+        """
+        return self.plans[ref]
+
+    def freeze(self) -> "Registry":
+        """Move all the objects of the process to the permanent
+        generation of the garbage collector, and return the registry.
+
+        The collector does not write to the frozen objects, so their
+        pages stay shared with the processes forked afterwards.
+        Only the pages of the objects used to annotate,
+        e.g. the reference counts of the Plans, are copied.
+        """
+        # Free the garbage first, or it would be frozen too.
+        gc.collect()
+        gc.freeze()
+        self.frozen = True
+        return self
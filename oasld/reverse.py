@@ -0,0 +1,409 @@
+"""Map RDF graphs and expanded JSON-LD back to plain instances.
+
+This is the reverse of Plan.annotate: the predicates are mapped
+to the schema properties using the same merged @context,
+and the nodes are nested following the flattened views of the schemas.
+The oneOf/anyOf branch of a node is selected by its rdf:type.
+"""
+
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from .core import ContextCache, RefResolver, _compile
+from .rdf import _IRI_SCHEME, _ActiveContext, _resolve_iri
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDF_FIRST = "http://www.w3.org/1999/02/22-rdf-syntax-ns#first"
+RDF_REST = "http://www.w3.org/1999/02/22-rdf-syntax-ns#rest"
+RDF_NIL = "http://www.w3.org/1999/02/22-rdf-syntax-ns#nil"
+RDF_JSON = "http://www.w3.org/1999/02/22-rdf-syntax-ns#JSON"
+_XSD = "http://www.w3.org/2001/XMLSchema#"
+# The datatypes of the literals converted to JSON numbers and booleans.
+_NATIVE_DATATYPES = {
+    f"{_XSD}{t}": t for t in ("integer", "double", "decimal", "boolean")
+}
+
+
+def _compact_iri(iri: str, active: _ActiveContext) -> str:
+    """Return the shortest reference resolving to iri against @base."""
+    base = active.base
+    if not base:
+        return iri
+    directory = base[: base.rfind("/") + 1]
+    if iri.startswith(directory) and len(iri) > len(directory):
+        relative = iri[len(directory) :]  # noqa: E203
+        if not _IRI_SCHEME.match(relative) and _resolve_iri(base, relative) == iri:
+            return relative
+    return iri
+
+
+def _compact_vocab(iri: str, active: _ActiveContext) -> str:
+    """Return the term or the suffix of @vocab expanding to iri."""
+    for name, term in active.terms.items():
+        if term.iri == iri:
+            return name
+    if active.vocab and iri.startswith(active.vocab) and len(iri) > len(active.vocab):
+        return iri[len(active.vocab) :]  # noqa: E203
+    return _compact_iri(iri, active)
+
+
+def _subschema(plan: "ReversePlan", schema: Dict):
+    """Return (is_array, object schema or None) of a property schema."""
+    if ref := schema.get("$ref"):
+        schema = plan.resolver.resolve(ref.strip("#"))
+    schema = plan.view(schema)
+    is_array = schema.get("type") == "array"
+    if is_array:
+        schema = schema.get("items") or {}
+        if ref := schema.get("$ref"):
+            schema = plan.resolver.resolve(ref.strip("#"))
+        schema = plan.view(schema)
+    if schema.get("type") == "object" or "properties" in schema:
+        return is_array, schema
+    return is_array, None
+
+
+class _Property:
+    __slots__ = ("key", "is_array", "type", "container", "active", "node")
+
+    def __init__(self, key, is_array, term, active, node) -> None:
+        self.key = key
+        self.is_array = is_array
+        self.type = term.type
+        self.container = term.container
+        self.active = active
+        # The _ReverseNode of the nested objects, if any.
+        self.node = node
+
+
+class _ReverseNode:
+    """The predicates of a schema in an active context, by IRI."""
+
+    def __init__(self, plan: "ReversePlan", schema: Dict, active) -> None:
+        self.plan = plan
+        self.schema = schema
+        self.active = active
+        self.id_key = None
+        self.id_active = active
+        self._properties = None
+        self._extra = {}
+        # The _ReverseNode of each oneOf/anyOf branch, by rdf:type.
+        self.variants = {}
+
+    def select(self, types: List) -> "_ReverseNode":
+        """Return the node of the branch of the types, or self."""
+        for kind, t in types:
+            if kind == "@id" and (node := self.variants.get(t)) is not None:
+                return node
+        return self
+
+    @property
+    def properties(self) -> Dict[str, _Property]:
+        """The properties by predicate IRI, computed on first use
+        since cyclic schemas nest indefinitely."""
+        if self._properties is not None:
+            return self._properties
+        active = self.active
+        properties = {}
+        keys = list(self.schema.get("properties", {}))
+        if self.schema.get("additionalProperties") is not False:
+            keys += [k for k in active.terms if k not in keys]
+        for k in keys:
+            predicate, term, value_active = active.property(k)
+            if predicate == "@id":
+                self.id_key, self.id_active = k, value_active
+                continue
+            if predicate is None or predicate == "@type":
+                continue
+            predicate = str(predicate)
+            if predicate in properties:
+                continue
+            is_array, node = False, None
+            if property_schema := self.schema.get("properties", {}).get(k):
+                is_array, subschema = _subschema(self.plan, property_schema)
+                if subschema is not None:
+                    node = self.plan.node(subschema, value_active)
+            properties[predicate] = _Property(k, is_array, term, value_active, node)
+        self._properties = properties
+        return properties
+
+    def key(self, predicate: str):
+        """Return the property of a predicate missing in the schema,
+        using @vocab, or None."""
+        try:
+            return self._extra[predicate]
+        except KeyError:
+            ret = self._extra[predicate] = self._key(predicate)
+            return ret
+
+    def _key(self, predicate: str):
+        vocab = self.active.vocab
+        if (
+            self.schema.get("additionalProperties") is False
+            or not vocab
+            or not predicate.startswith(vocab)
+        ):
+            return None
+        key = predicate[len(vocab) :]  # noqa: E203
+        if not key or _IRI_SCHEME.match(key) or "/" in key or "#" in key:
+            return None
+        _, term, value_active = self.active.property(key)
+        return _Property(key, False, term, value_active, None)
+
+
+class _Mapper:
+    """Convert the nodes of an index to instances.
+
+    The index maps each node key, i.e. an IRI or "_:" and a blank node id,
+    to its {predicate: [object]}. Objects are ("@id", key),
+    ("@value", value) and ("@list", [object]).
+    """
+
+    def __init__(self, index: Dict) -> None:
+        self.index = index
+        self.stack = set()
+
+    def instance(self, key: str, node: _ReverseNode) -> Dict:
+        if node.variants:
+            node = node.select(self.index.get(key, {}).get(RDF_TYPE, ()))
+        ld = {}
+        properties = node.properties
+        if node.id_key and not key.startswith("_:"):
+            ld[node.id_key] = _compact_iri(key, node.id_active)
+        if key in self.stack:
+            return ld
+        self.stack.add(key)
+        values = {}
+        for predicate, objects in self.index.get(key, {}).items():
+            if predicate == RDF_TYPE:
+                continue
+            if (p := properties.get(predicate) or node.key(predicate)) is None:
+                continue
+            converted = []
+            for o in objects:
+                converted.extend(self.value(o, p))
+            if converted:
+                values[p.key] = (p, converted)
+        self.stack.discard(key)
+        for k in node.schema.get("properties", {}):
+            if k in values:
+                ld[k] = self.shape(*values.pop(k))
+        for k, value in values.items():
+            ld[k] = self.shape(*value)
+        return ld
+
+    @staticmethod
+    def shape(p: _Property, values: List):
+        if len(values) == 1 and (p.container == "@list" or not p.is_array):
+            return values[0]
+        return values
+
+    def value(self, o, p: _Property) -> Iterable:
+        kind, value = o
+        if kind == "@value":
+            yield value
+        elif kind == "@list":
+            yield [v for item in value for v in self.value(item, p)]
+        elif p.container == "@list" and (value == RDF_NIL or self.is_list(value)):
+            yield [v for item in self.list(value) for v in self.value(item, p)]
+        elif p.node is not None:
+            yield self.instance(value, p.node)
+        elif value.startswith("_:"):
+            # A blank node that the schema does not describe.
+            return
+        elif p.type == "@vocab":
+            yield _compact_vocab(value, p.active)
+        else:
+            yield _compact_iri(value, p.active)
+
+    def is_list(self, key: str) -> bool:
+        return RDF_FIRST in self.index.get(key, {})
+
+    def list(self, key: str) -> List:
+        items, seen = [], set()
+        while key != RDF_NIL and key not in seen:
+            seen.add(key)
+            node = self.index.get(key, {})
+            items.extend(node.get(RDF_FIRST, ()))
+            rest = node.get(RDF_REST)
+            if not rest or rest[0][0] != "@id":
+                break
+            key = rest[0][1]
+        return items
+
+
+def _index_graph(graph) -> Dict:
+    from rdflib import BNode, Literal
+
+    def obj(o):
+        if isinstance(o, Literal):
+            datatype = str(o.datatype) if o.datatype else None
+            if datatype in _NATIVE_DATATYPES:
+                value = o.toPython()
+                if isinstance(value, (bool, int, float)):
+                    return "@value", value
+                if _NATIVE_DATATYPES[datatype] == "decimal":
+                    return "@value", float(value)
+            elif datatype == RDF_JSON:
+                return "@value", json.loads(str(o))
+            return "@value", str(o)
+        return "@id", key(o)
+
+    def key(node):
+        return f"_:{node}" if isinstance(node, BNode) else str(node)
+
+    index = defaultdict(lambda: defaultdict(list))
+    for s, p, o in graph:
+        index[key(s)][str(p)].append(obj(o))
+    # Graphs are unordered: sort the values for stable results.
+    for node in index.values():
+        for objects in node.values():
+            if len(objects) > 1:
+                objects.sort(key=lambda o: (o[0], str(o[1])))
+    return index
+
+
+def _index_expanded(document) -> Dict:
+    index = defaultdict(lambda: defaultdict(list))
+    blank_nodes = 0
+
+    def node(n: Dict) -> str:
+        nonlocal blank_nodes
+        key = n.get("@id")
+        if key is None:
+            blank_nodes += 1
+            key = f"_:b{blank_nodes}"
+        properties = index[key]
+        for t in n.get("@type", ()):
+            properties[RDF_TYPE].append(("@id", t))
+        for p, values in n.items():
+            if p.startswith("@"):
+                continue
+            properties[p].extend(value(v) for v in values)
+        return key
+
+    def value(v: Dict):
+        if "@value" in v:
+            return "@value", v["@value"]
+        if "@list" in v:
+            return "@list", [value(i) for i in v["@list"]]
+        return "@id", node(v)
+
+    for n in document if isinstance(document, list) else [document]:
+        for entry in n.get("@graph", [n]):
+            node(entry)
+    return index
+
+
+class ReversePlan:
+    """Map RDF and expanded JSON-LD to instances of a schema.
+
+    Create it with `compile_reverse()`.
+
+    :param flattener: the `_Flattener` of the compiler of the Plan,
+        with the views of the composed schemas.
+    """
+
+    def __init__(
+        self, schema: Dict, context, resolver: RefResolver, flattener=None
+    ) -> None:
+        self.resolver = resolver
+        self.flattener = flattener
+        self._nodes = {}
+        active = _ActiveContext().merge(context)
+        schema = self.view(schema)
+        self._root = self.node(schema, active)
+        self.type = self._type(schema, active)
+        # The types of the nodes of the schema.
+        self.types = {self.type, *self._root.variants} - {None}
+
+    def view(self, schema: Dict) -> Dict:
+        if self.flattener is None:
+            return schema
+        return self.flattener.view(schema)
+
+    @staticmethod
+    def _type(schema: Dict, active: _ActiveContext):
+        """Return the rdf:type IRI of the schema, or None."""
+        jtype = schema.get("x-jsonld-type")
+        if isinstance(jtype, str):
+            iri = active.expand(jtype, vocab=True, relative=True)
+            if _IRI_SCHEME.match(iri):
+                return iri
+        return None
+
+    def node(self, schema: Dict, active: _ActiveContext) -> _ReverseNode:
+        key = (id(schema), id(active))
+        if (node := self._nodes.get(key)) is not None:
+            return node
+        # Like _TripleEmitter.node, with the type-scoped contexts.
+        outer = active.nested or active
+        jtype = schema.get("x-jsonld-type")
+        typed = outer.typed([jtype]) if isinstance(jtype, str) else outer
+        node = self._nodes[key] = _ReverseNode(self, schema, typed)
+        if self.flattener is not None:
+            for view in self.flattener.branches.get(id(schema), ()):
+                if iri := self._type(view, outer):
+                    node.variants.setdefault(iri, self.node(view, active))
+        return node
+
+    def _roots(self, index: Dict) -> List[str]:
+        """Return the nodes of the schema type, or all the nodes if
+        the schema has no type, skipping the ones nested in other nodes."""
+        nested = {
+            o[1]
+            for properties in index.values()
+            for p, objects in properties.items()
+            if p != RDF_TYPE
+            for o in objects
+            if o[0] == "@id"
+        }
+        candidates = [
+            key
+            for key, properties in index.items()
+            if (not self.types and RDF_FIRST not in properties)
+            or any(o[1] in self.types for o in properties.get(RDF_TYPE, ()))
+        ]
+        return [key for key in candidates if key not in nested] or candidates
+
+    def _map(self, index: Dict, subjects) -> List[Dict]:
+        mapper = _Mapper(index)
+        if subjects is None:
+            subjects = self._roots(index)
+        return [mapper.instance(str(s), self._root) for s in subjects]
+
+    def from_graph(self, graph, subjects: Iterable[str] = None) -> List[Dict]:
+        """Return the instances described by an rdflib Graph.
+
+        :param subjects: the IRIs of the instances, by default
+            the nodes of the schema type not nested in other nodes.
+        """
+        return self._map(_index_graph(graph), subjects)
+
+    def from_expanded(self, document, subjects: Iterable[str] = None) -> List[Dict]:
+        """Return the instances described by an expanded JSON-LD document,
+        i.e. a node object or a list of node objects.
+
+        :param subjects: see `from_graph`.
+        """
+        return self._map(_index_expanded(document), subjects)
+
+
+def compile_reverse(
+    schemas: Dict,
+    schema_name: str,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    cache: ContextCache = None,
+) -> ReversePlan:
+    """Compile a schema into a ReversePlan, see `compile()` for the parameters."""
+    resolver = resolver or RefResolver(schemas)
+    plan, compiler = _compile(
+        schemas, schema_name, safe_mode=safe_mode, resolver=resolver, cache=cache
+    )
+    if schema_name.startswith("#"):
+        schema = resolver.resolve(schema_name.strip("#"))
+    else:
+        schema = schemas[schema_name]
+    return ReversePlan(schema, plan._context, resolver, compiler.flattener)
@@ -0,0 +1,83 @@
+"""Sample schemas."""
+
+sample_schema = schema_json = {
+    "Person": {
+        "description": "Simple cyclic example.",
+        "x-jsonld-type": "Person",
+        "x-jsonld-context": {
+            "email": "@id",
+            "@vocab": "https://w3.org/ns/person#",
+            "children": {"@container": "@set"},
+        },
+        "type": "object",
+        "properties": {
+            "email": {"type": "string"},
+            "birthplace": {"$ref": "#/BirthPlace"},
+            "children": {"type": "array", "items": {"$ref": "#/Person"}},
+        },
+        "example": {
+            "email": "mailto:a@example",
+            "givenName": "Alice",
+            "familyName": "Smith",
+            "birthplace": {
+                "city": "Roma",
+                "province": "RM",
+                "country": "ITA",
+                "interno": "Interno 8",
+            },
+            "children": [
+                {"email": "mailto:dough@example"},
+                {"email": "mailto:son@example"},
+            ],
+        },
+    },
+    "BirthPlace": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["city", "province", "country"],
+        "x-jsonld-type": "https://w3id.org/italia/onto/CLV/Feature",
+        "x-jsonld-context": {
+            "@vocab": "https://w3id.org/italia/onto/CLV/",
+            "city": "hasCity",
+            "country": {
+                "@id": "hasCountry",
+                "@type": "@id",
+                "@context": {
+                    "@base": "http://publications.europa.eu/resource/authority/country/"
+                },
+            },
+            "province": {
+                "@id": "hasProvince",
+                "@type": "@id",
+                "@context": {
+                    "@base": "https://w3id.org/italia/data/identifiers/provinces-identifiers/vehicle-code/"
+                },
+            },
+            "interno": None,
+        },
+        "properties": {
+            "city": {
+                "type": "string",
+                "description": "The city where the person was born.",
+                "example": "Roma",
+            },
+            "province": {
+                "type": "string",
+                "description": "The province where the person was born.",
+                "example": "RM",
+            },
+            "country": {
+                "type": "string",
+                "description": "The iso alpha-3 code of the country where the person was born.",
+                "example": "ITA",
+            },
+            "interno": {"type": "string", "maxLength": 32},
+        },
+        "example": {
+            "city": "Roma",
+            "province": "RM",
+            "country": "ITA",
+            "interno": "Interno 8",
+        },
+    },
+}
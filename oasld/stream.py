@@ -0,0 +1,226 @@
+"""Annotate JSON collections one entry at a time."""
+
+import json
+from typing import Dict, Iterable
+
+from .core import CTX, RefResolver, annotate_many
+
+
+class _JSONStream:
+    """Decode a JSON document one value at a time from a text file."""
+
+    def __init__(self, fp, chunk_size: int) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed part to keep memory flat.
+        consumed, self.pos = self.pos, 0
+        self.buffer = self.buffer[consumed:] + chunk
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if (found := self.peek()) != char:
+            raise ValueError(f"Expecting {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number could continue in the next chunk.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def array(self):
+        """Yield the entries of the array at the current position.
+
+        :raises ValueError: if an entry is not an object.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            value = self.value()
+            if not isinstance(value, dict):
+                raise ValueError(
+                    f"Expecting an object at index {index}, found {type(value).__name__}"
+                )
+            yield value
+            if self.peek() == ",":
+                self.pos += 1
+                index += 1
+                continue
+            self.expect("]")
+            return
+
+    def object_entry(self, key: str):
+        """Yield the entries of the array stored in `key`
+        of the object at the current position, skipping the other values."""
+        self.expect("{")
+        found = False
+        while self.peek() != "}":
+            k = self.value()
+            self.expect(":")
+            if k == key and self.peek() == "[":
+                found = True
+                yield from self.array()
+            else:
+                self.value()
+            if self.peek() == ",":
+                self.pos += 1
+        self.expect("}")
+        if not found:
+            raise KeyError(key)
+
+    def entries(self, key: str = None):
+        """Yield the entries of the document: an array,
+        or the array stored in `key` of an object.
+
+        :raises ValueError: if data follows the document.
+        """
+        yield from self.object_entry(key) if key else self.array()
+        if (found := self.peek()) != "":
+            raise ValueError(f"Extra data after the JSON document: {found!r}")
+
+
+def _read_instances(fp_in, input_format: str, items_property: str, buffer_size: int):
+    if input_format == "ndjson":
+        return (json.loads(line) for line in fp_in if line.strip())
+    if input_format == "json":
+        return _JSONStream(fp_in, buffer_size).entries(items_property)
+    raise ValueError(f"Unsupported input format: {input_format}")
+
+
+def _encode_documents(documents: Iterable[Dict], context, output_format):
+    """Yield the JSON text of documents without @context, adding it once
+    or on each line depending on `output_format`."""
+    if output_format not in ("json", "ndjson"):
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    # Encode the @context only once.
+    context = None if context is None else json.dumps(context)
+    if output_format == "ndjson":
+        for document in documents:
+            node = json.dumps(document)
+            if context is not None:
+                sep = ", " if node != "{}" else ""
+                node = f'{node[:-1]}{sep}"{CTX}": {context}}}'
+            yield node + "\n"
+        return
+
+    yield "{"
+    if context is not None:
+        yield f'"{CTX}": {context}, '
+    yield '"@graph": ['
+    for count, document in enumerate(documents, 1):
+        if count > 1:
+            yield ", "
+        yield json.dumps(document)
+    yield "]}"
+
+
+def _write_documents(fp_out, documents: Iterable[Dict], context, output_format) -> int:
+    count = 0
+
+    def counted():
+        nonlocal count
+        for count, document in enumerate(documents, 1):
+            yield document
+
+    for text in _encode_documents(counted(), context, output_format):
+        fp_out.write(text)
+    return count
+
+
+def annotate_stream(
+    fp_in,
+    fp_out,
+    schemas: Dict,
+    item_schema: str,
+    items_property: str = None,
+    input_format: str = "json",
+    output_format: str = "json",
+    safe_mode: bool = True,
+    buffer_size: int = 2**16,
+    jobs: int = 1,
+    chunk_size: int = 1000,
+    context_url: str = None,
+    resolver: RefResolver = None,
+) -> int:
+    """Annotate a JSON collection one entry at a time.
+
+    Only one entry (or a few chunks, when jobs > 1) is in memory
+    at any time, so memory use does not depend on the size of the collection.
+
+    :param fp_in: a text file containing either a JSON array,
+        a JSON object with an `items_property` array, or one JSON
+        instance per line when `input_format` is "ndjson".
+    :param fp_out: a text file where to write either a JSON-LD document
+        with the @context and the entries in @graph, or one JSON-LD node
+        per line when `output_format` is "ndjson".
+        Other properties of the input object are not written.
+    :param item_schema: the schema of each entry, see `compile()`.
+    :param buffer_size: the number of characters read at once from fp_in.
+    :param jobs: the number of worker processes, see `annotate_parallel()`.
+    :param chunk_size: the number of entries sent at once to a worker.
+    :param context_url: reference the @context by this URL instead of embedding it.
+    :param resolver: resolves the `$ref`s, e.g. the external ones
+        relative to the schema file, see `RefResolver`.
+    :return: the number of annotated entries.
+    """
+    instances = _read_instances(fp_in, input_format, items_property, buffer_size)
+    if jobs > 1:
+        from .parallel import annotate_parallel
+
+        context, documents = annotate_parallel(
+            instances,
+            item_schema,
+            schemas,
+            jobs=jobs,
+            chunk_size=chunk_size,
+            with_context=False,
+            safe_mode=safe_mode,
+            context_url=context_url,
+            resolver=resolver,
+        )
+    else:
+        context, documents = annotate_many(
+            instances,
+            item_schema,
+            schemas,
+            with_context=False,
+            inplace=True,
+            safe_mode=safe_mode,
+            context_url=context_url,
+            resolver=resolver,
+        )
+    return _write_documents(fp_out, documents, context, output_format)
@@ -0,0 +1,303 @@
+"""Validate and annotate an instance in a single traversal.
+
+The instance is validated with the keyword functions of a `jsonschema`
+validator class, so the errors are the ones of `Validator.iter_errors`.
+The `$ref`, `properties` and `items` keywords are walked here instead,
+annotating the instance on the way down.
+"""
+
+from typing import Dict, List, Tuple
+
+from .core import CTX, ContextCache, Plan, RefResolver, _Node, compile
+
+# Markers of the keywords walked by ValidatingPlan.
+_REF, _PROPERTIES, _ITEMS = object(), object(), object()
+
+# The validator classes ignoring the keywords next to a `$ref`.
+_IGNORE_REF_SIBLINGS = {
+    "Draft3Validator",
+    "Draft4Validator",
+    "Draft6Validator",
+    "Draft7Validator",
+}
+
+
+def _store_validator(cls, schema, store: Dict, base_uri: str = "", **kwargs):
+    """Return a validator of cls for schema, resolving the `$ref`s
+    to the documents in store by URI, without fetching them.
+
+    The `$ref`s of schema are relative to `store[base_uri]`.
+    jsonschema>=4.18 resolves them with a `referencing` registry,
+    the previous versions with a RefResolver.
+    """
+    root = store[base_uri]
+    try:
+        from referencing import Registry, Resource
+        from referencing.jsonschema import specification_with
+    except ImportError:
+        import jsonschema
+
+        resolver = jsonschema.RefResolver(base_uri, root, store=store)
+        validator = cls(root, resolver=resolver, **kwargs)
+    else:
+        meta_schema = cls.META_SCHEMA
+        specification = specification_with(meta_schema.get("$id") or meta_schema["id"])
+        registry = Registry().with_resources(
+            (uri, Resource.from_contents(document, specification))
+            for uri, document in store.items()
+        )
+        validator = cls(root, registry=registry, **kwargs)
+    # The evolved validator keeps resolving from the root document.
+    return validator if schema is root else validator.evolve(schema=schema)
+
+
+def _located(error, validator, validator_value, instance, schema):
+    """Return error with the keyword, the instance and the schema
+    that raised it, like `Validator.iter_errors` does.
+
+    The errors yielded by the keyword functions are new, and
+    are replaced by a copy: the ones of the subschemas are kept.
+    """
+    cls = type(error)
+    if error.validator is not cls("").validator:
+        return error
+    return cls(
+        error.message,
+        validator=validator,
+        path=error.relative_path,
+        cause=error.cause,
+        context=error.context,
+        validator_value=validator_value,
+        instance=instance,
+        schema=schema,
+        schema_path=error.relative_schema_path,
+    )
+
+
+class _Check:
+    """The keywords of a schema, with the `$ref`s resolved once."""
+
+    __slots__ = ("schema", "keywords")
+
+    def __init__(self, schema) -> None:
+        self.schema = schema
+        # A tuple of (keyword, value, function, compiled value).
+        self.keywords = ()
+
+
+class ValidatingPlan:
+    """A Plan that validates the instances while annotating them.
+
+    Create it with `compile_validating()`.
+    """
+
+    def __init__(self, plan: Plan, validator, resolver: RefResolver) -> None:
+        self.plan = plan
+        self.validator = validator
+        self.resolver = resolver
+        self._checks = {}
+        self._check = self._compile(validator.schema)
+        # The annotation actions by node, as {property: (is_array, node)}.
+        self._actions = {}
+        todo = [plan._root]
+        while todo:
+            node = todo.pop()
+            if id(node) not in self._actions:
+                self._actions[id(node)] = {k: (a, n) for k, a, n in node.actions}
+                todo.extend(n for _, _, n in node.actions)
+                if node.variants is not None:
+                    todo.extend(node.variants[1].values())
+
+    @property
+    def schema_name(self) -> str:
+        return self.plan.schema_name
+
+    @property
+    def fingerprint(self) -> str:
+        return self.plan.fingerprint
+
+    @property
+    def context(self):
+        return self.plan.context
+
+    def _compile(self, schema) -> _Check:
+        if id(schema) in self._checks:
+            return self._checks[id(schema)]
+        check = self._checks[id(schema)] = _Check(schema)
+        if not isinstance(schema, dict):
+            # Boolean schemas are checked by the validator.
+            return check
+        validator = self.validator
+        if "$ref" in schema and type(validator).__name__ in _IGNORE_REF_SIBLINGS:
+            items = [("$ref", schema["$ref"])]
+        else:
+            items = schema.items()
+        keywords = []
+        for k, v in items:
+            if (fn := validator.VALIDATORS.get(k)) is None:
+                continue
+            if k == "$ref" and isinstance(v, str):
+                resolved = self.resolver.resolve(v.strip("#"))
+                keywords.append((k, v, _REF, self._compile(resolved)))
+            elif k == "properties" and isinstance(v, dict):
+                properties = {p: self._compile(s) for p, s in v.items()}
+                keywords.append((k, v, _PROPERTIES, properties))
+            elif k == "items" and isinstance(v, dict) and "prefixItems" not in schema:
+                keywords.append((k, v, _ITEMS, self._compile(v)))
+            else:
+                keywords.append((k, v, fn, None))
+        check.keywords = tuple(keywords)
+        return check
+
+    def _walk(self, instance, check: _Check, node: _Node, item_node: _Node, errors):
+        """Validate the instance appending the errors,
+        and return the annotated instance."""
+        ld = instance
+        if node is not None and isinstance(instance, dict):
+            node = node.select(instance)
+            ld = dict(instance)
+            if node.jtype:
+                ld["@type"] = node.jtype
+            actions = self._actions[id(node)]
+            pending = dict(actions) if actions else None
+        else:
+            actions = pending = None
+        if not isinstance(check.schema, dict):
+            errors.extend(
+                self.validator.evolve(schema=check.schema).iter_errors(instance)
+            )
+        else:
+            ld = self._check_keywords(
+                instance, check, actions, pending, item_node, ld, errors
+            )
+        if not pending:
+            return ld
+        # Annotate the sub-entries that were not validated.
+        for k, (is_array, subnode) in pending.items():
+            v = ld.get(k)
+            if is_array:
+                if isinstance(v, list):
+                    ld[k] = [subnode.copy(i) if isinstance(i, dict) else i for i in v]
+            elif isinstance(v, dict):
+                ld[k] = subnode.copy(v)
+        return ld
+
+    def _check_keywords(self, instance, check, actions, pending, item_node, ld, errors):
+        validator = self.validator
+        schema = check.schema
+        for k, v, fn, compiled in check.keywords:
+            start = len(errors)
+            if fn is _REF:
+                ld = self._check_keywords(
+                    instance, compiled, actions, pending, item_node, ld, errors
+                )
+            elif fn is _PROPERTIES:
+                if not validator.is_type(instance, "object"):
+                    continue
+                for p, subcheck in compiled.items():
+                    if p not in instance:
+                        continue
+                    child = len(errors)
+                    if actions and p in actions:
+                        is_array, subnode = actions[p]
+                        value = self._walk(
+                            instance[p],
+                            subcheck,
+                            None if is_array else subnode,
+                            subnode if is_array else None,
+                            errors,
+                        )
+                        if value is not instance[p]:
+                            ld[p] = value
+                            pending.pop(p, None)
+                    else:
+                        self._walk(instance[p], subcheck, None, None, errors)
+                    if len(errors) > child:
+                        for error in errors[child:]:
+                            error.path.appendleft(p)
+                            error.schema_path.appendleft(p)
+            elif fn is _ITEMS:
+                if not validator.is_type(instance, "array"):
+                    continue
+                items = []
+                for index, item in enumerate(instance):
+                    child = len(errors)
+                    items.append(self._walk(item, compiled, item_node, None, errors))
+                    if len(errors) > child:
+                        for error in errors[child:]:
+                            error.path.appendleft(index)
+                if item_node is not None:
+                    ld = items
+            else:
+                errors.extend(fn(validator, v, instance, schema) or ())
+            if len(errors) == start:
+                continue
+            for i in range(start, len(errors)):
+                error = errors[i] = _located(errors[i], k, v, instance, schema)
+                if k not in {"if", "$ref"}:
+                    error.schema_path.appendleft(k)
+        return ld
+
+    def annotate_errors(
+        self, instance: Dict, with_context: bool = True, context_url: str = None
+    ) -> Tuple[Dict, List]:
+        """Return the JSON-LD version of the instance and
+        the list of `jsonschema.ValidationError`s, in the same order
+        of `iter_errors`.
+
+        The result shares with the instance the entries
+        that are not annotated, like Plan.annotate.
+        """
+        errors = []
+        ld = self._walk(instance, self._check, self.plan._root, None, errors)
+        if with_context and self.plan._context is not None and isinstance(ld, dict):
+            ld[CTX] = context_url or self.plan._context
+        return ld, errors
+
+    def annotate(
+        self, instance: Dict, with_context: bool = True, context_url: str = None
+    ) -> Dict:
+        """Return the JSON-LD version of a valid instance.
+
+        :raises jsonschema.ValidationError: the first error,
+            like `Validator.validate`.
+        """
+        ld, errors = self.annotate_errors(instance, with_context, context_url)
+        if errors:
+            raise errors[0]
+        return ld
+
+
+def compile_validating(
+    schemas: Dict,
+    schema_name: str,
+    cls=None,
+    format_checker=None,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    cache: ContextCache = None,
+) -> ValidatingPlan:
+    """Compile a schema into a ValidatingPlan.
+
+    :param cls: the `jsonschema` validator class, by default
+        Draft4Validator, which is the closest to OAS 3.0 schemas.
+    :param format_checker: passed to the validator.
+    See `compile()` for the other parameters.
+    """
+    import jsonschema
+
+    resolver = resolver or RefResolver(schemas)
+    plan = compile(
+        schemas, schema_name, safe_mode=safe_mode, resolver=resolver, cache=cache
+    )
+    if schema_name.startswith("#"):
+        schema = resolver.resolve(schema_name.strip("#"))
+    else:
+        schema = schemas[schema_name]
+    cls = cls or jsonschema.Draft4Validator
+    # The keywords not walked here resolve their `$ref`s
+    # via jsonschema, using the documents already loaded.
+    validator = _store_validator(
+        cls, schema, dict(resolver.documents), format_checker=format_checker
+    )
+    return ValidatingPlan(plan, validator, resolver)
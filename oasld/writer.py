@@ -0,0 +1,119 @@
+"""Write the JSON-LD of instances as bytes in a single pass.
+
+The output is the one of `json.dumps(plan.annotate(instance))`:
+only the annotated dicts are copied by `_Node.copy`, the whole
+document is encoded with one call of the C encoder, and the @context
+is encoded once per WriterPlan and spliced into the output.
+"""
+
+import json
+import threading
+from json.encoder import c_make_encoder, encode_basestring_ascii
+from typing import Dict
+
+from .core import CTX, ContextCache, Plan, RefResolver, compile
+
+if c_make_encoder is not None:
+    _default = json.JSONEncoder().default
+    # The C encoders with the default arguments of json.dumps, built
+    # once per thread: the markers dict detecting the circular
+    # references cannot be shared while encoding.
+    _encoders = threading.local()
+
+    def _dumps(value) -> str:
+        try:
+            markers, encoder = _encoders.value
+        except AttributeError:
+            markers = {}
+            encoder = c_make_encoder(
+                markers,
+                _default,
+                encode_basestring_ascii,
+                None,
+                ": ",
+                ", ",
+                False,
+                False,
+                True,
+            )
+            _encoders.value = markers, encoder
+        try:
+            return "".join(encoder(value, 0))
+        except BaseException:
+            # The encoder does not remove the markers on errors.
+            markers.clear()
+            raise
+
+else:  # pragma: no cover
+    _dumps = json.dumps
+
+
+class WriterPlan:
+    """Write the JSON-LD of instances of a schema.
+
+    Create it with `compile_writer()`.
+    """
+
+    def __init__(self, plan: Plan) -> None:
+        self.plan = plan
+        # The encoded @context, by context_url.
+        self._contexts = {}
+
+    @property
+    def schema_name(self) -> str:
+        return self.plan.schema_name
+
+    @property
+    def fingerprint(self) -> str:
+        return self.plan.fingerprint
+
+    def _context(self, context_url: str = None) -> str:
+        if (ret := self._contexts.get(context_url)) is None:
+            ret = self._contexts[context_url] = _dumps(
+                context_url or self.plan._context
+            )
+        return ret
+
+    def dumps(
+        self, instance: Dict, with_context: bool = True, context_url: str = None
+    ) -> bytes:
+        """Return the JSON-LD of the instance,
+        i.e. `json.dumps(plan.annotate(instance, ...)).encode()`.
+
+        :param with_context: see `Plan.annotate`.
+        :param context_url: see `Plan.annotate`.
+        """
+        ld = self.plan._root.copy(instance)
+        if not with_context or self.plan._context is None:
+            return _dumps(ld).encode()
+        if CTX in ld:
+            # Keep the position of the @context of the instance.
+            ld[CTX] = context_url or self.plan._context
+            return _dumps(ld).encode()
+        text = _dumps(ld)
+        sep = ", " if ld else ""
+        return f'{text[:-1]}{sep}"{CTX}": {self._context(context_url)}}}'.encode()
+
+    def dump(
+        self, instance: Dict, fp, with_context: bool = True, context_url: str = None
+    ) -> int:
+        """Write the JSON-LD of the instance to a binary file,
+        see `dumps`, and return the number of bytes written."""
+        data = self.dumps(instance, with_context=with_context, context_url=context_url)
+        fp.write(data)
+        return len(data)
+
+
+def compile_writer(
+    schemas: Dict,
+    schema_name: str,
+    safe_mode: bool = True,
+    resolver: RefResolver = None,
+    cache: ContextCache = None,
+) -> WriterPlan:
+    """Compile a schema into a WriterPlan, see `compile()` for the parameters."""
+    return WriterPlan(
+        compile(
+            schemas, schema_name, safe_mode=safe_mode, resolver=resolver, cache=cache
+        )
+    )
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+import rdflib.compare
+from rdflib import Graph
+
+import oasld
+from benchmarks import run, synthetic
+from oasld import Instance, RefResolver
+
+
+def _graph(ld):
+    g = Graph()
+    g.parse(data=json.dumps(ld), format="application/ld+json")
+    return rdflib.compare.to_isomorphic(g)
+
+
+@pytest.mark.parametrize(
+    "name, schemas, schema_name, instance", list(synthetic.shapes())
+)
+def test_synthetic_shapes(name, schemas, schema_name, instance):
+    i = Instance(instance, schemas[schema_name])
+    i.safe_mode = False
+    i.process_instance(resolver=RefResolver(schemas))
+
+    plan = oasld.compile(schemas, schema_name, safe_mode=False)
+    assert _graph(plan.annotate(instance)) == _graph(i.ld)
+
+
+def test_compare():
+    baseline = {"results": {"a": {"min": 1.0}, "b": {"min": 1.0}, "c": {"min": 1}}}
+    results = {"results": {"a": {"min": 1.1}, "b": {"min": 1.5}, "d": {"min": 9}}}
+
+    assert [
+        (name, regressed)
+        for name, _, _, _, regressed in run.compare(baseline, results, 1.2)
+    ] == [("a", False), ("b", True)]
+    assert run.report_regressions(baseline, results, 1.2) == 1
+    assert run.report_regressions(baseline, baseline, 1.2) == 0
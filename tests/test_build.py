@@ -0,0 +1,178 @@
+import json
+import os
+
+import pytest
+import yaml
+
+import oasld
+from oasld.build import Build
+
+A = {
+    "openapi": "3.0.3",
+    "components": {
+        "schemas": {
+            "Person": {
+                "type": "object",
+                "x-jsonld-type": "Person",
+                "x-jsonld-context": {"@vocab": "https://w3id.org/person/"},
+                "properties": {
+                    "name": {"type": "string"},
+                    "birthplace": {"$ref": "b.yaml#/components/schemas/Place"},
+                },
+            },
+            "Other": {
+                "type": "object",
+                "x-jsonld-context": {"@vocab": "https://w3id.org/other/"},
+                "properties": {"id": {"type": "string"}},
+            },
+        }
+    },
+}
+B = {
+    "openapi": "3.0.3",
+    "components": {
+        "schemas": {
+            "Place": {
+                "type": "object",
+                "x-jsonld-type": "Place",
+                "x-jsonld-context": {"@vocab": "https://w3id.org/place/"},
+                "properties": {"city": {"type": "string"}},
+            }
+        }
+    },
+}
+PERSON = ("a.yaml", "#/components/schemas/Person")
+OTHER = ("a.yaml", "#/components/schemas/Other")
+PLACE = ("b.yaml", "#/components/schemas/Place")
+
+
+def _write(path, document):
+    """Write a document, making sure that its mtime changes."""
+    mtime = path.stat().st_mtime_ns + 10**9 if path.exists() else None
+    path.write_text(yaml.safe_dump(document))
+    if mtime:
+        os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write(tmp_path / "a.yaml", A)
+    _write(tmp_path / "b.yaml", B)
+    return tmp_path
+
+
+def test_build_compiles_all_components(tree):
+    build = Build(["."])
+
+    assert build.build() == {PERSON, OTHER, PLACE}
+    assert build.dependencies[PERSON] == {PLACE}
+    assert not build.errors
+    person = build.plans[PERSON].annotate({"birthplace": {"city": "Roma"}})
+    assert person["@context"]["birthplace"]["@context"]["@vocab"] == (
+        "https://w3id.org/place/"
+    )
+
+
+def test_update_dependency(tree):
+    build = Build(["."])
+    build.build()
+    fingerprint = build.plans[PERSON].fingerprint
+
+    assert build.update() == set()
+
+    b = json.loads(json.dumps(B))
+    b["components"]["schemas"]["Place"]["x-jsonld-context"]["city"] = "hasTown"
+    _write(tree / "b.yaml", b)
+
+    assert build.changed_files() == {"b.yaml"}
+    assert build.update() == {PERSON, PLACE}
+    assert build.plans[PERSON].fingerprint != fingerprint
+    assert build.plans[PERSON].context["birthplace"]["@context"]["city"] == "hasTown"
+
+
+def test_update_single_component(tree):
+    build = Build(["a.yaml"])
+    build.build()
+    assert set(build.plans) == {PERSON, OTHER}
+
+    a = json.loads(json.dumps(A))
+    a["components"]["schemas"]["Other"]["x-jsonld-type"] = "Other"
+    _write(tree / "a.yaml", a)
+
+    assert build.update() == {OTHER}
+
+
+def test_update_touched_file(tree):
+    build = Build(["."])
+    build.build()
+    _write(tree / "b.yaml", B)
+
+    assert build.update() == set()
+
+
+def test_update_removed_component(tree):
+    build = Build(["."])
+    build.build()
+    b = json.loads(json.dumps(B))
+    del b["components"]["schemas"]["Place"]
+    _write(tree / "b.yaml", b)
+
+    assert build.update() == {PERSON}
+    assert PLACE not in build.plans
+    assert "RefResolutionError" in build.errors[PERSON]
+
+
+def test_build_records_errors(tree):
+    a = json.loads(json.dumps(A))
+    # A nested context overwriting the one of the super-schema.
+    a["components"]["schemas"]["Person"]["x-jsonld-context"]["birthplace"] = {
+        "@context": {"city": "hasTown"}
+    }
+    _write(tree / "a.yaml", a)
+
+    build = Build(["."])
+    build.build()
+    assert set(build.errors) == {PERSON}
+    assert OTHER in build.plans
+
+    build = Build(["."], safe_mode=False)
+    build.build()
+    assert not build.errors
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_build_records_malformed_schemas(tree, jobs):
+    a = json.loads(json.dumps(A))
+    a["components"]["schemas"]["Person"]["properties"] = ["name"]
+    _write(tree / "a.yaml", a)
+
+    build = Build(["."], jobs=jobs)
+    build.build()
+    assert build.errors[PERSON].startswith("AttributeError")
+    assert {OTHER, PLACE} <= set(build.plans)
+
+
+def test_build_jobs(tree):
+    serial, parallel = Build(["."]), Build(["."], jobs=2)
+    serial.build()
+    parallel.build()
+
+    assert set(parallel.plans) == set(serial.plans)
+    for component, plan in serial.plans.items():
+        assert parallel.plans[component].fingerprint == plan.fingerprint
+        assert parallel.plans[component].context == plan.context
+    assert parallel.index() == serial.index()
+
+
+def test_cli_build(tree, capsys):
+    base_url = "https://api.example/contexts/"
+    assert oasld.main(["build", ".", "-o", "ctx", "--base-url", base_url]) == 0
+
+    index = json.loads((tree / "ctx" / "index.json").read_text())
+    assert set(index) == {"a.yaml", "b.yaml"}
+    url = index["a.yaml"]["#/components/schemas/Person"]["context"]
+    assert url.startswith(base_url)
+    saved = json.loads((tree / "ctx" / url[len(base_url) :]).read_text())  # noqa: E203
+    assert saved["@context"]["@vocab"] == "https://w3id.org/person/"
+    assert "a.yaml#/components/schemas/Other ok" in capsys.readouterr().out
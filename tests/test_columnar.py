@@ -0,0 +1,118 @@
+import array
+import itertools
+
+import pytest
+from rdflib import BNode, Graph
+from rdflib.compare import isomorphic
+from test_compose import PETS
+
+import oasld
+from benchmarks import synthetic
+from oasld import sample_schema
+from oasld.columnar import compile_columnar, records_to_columns
+
+BIRTHPLACES = [
+    {"city": "Roma", "province": "RM", "country": "ITA"},
+    {"city": "Milano", "province": "MI", "country": "ITA", "interno": "8"},
+    {"city": "Paris", "country": "FRA"},
+    {"city": None, "province": "TO", "country": "ITA"},
+]
+
+
+def _bnodes():
+    counter = itertools.count()
+    return lambda label=None: BNode(f"b{next(counter)}")
+
+
+def _row_wise(plan, records):
+    bnode = _bnodes()
+    return [t for r in records for t in plan.triples(r, bnode=bnode)]
+
+
+def test_columnar_birthplace():
+    plan = oasld.compile(sample_schema, "BirthPlace")
+    columnar = compile_columnar(sample_schema, "BirthPlace")
+    columns = records_to_columns(BIRTHPLACES)
+
+    assert columnar.triples(columns, bnode=_bnodes()) == _row_wise(plan, BIRTHPLACES)
+
+
+def test_columnar_ids():
+    schemas, schema_name = synthetic.level_schemas(0, 5, arrays=False)
+    records = [synthetic.instance(0, 5, 0, path=f"n{i}") for i in range(20)]
+    plan = oasld.compile(schemas, schema_name)
+    columnar = compile_columnar(schemas, schema_name)
+
+    assert columnar.triples(records_to_columns(records)) == _row_wise(plan, records)
+
+
+def test_columnar_one_of_branches():
+    """The records of each branch use its context."""
+    records = [
+        {"kind": "dog", "name": "Rex"},
+        {"id": "https://example.org/tom", "kind": "cat", "name": "Tom"},
+        {"kind": "fish", "name": "Nemo"},
+        {"kind": "dog", "name": "Fido"},
+    ]
+    plan = oasld.compile(PETS, "Pet")
+    columnar = compile_columnar(PETS, "Pet")
+
+    triples = columnar.triples(records_to_columns(records), bnode=_bnodes())
+    assert triples == _row_wise(plan, records)
+
+
+def test_columnar_types_and_numbers():
+    schemas = {
+        "Item": {
+            "type": "object",
+            "x-jsonld-context": {
+                "@vocab": "https://example.org/",
+                "@base": "https://example.org/item/",
+                "id": "@id",
+                "type": "@type",
+                "price": {"@type": "http://www.w3.org/2001/XMLSchema#decimal"},
+                "tags": {"@container": "@list"},
+            },
+            "properties": {"id": {"type": "string"}},
+        }
+    }
+    records = [
+        {"id": "1", "type": "Item", "price": 1.5, "count": 3, "ok": True},
+        {"id": "2", "type": ["Item", "Other"], "price": 2, "count": 1, "ok": 1},
+        {"id": "_:x", "type": None, "alias": ["a", "b"], "tags": ["c", "d"]},
+    ]
+    plan = oasld.compile(schemas, "Item")
+    columnar = compile_columnar(schemas, "Item")
+    triples = columnar.triples(records_to_columns(records))
+
+    expected = Graph()
+    for t in _row_wise(plan, records):
+        expected.add(t)
+    actual = Graph()
+    for t in triples:
+        actual.add(t)
+    assert isomorphic(actual, expected)
+
+
+def test_columnar_arrays():
+    """Array-backed columns are converted to lists once."""
+    schemas = {
+        "Point": {
+            "type": "object",
+            "x-jsonld-context": {"@vocab": "https://example.org/"},
+        }
+    }
+    columnar = compile_columnar(schemas, "Point")
+    plan = oasld.compile(schemas, "Point")
+    columns = {"x": array.array("d", [1.0, 2.5]), "y": array.array("q", [3, 4])}
+    records = [{"x": 1.0, "y": 3}, {"x": 2.5, "y": 4}]
+
+    assert columnar.triples(columns, bnode=_bnodes()) == _row_wise(plan, records)
+
+
+def test_columnar_lengths():
+    columnar = compile_columnar(sample_schema, "BirthPlace")
+
+    with pytest.raises(ValueError):
+        columnar.triples({"city": ["Roma"], "country": []})
+    assert columnar.triples({}) == []
@@ -0,0 +1,162 @@
+import json
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+import rdflib.compare
+import yaml
+from rdflib import Graph
+
+import oasld
+from oasld import Instance, RefResolver, sample_schema
+
+DATADIR = Path(__file__).parent
+SCHEMAS_YAML = yaml.safe_load((DATADIR.parent / "schemas.yaml").read_text())
+
+testfiles = [yaml.safe_load(x.read_text()) for x in DATADIR.glob("section*.oas3.yaml")]
+testschemas = [
+    (f"#/components/schemas/{schema_name}", schema_content, f)
+    for f in testfiles
+    for schema_name, schema_content in f["components"]["schemas"].items()
+    if schema_content.get("x-rdf")
+]
+
+
+def _graph(ld):
+    g = Graph()
+    g.parse(data=json.dumps(ld), format="application/ld+json")
+    return rdflib.compare.to_isomorphic(g)
+
+
+def test_plan_matches_instance():
+    example = sample_schema["Person"]["example"]
+    plan = oasld.compile(sample_schema, "Person")
+
+    expected = oasld.process_schema("Person", sample_schema).ld
+    assert plan.annotate(example) == expected
+    # The plan is reusable and does not modify the instance.
+    assert plan.annotate(example) == expected
+    assert "@type" not in example
+
+
+@pytest.mark.parametrize("schema_name", list(SCHEMAS_YAML))
+def test_plan_same_rdf_as_instance(schema_name):
+    schema = SCHEMAS_YAML[schema_name]
+    example = schema["example"]
+
+    i = Instance(example, schema)
+    i.safe_mode = False
+    i.process_instance(resolver=RefResolver(SCHEMAS_YAML))
+
+    plan = oasld.compile(SCHEMAS_YAML, schema_name, safe_mode=False)
+    assert _graph(plan.annotate(example)) == _graph(i.ld)
+
+
+@pytest.mark.parametrize("schema_name, schema_content, schemas", testschemas)
+def test_plan_oas_annotated_schemas(schema_name, schema_content, schemas):
+    plan = oasld.compile(schemas, schema_name)
+    ld = plan.annotate(schema_content["example"])
+
+    g_expected = Graph()
+    g_expected.parse(data=schema_content["x-rdf"], format="text/turtle")
+    assert _graph(ld) == rdflib.compare.to_isomorphic(g_expected)
+
+
+def test_plan_cyclic_schema():
+    plan = oasld.compile(SCHEMAS_YAML, "Person")
+    instance = {"email": "mailto:a@example"}
+    node = instance
+    for depth in range(50):
+        node["children"] = [{"email": f"mailto:{depth}@example"}]
+        node = node["children"][0]
+
+    ld = plan.annotate(instance)
+    node = ld
+    while node.get("children"):
+        assert node["@type"] == "Person"
+        node = node["children"][0]
+    assert node["@type"] == "Person"
+
+
+def test_plan_shares_untouched_entries():
+    example = sample_schema["Person"]["example"]
+    plan = oasld.compile(sample_schema, "Person")
+    ld = plan.annotate(example)
+
+    assert "@type" not in example
+    assert "@type" not in example["birthplace"]
+    assert ld["birthplace"] is not example["birthplace"]
+    assert ld["children"][0] is not example["children"][0]
+    # The @context is shared between the annotated instances.
+    assert ld["@context"] is plan.annotate({})["@context"]
+
+
+def test_plan_shares_untouched_subtrees():
+    plan = oasld.compile(sample_schema, "BirthPlace")
+    instance = {"city": "Roma", "extra": {"nested": [1, 2, 3]}}
+    ld = plan.annotate(instance)
+
+    assert ld["extra"] is instance["extra"]
+    assert "@type" not in instance
+
+
+def test_plan_annotate_inplace():
+    instance = deepcopy(sample_schema["Person"]["example"])
+    plan = oasld.compile(sample_schema, "Person")
+    expected = plan.annotate(instance)
+
+    ld = plan.annotate(instance, inplace=True)
+    assert ld is instance
+    assert ld == expected
+    assert instance["birthplace"]["@type"] == "https://w3id.org/italia/onto/CLV/Feature"
+
+
+def test_instance_inplace():
+    instance = deepcopy(sample_schema["Person"]["example"])
+    expected = oasld.process_schema("Person", sample_schema).ld
+
+    i = Instance(instance, sample_schema["Person"], inplace=True)
+    i.safe_mode = False
+    i.process_instance(resolver=RefResolver(sample_schema))
+    assert i.ld is instance
+    assert instance == expected
+
+
+def test_plan_context_is_a_copy():
+    plan = oasld.compile(sample_schema, "BirthPlace")
+    plan.context["city"] = "modified"
+
+    assert plan.annotate({"city": "Roma"})["@context"]["city"] == "hasCity"
+
+
+def test_plan_nested_context_safe_mode():
+    with pytest.raises(ValueError):
+        oasld.compile(SCHEMAS_YAML, "ContextPerson")
+
+
+def test_annotate_many():
+    instances = [{"email": f"mailto:{i}@example"} for i in range(3)]
+    plan = oasld.compile(sample_schema, "Person")
+
+    documents = list(oasld.annotate_many(instances, "Person", sample_schema))
+    assert documents == [plan.annotate(i) for i in instances]
+    assert documents[0]["@context"] is documents[2]["@context"]
+    assert "@type" not in instances[0]
+
+
+def test_annotate_many_without_context():
+    instances = ({"email": f"mailto:{i}@example"} for i in range(3))
+
+    context, documents = oasld.annotate_many(
+        instances, "Person", sample_schema, with_context=False
+    )
+    assert context == oasld.compile(sample_schema, "Person").context
+    assert [d["email"] for d in documents] == [f"mailto:{i}@example" for i in range(3)]
+
+
+def test_annotate_many_shares_resolver():
+    resolver = RefResolver(sample_schema)
+    instances = [sample_schema["Person"]["example"]] * 10
+
+    list(oasld.annotate_many(instances, "Person", sample_schema, resolver=resolver))
+    assert resolver.cache_info()["misses"] == 2
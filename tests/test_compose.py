@@ -0,0 +1,332 @@
+import json
+
+import pytest
+from rdflib import RDF, Graph, URIRef
+from rdflib.compare import isomorphic
+
+import oasld
+from oasld import CTX
+from oasld.lint import lint
+from oasld.writer import WriterPlan
+
+SCHEMAS = {
+    "Animal": {
+        "type": "object",
+        "x-jsonld-context": {"@vocab": "https://example.org/zoo#", "id": "@id"},
+        "properties": {"id": {"type": "string"}, "kind": {"type": "string"}},
+        "discriminator": {"propertyName": "kind", "mapping": {"dog": "#/Dog"}},
+        "oneOf": [{"$ref": "#/Dog"}, {"$ref": "#/Cat"}],
+    },
+    "Named": {
+        "x-jsonld-context": {"name": "https://schema.org/name"},
+        "properties": {"name": {"type": "string"}},
+    },
+    "Dog": {
+        "allOf": [
+            {"$ref": "#/Named"},
+            {
+                "type": "object",
+                "x-jsonld-type": "Dog",
+                "properties": {"owner": {"$ref": "#/Person"}},
+            },
+        ]
+    },
+    "Cat": {
+        "type": "object",
+        "x-jsonld-type": "Cat",
+        "properties": {"lives": {"type": "integer"}},
+    },
+    "Person": {
+        "type": "object",
+        "x-jsonld-type": "Person",
+        "x-jsonld-context": {"@vocab": "https://example.org/people#"},
+    },
+    "Kennel": {
+        "type": "object",
+        "x-jsonld-type": "Kennel",
+        "x-jsonld-context": {"@vocab": "https://example.org/kennel#"},
+        "properties": {
+            "animals": {"type": "array", "items": {"$ref": "#/Animal"}},
+        },
+    },
+}
+
+# Branches mapping the same properties with a different @vocab.
+PETS = {
+    "Pet": {
+        "x-jsonld-context": {"id": "@id"},
+        "oneOf": [
+            {
+                "type": "object",
+                "x-jsonld-type": "Dog",
+                "x-jsonld-context": {"@vocab": "https://example.org/dog#"},
+                "properties": {"kind": {"const": "dog"}, "name": {}},
+            },
+            {
+                "type": "object",
+                "x-jsonld-type": "Cat",
+                "x-jsonld-context": {"@vocab": "https://example.org/cat#"},
+                "properties": {"kind": {"const": "cat"}, "name": {}},
+            },
+        ],
+    },
+    "Pets": {
+        "type": "object",
+        "x-jsonld-context": {"@vocab": "https://example.org/pets#"},
+        "properties": {"pets": {"type": "array", "items": {"$ref": "#/Pet"}}},
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "instance, jtype",
+    [
+        ({"kind": "dog", "name": "Rex"}, "Dog"),
+        ({"kind": "Cat", "lives": 9}, "Cat"),
+        ({"kind": "Dog", "name": "Rex"}, "Dog"),
+        ({"kind": "fish"}, None),
+        ({"name": "Rex"}, None),
+    ],
+)
+def test_one_of_discriminator(instance, jtype):
+    plan = oasld.compile(SCHEMAS, "Animal")
+
+    ld = plan.annotate(instance)
+
+    assert ld.get("@type") == jtype
+
+
+def test_all_of_context():
+    plan = oasld.compile(SCHEMAS, "Animal")
+    instance = {
+        "id": "https://example.org/rex",
+        "kind": "dog",
+        "name": "Rex",
+        "owner": {"name": "Alice"},
+    }
+
+    ld = plan.annotate(instance)
+
+    assert ld["owner"] == {"name": "Alice", "@type": "Person"}
+    assert ld[CTX]["Dog"][CTX]["name"] == "https://schema.org/name"
+    assert ld[CTX]["owner"] == {CTX: {"@vocab": "https://example.org/people#"}}
+    triples = {(str(s), str(p), str(o)) for s, p, o in plan.triples(instance)}
+    assert (
+        "https://example.org/rex",
+        str(RDF.type),
+        "https://example.org/zoo#Dog",
+    ) in (triples)
+    assert ("https://example.org/rex", "https://schema.org/name", "Rex") in triples
+
+
+def test_one_of_array_items():
+    plan = oasld.compile(SCHEMAS, "Kennel")
+    instance = {"animals": [{"kind": "dog"}, {"kind": "Cat"}, {"kind": "dog"}]}
+
+    ld = plan.annotate(instance)
+
+    assert [a["@type"] for a in ld["animals"]] == ["Dog", "Cat", "Dog"]
+    assert WriterPlan(plan).dumps(instance) == json.dumps(ld).encode()
+    types = {o for _, p, o in plan.triples(instance) if p == RDF.type}
+    assert URIRef("https://example.org/zoo#Cat") in types
+
+
+@pytest.mark.parametrize("safe_mode", [True, False])
+def test_one_of_branch_contexts(safe_mode):
+    """Each branch maps its properties with its own @vocab."""
+    plan = oasld.compile(PETS, "Pet", safe_mode=safe_mode)
+    instance = {"id": "https://example.org/rex", "kind": "dog", "name": "Rex"}
+
+    assert plan.to_ntriples(instance).splitlines() == [
+        "<https://example.org/rex> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <https://example.org/dog#Dog> .",
+        '<https://example.org/rex> <https://example.org/dog#kind> "dog" .',
+        '<https://example.org/rex> <https://example.org/dog#name> "Rex" .',
+    ]
+    plan = oasld.compile(PETS, "Pets", safe_mode=safe_mode)
+    instance = {
+        "pets": [{"kind": "cat", "name": "Tom"}, {"kind": "dog", "name": "Rex"}]
+    }
+    triples = set(plan.triples(instance))
+    assert {
+        (str(p), str(o))
+        for _, p, o in triples
+        if p != URIRef("https://example.org/pets#pets")
+    } == {
+        (str(RDF.type), "https://example.org/cat#Cat"),
+        ("https://example.org/cat#kind", "cat"),
+        ("https://example.org/cat#name", "Tom"),
+        (str(RDF.type), "https://example.org/dog#Dog"),
+        ("https://example.org/dog#kind", "dog"),
+        ("https://example.org/dog#name", "Rex"),
+    }
+    graph = Graph().parse(data=json.dumps(plan.annotate(instance)), format="json-ld")
+    expected = Graph()
+    for t in triples:
+        expected.add(t)
+    assert isomorphic(graph, expected)
+
+
+def test_const_discriminator():
+    schemas = {
+        "Shape": {
+            "x-jsonld-context": {"@vocab": "https://example.org/shapes#"},
+            "anyOf": [
+                {
+                    "type": "object",
+                    "x-jsonld-type": "Circle",
+                    "properties": {"shape": {"const": "circle"}},
+                },
+                {
+                    "type": "object",
+                    "x-jsonld-type": "Square",
+                    "properties": {"shape": {"enum": ["square"]}},
+                },
+            ],
+        }
+    }
+    plan = oasld.compile(schemas, "Shape")
+
+    assert plan.annotate({"shape": "square"})["@type"] == "Square"
+    assert plan.annotate({"shape": "circle"})["@type"] == "Circle"
+
+
+def test_inheritance_mapping():
+    """A base schema mapping the schemas that extend it with allOf."""
+    schemas = {
+        "Pet": {
+            "type": "object",
+            "x-jsonld-context": {"@vocab": "https://example.org/pets#"},
+            "properties": {"petType": {"type": "string"}},
+            "discriminator": {
+                "propertyName": "petType",
+                "mapping": {"dog": "#/Dog", "cat": "#/Cat"},
+            },
+        },
+        "Dog": {
+            "allOf": [{"$ref": "#/Pet"}, {"x-jsonld-type": "Dog"}],
+        },
+        "Cat": {
+            "allOf": [{"$ref": "#/Pet"}, {"x-jsonld-type": "Cat"}],
+        },
+    }
+    plan = oasld.compile(schemas, "Pet")
+
+    assert plan.annotate({"petType": "cat"})["@type"] == "Cat"
+    assert oasld.compile(schemas, "Dog").annotate({})["@type"] == "Dog"
+
+
+@pytest.mark.parametrize(
+    "member, message",
+    [
+        ({"x-jsonld-type": "Other"}, "Conflicting x-jsonld-type"),
+        (
+            {"x-jsonld-context": {"name": "https://example.org/name"}},
+            "Conflicting definitions of term name",
+        ),
+        (
+            {"properties": {"name": {"type": "object"}}},
+            "Conflicting schemas for property name",
+        ),
+        (
+            {"properties": {"name": {"type": "integer"}}},
+            "Conflicting schemas for property name",
+        ),
+        (
+            {"properties": {"name": {"type": "string", "x-jsonld-type": "@id"}}},
+            "Conflicting schemas for property name",
+        ),
+    ],
+)
+def test_all_of_conflicts(member, message):
+    schemas = {
+        "Named": SCHEMAS["Named"],
+        "Thing": {
+            "allOf": [{"$ref": "#/Named"}, {"x-jsonld-type": "Thing"}, member],
+        },
+    }
+
+    with pytest.raises(ValueError, match=message):
+        oasld.compile(schemas, "Thing")
+    # The first definition wins.
+    plan = oasld.compile(schemas, "Thing", safe_mode=False)
+    assert plan.annotate({"name": "x"})["@type"] == "Thing"
+    assert plan.context["name"] == "https://schema.org/name"
+    assert [f.kind for f in lint(schemas)] == ["context"]
+
+
+def test_all_of_typed_base():
+    """The x-jsonld-type of a schema overrides the one of its base."""
+    schemas = {
+        "Pet": {
+            "type": "object",
+            "x-jsonld-type": "Pet",
+            "x-jsonld-context": {"@vocab": "https://example.org/pets#"},
+            "properties": {"name": {"type": "string"}},
+        },
+        "Dog": {
+            "x-jsonld-type": "Dog",
+            "allOf": [
+                {"$ref": "#/Pet"},
+                {"properties": {"name": {"type": "string"}}},
+            ],
+        },
+    }
+
+    plan = oasld.compile(schemas, "Dog")
+
+    assert plan.annotate({"name": "Rex"})["@type"] == "Dog"
+    assert oasld.compile(schemas, "Pet").annotate({})["@type"] == "Pet"
+    assert lint(schemas) == []
+
+
+def test_one_of_typed_base():
+    """The x-jsonld-type of a branch overrides the one of the schema."""
+    schemas = {
+        "Pet": {
+            "x-jsonld-type": "Pet",
+            "x-jsonld-context": {"@vocab": "https://example.org/pets#"},
+            "oneOf": [
+                {
+                    "type": "object",
+                    "x-jsonld-type": "Dog",
+                    "properties": {"kind": {"const": "dog"}},
+                },
+                {
+                    "type": "object",
+                    "x-jsonld-type": "Cat",
+                    "properties": {"kind": {"const": "cat"}},
+                },
+            ],
+        }
+    }
+
+    plan = oasld.compile(schemas, "Pet")
+
+    assert plan.annotate({"kind": "cat"})["@type"] == "Cat"
+    assert plan.annotate({"kind": "dog"})["@type"] == "Dog"
+    assert plan.annotate({})["@type"] == "Pet"
+    assert lint(schemas) == []
+
+
+def test_one_of_branch_conflicts():
+    """A branch context needs a type to be scoped to."""
+    dog, cat = PETS["Pet"]["oneOf"]
+    cat = {k: v for k, v in cat.items() if k != "x-jsonld-type"}
+    schemas = {
+        "Pet": {
+            "x-jsonld-context": {"@vocab": "https://example.org/pets#"},
+            "oneOf": [dog, cat],
+        }
+    }
+
+    with pytest.raises(ValueError, match="MUST have an x-jsonld-type"):
+        oasld.compile(schemas, "Pet")
+    plan = oasld.compile(schemas, "Pet", safe_mode=False)
+    assert "https://example.org/cat#" not in json.dumps(plan.context)
+    assert plan.context["Dog"][CTX]["@vocab"] == "https://example.org/dog#"
+    triples = {(str(p), str(o)) for _, p, o in plan.triples({"kind": "dog"})}
+    assert triples == {
+        (str(RDF.type), "https://example.org/dog#Dog"),
+        ("https://example.org/dog#kind", "dog"),
+    }
+    assert [f.kind for f in lint(schemas)] == ["context"]
@@ -0,0 +1,84 @@
+import json
+from copy import deepcopy
+
+import pyld
+
+import oasld
+from oasld import ContextCache, sample_schema
+
+BASE_URL = "https://api.example/contexts/"
+
+
+def test_fingerprint_is_stable():
+    plan = oasld.compile(sample_schema, "Person")
+    assert (
+        plan.fingerprint == oasld.compile(deepcopy(sample_schema), "Person").fingerprint
+    )
+    assert plan.fingerprint != oasld.compile(sample_schema, "BirthPlace").fingerprint
+
+
+def test_fingerprint_depends_on_referenced_schemas():
+    schemas = deepcopy(sample_schema)
+    schemas["Unrelated"] = {"type": "object"}
+    person = oasld.compile(sample_schema, "Person").fingerprint
+    assert oasld.compile(schemas, "Person").fingerprint == person
+
+    schemas["BirthPlace"]["x-jsonld-context"]["city"] = "hasTown"
+    assert oasld.compile(schemas, "Person").fingerprint != person
+
+
+def test_cache_shares_context():
+    cache = ContextCache(BASE_URL)
+    p1 = oasld.compile(sample_schema, "Person", cache=cache)
+    p2 = oasld.compile(deepcopy(sample_schema), "Person", cache=cache)
+
+    assert p1.fingerprint in cache
+    assert p1.annotate({})["@context"] is p2.annotate({})["@context"]
+    assert cache.url(p1.fingerprint) == f"{BASE_URL}{p1.fingerprint}.jsonld"
+    assert cache.document(p1.fingerprint) == {"@context": p1.context}
+
+
+def test_linked_context_expands_as_embedded():
+    cache = ContextCache(BASE_URL)
+    plan = oasld.compile(sample_schema, "Person", cache=cache)
+    url = cache.url(plan.fingerprint)
+    example = sample_schema["Person"]["example"]
+
+    linked = plan.annotate(example, context_url=url)
+    assert linked["@context"] == url
+
+    def loader(requested_url, options=None):
+        assert requested_url == url
+        return {
+            "contextUrl": None,
+            "documentUrl": url,
+            "document": cache.document(plan.fingerprint),
+        }
+
+    expanded = pyld.jsonld.expand(linked, {"documentLoader": loader})
+    assert expanded == pyld.jsonld.expand(plan.annotate(example))
+
+
+def test_annotate_many_linked_context():
+    context, documents = oasld.annotate_many(
+        [{}, {}], "Person", sample_schema, with_context=False, context_url="ctx.jsonld"
+    )
+    assert context == "ctx.jsonld"
+    assert [d["@type"] for d in documents] == ["Person", "Person"]
+
+
+def test_cli_context(tmp_path, capsys):
+    schemas = tmp_path / "schemas.json"
+    schemas.write_text(json.dumps(sample_schema))
+
+    oasld.main(
+        ["context", str(schemas), "Person", "BirthPlace", "-o", str(tmp_path / "ctx")]
+    )
+
+    plan = oasld.compile(sample_schema, "Person")
+    assert capsys.readouterr().out.splitlines()[0] == (
+        f"Person {plan.fingerprint}.jsonld"
+    )
+    saved = json.loads((tmp_path / "ctx" / f"{plan.fingerprint}.jsonld").read_text())
+    assert saved == {"@context": plan.context}
+    assert len(list((tmp_path / "ctx").iterdir())) == 2
@@ -0,0 +1,129 @@
+import io
+import json
+
+import pytest
+from rdflib import BNode, Dataset, Graph, URIRef
+from rdflib.compare import isomorphic
+
+import oasld
+from oasld import sample_schema
+from oasld.cli import main
+from oasld.export import export_ntriples, export_store
+
+PERSON = sample_schema["Person"]["example"]
+
+
+def _graph(triples):
+    g = Graph()
+    for t in triples:
+        g.add(t)
+    return g
+
+
+def _people(count):
+    return [
+        {
+            "email": f"mailto:{i}@example",
+            "birthplace": {"city": "Roma", "province": "RM", "country": "ITA"},
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def plan():
+    return oasld.compile(sample_schema, "Person")
+
+
+def test_export_ntriples(plan):
+    fp = io.StringIO()
+    stats = export_ntriples([PERSON], fp, plan=plan)
+
+    g = Graph().parse(data=fp.getvalue(), format="nt")
+    assert isomorphic(g, _graph(plan.triples(PERSON)))
+    assert (stats.records, stats.triples, stats.bytes) == (
+        1,
+        len(g),
+        len(fp.getvalue()),
+    )
+
+
+def test_export_ntriples_bytes(plan):
+    fp = io.StringIO()
+    stats = export_ntriples([dict(PERSON, givenName="Zoë 日本")], fp, plan=plan)
+
+    assert "Zoë 日本" in fp.getvalue()
+    assert stats.bytes == len(fp.getvalue().encode()) > len(fp.getvalue())
+
+
+def test_export_ntriples_annotated(plan):
+    """Annotated instances parsed from JSON don't need a plan."""
+    people = _people(3)
+    annotated = [json.loads(json.dumps(plan.annotate(p))) for p in people]
+    fp = io.StringIO()
+    export_ntriples(annotated, fp)
+
+    expected = Graph()
+    for p in people:
+        for t in plan.triples(p):
+            expected.add(t)
+    assert isomorphic(Graph().parse(data=fp.getvalue(), format="nt"), expected)
+
+
+def test_export_bnodes_are_unique(plan):
+    """Each record has its own blank nodes, also across buffers."""
+    fp = io.StringIO()
+    stats = export_ntriples(_people(10), fp, plan=plan, buffer_size=1)
+
+    g = Graph().parse(data=fp.getvalue(), format="nt")
+    assert len(g) == stats.triples
+    assert len({s for s in g.subjects() if isinstance(s, BNode)}) == 10
+
+
+def test_export_nquads(plan):
+    fp = io.StringIO()
+    export_ntriples(_people(3), fp, plan=plan, graph="urn:example:person:{}")
+
+    ds = Dataset().parse(data=fp.getvalue(), format="nquads")
+    names = {str(g.identifier) for g in ds.graphs() if len(g)}
+    assert names == {f"urn:example:person:{i}" for i in range(3)}
+
+
+def test_export_store_graph(plan):
+    people = _people(10)
+    g = Graph()
+    stats = export_store(people, g, plan=plan, batch_size=7)
+
+    assert stats.records == 10
+    assert len(g) == stats.triples
+    assert len({s for s in g.subjects() if isinstance(s, BNode)}) == 10
+
+
+def test_export_store_dataset(plan):
+    ds = Dataset()
+    export_store(
+        _people(2),
+        ds,
+        plan=plan,
+        graph=lambda index, instance: instance["email"].replace("mailto:", "urn:"),
+    )
+
+    assert len(ds.graph(URIRef("urn:0@example"))) > 0
+    assert len(ds.graph(URIRef("urn:1@example"))) > 0
+
+
+def test_export_store_named_graph_requires_dataset(plan):
+    with pytest.raises(ValueError):
+        export_store(_people(1), Graph(), plan=plan, graph="urn:example:{}")
+
+
+def test_cli_export(tmp_path, capsys):
+    schemas = tmp_path / "schemas.json"
+    schemas.write_text(json.dumps(sample_schema))
+    instances = tmp_path / "people.json"
+    instances.write_text(json.dumps(_people(2)))
+
+    assert main(["export", str(schemas), "Person", "-i", str(instances)]) == 0
+    out, err = capsys.readouterr()
+    assert len(Graph().parse(data=out, format="nt")) > 0
+    assert err.startswith("2 records")
@@ -0,0 +1,109 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+ROOTDIR = Path(__file__).parent.parent
+# The cumulative `import oasld` time in microseconds, best of 5.
+IMPORT_BUDGET_US = 80_000
+HEAVY_MODULES = {
+    "argparse",
+    "concurrent.futures.process",
+    "jsonschema",
+    "multiprocessing",
+    "oasld.cli",
+    "oasld.loader",
+    "oasld.parallel",
+    "oasld.rdf",
+    "oasld.samples",
+    "pickle",
+    "pyld",
+    "rdflib",
+    "typing_extensions",
+    "yaml",
+}
+
+
+def _python(code, tmp_path, *options):
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=str(tmp_path))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=ROOTDIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_is_lazy(tmp_path):
+    out = _python(
+        "import json, sys; import oasld; print(json.dumps(sorted(sys.modules)))",
+        tmp_path,
+    ).stdout
+    assert not set(json.loads(out)) & HEAVY_MODULES
+
+
+def test_import_does_not_configure_logging(tmp_path):
+    out = _python(
+        "import logging, oasld; root = logging.getLogger();"
+        "print(root.handlers, logging.getLevelName(root.level))",
+        tmp_path,
+    ).stdout
+    assert out.split() == ["[]", "WARNING"]
+
+
+def test_lazy_names(tmp_path):
+    out = _python(
+        "import sys, oasld; oasld.sample_schema; oasld.annotate_stream;"
+        "print('oasld.samples' in sys.modules, 'oasld.rdf' in sys.modules)",
+        tmp_path,
+    ).stdout
+    assert out.split() == ["True", "False"]
+
+
+def test_import_time(tmp_path):
+    # Compile the modules first, to only measure the import.
+    _python("import oasld", tmp_path)
+    times = []
+    for _ in range(5):
+        stderr = _python("import oasld", tmp_path, "-X", "importtime").stderr
+        cumulative = re.search(r"\|\s*(\d+) \| oasld$", stderr, re.MULTILINE)
+        times.append(int(cumulative.group(1)))
+    assert min(times) < IMPORT_BUDGET_US, times
+
+
+def test_demo_fetches_the_package(tmp_path):
+    """The files fetched by demo.html make an importable oasld package."""
+    tomllib = pytest.importorskip("tomllib")
+    html = (ROOTDIR / "demo.html").read_text()
+    config = re.search(r"<py-config>(.*)</py-config>", html, re.DOTALL).group(1)
+    for fetch in tomllib.loads(textwrap.dedent(config))["fetch"]:
+        folder = tmp_path / fetch["to_folder"]
+        folder.mkdir(parents=True, exist_ok=True)
+        for name in fetch["files"]:
+            shutil.copy(ROOTDIR / fetch["from"] / name, folder / name)
+    env = dict(os.environ)
+    env.pop("PYTHONPATH", None)
+
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from oasld import RefResolver, Instance, process_schema, sample_schema;"
+            "print(process_schema('Person', sample_schema).ld['@type'], RefResolver.__module__)",
+        ],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert out.split() == ["Person", "oasld.core"]
@@ -0,0 +1,122 @@
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+import yaml
+
+import oasld
+from oasld.lint import Finding, dialect_validator, lint, lint_files
+
+DATADIR = Path(__file__).parent.parent
+
+SCHEMAS = {
+    "Person": {
+        "type": "object",
+        "x-jsonld-type": "Person",
+        "x-jsonld-context": {
+            "@vocab": "https://w3id.org/person/",
+            "birthplace": {"@context": {"city": "hasTown"}},
+        },
+        "properties": {
+            "birthplace": {"$ref": "#/Place"},
+            "address": {"$ref": "#/Missing"},
+        },
+    },
+    "Place": {
+        "type": "object",
+        "x-jsonld-type": True,
+        "x-jsonld-context": {"@vocab": "https://w3id.org/place/"},
+        "properties": {"city": {"type": "string", "x-jsonld-context": 1}},
+    },
+    "Valid": {
+        "type": "object",
+        "x-jsonld-type": "Valid",
+        "x-jsonld-context": {"@vocab": "https://w3id.org/valid/"},
+        "additionalProperties": False,
+    },
+}
+
+
+def test_vocab_is_the_specification_one():
+    assert oasld.lint.VOCAB_DIR.resolve() == (DATADIR / "vocab").resolve()
+
+
+def test_dialect_validator_is_built_once():
+    assert dialect_validator() is dialect_validator()
+
+
+def test_lint_reports_all_findings():
+    findings = lint(deepcopy(SCHEMAS), file="schemas.yaml")
+
+    assert set(findings) == {
+        Finding(
+            "schemas.yaml",
+            "#/Place/x-jsonld-type",
+            "dialect",
+            "True is not valid under any of the given schemas",
+        ),
+        Finding(
+            "schemas.yaml",
+            "#/Place/properties/city/x-jsonld-context",
+            "dialect",
+            "1 is not valid under any of the given schemas",
+        ),
+        Finding(
+            "schemas.yaml",
+            "#/Person",
+            "context",
+            "birthplace: Cannot overwrite a @context defined in the super-schema",
+        ),
+        Finding(
+            "schemas.yaml",
+            "#/Person",
+            "ref",
+            "#/Missing: Unresolvable JSON pointer: 'Missing'",
+        ),
+    }
+
+
+def test_lint_matches_compile():
+    """The context findings are the errors raised by compile in safe mode."""
+    schemas = deepcopy(SCHEMAS)
+    del schemas["Person"]["properties"]["address"]
+    with pytest.raises(ValueError, match="Cannot overwrite"):
+        oasld.compile(schemas, "Person")
+    assert [f.ref for f in lint(schemas) if f.kind == "context"] == ["#/Person"]
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        DATADIR / "schemas.yaml",
+        *sorted((DATADIR / "tests").glob("*.oas3.yaml")),
+    ],
+    ids=lambda p: p.name,
+)
+def test_lint_fixtures(path):
+    for finding in lint_files([str(path)]):
+        assert finding.kind in ("dialect", "context", "ref")
+
+
+def test_lint_files(tmp_path):
+    (tmp_path / "valid.yaml").write_text(yaml.safe_dump({"Valid": SCHEMAS["Valid"]}))
+    (tmp_path / "invalid.yaml").write_text(yaml.safe_dump(SCHEMAS))
+    (tmp_path / "broken.yaml").write_text("a: [")
+
+    findings = lint_files([str(tmp_path)])
+
+    assert {f.file for f in findings} == {
+        str(tmp_path / "invalid.yaml"),
+        str(tmp_path / "broken.yaml"),
+    }
+    assert [f.kind for f in findings if f.file.endswith("broken.yaml")] == ["load"]
+
+
+def test_cli_lint(tmp_path, capsys):
+    (tmp_path / "valid.yaml").write_text(yaml.safe_dump({"Valid": SCHEMAS["Valid"]}))
+    assert oasld.main(["lint", str(tmp_path)]) == 0
+
+    (tmp_path / "invalid.yaml").write_text(yaml.safe_dump(SCHEMAS))
+    assert oasld.main(["lint", str(tmp_path)]) == 1
+    out = capsys.readouterr().out
+    assert f"{tmp_path / 'invalid.yaml'}#/Place/x-jsonld-type: dialect: " in out
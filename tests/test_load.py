@@ -0,0 +1,160 @@
+import datetime
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+import yaml
+
+import oasld.loader
+from oasld import load_schemas
+
+DATADIR = Path(__file__).parent
+SCHEMAS_YAML = DATADIR.parent / "schemas.yaml"
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def schemas_file(tmp_path):
+    path = tmp_path / "schemas.yaml"
+    shutil.copy(SCHEMAS_YAML, path)
+    return path
+
+
+def _forbid_parsing(monkeypatch):
+    def fail(path):
+        raise AssertionError(f"{path} must be loaded from the cache")
+
+    monkeypatch.setattr(oasld.loader, "_read_yaml", fail)
+
+
+def _cache_path(path):
+    return oasld.loader._schema_cache_path(path)
+
+
+def test_load_schemas(schemas_file):
+    resolver = load_schemas(schemas_file)
+
+    assert resolver.schema == yaml.safe_load(SCHEMAS_YAML.read_text())
+    assert _cache_path(schemas_file).exists()
+    # All the references are resolved.
+    assert resolver.cache["/Person"] is resolver.schema["Person"]
+    assert resolver.cache["/BirthPlace"] is resolver.schema["BirthPlace"]
+
+
+def test_load_schemas_from_cache(schemas_file, monkeypatch):
+    expected = load_schemas(schemas_file).schema
+    _forbid_parsing(monkeypatch)
+
+    resolver = load_schemas(schemas_file)
+    assert resolver.schema == expected
+    assert resolver.resolve("/Person") is resolver.schema["Person"]
+    assert resolver.cache_info()["misses"] == 0
+
+    plan = oasld.compile(resolver.schema, "Person", resolver=resolver)
+    assert plan.annotate({"email": "mailto:a@example"})["@type"] == "Person"
+
+
+def test_load_schemas_same_content(schemas_file, monkeypatch):
+    load_schemas(schemas_file)
+    stat = schemas_file.stat()
+    os.utime(schemas_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    _forbid_parsing(monkeypatch)
+
+    assert "Person" in load_schemas(schemas_file).schema
+
+
+def test_load_schemas_changed(schemas_file):
+    load_schemas(schemas_file)
+    schemas_file.write_text("A: {type: object}\n")
+
+    assert load_schemas(schemas_file).schema == {"A": {"type": "object"}}
+
+
+def test_load_schemas_external_changed(tmp_path):
+    main = tmp_path / "main.yaml"
+    main.write_text("Person: {properties: {place: {$ref: 'common/place.yaml#/Place'}}}")
+    (tmp_path / "common").mkdir()
+    place = tmp_path / "common" / "place.yaml"
+    place.write_text("Place: {type: object}")
+
+    resolver = load_schemas(main)
+    assert set(resolver.sources) == {"", "common/place.yaml"}
+    assert resolver.cache["common/place.yaml#/Place"] == {"type": "object"}
+
+    place.write_text("Place: {type: string}")
+    resolver = load_schemas(main)
+    assert resolver.resolve("common/place.yaml#/Place") == {"type": "string"}
+
+
+def test_load_schemas_corrupted_cache(schemas_file):
+    load_schemas(schemas_file)
+    _cache_path(schemas_file).write_bytes(b"not json")
+
+    assert "Person" in load_schemas(schemas_file).schema
+    assert load_schemas(schemas_file).cache_info()["misses"] == 0
+
+
+@pytest.mark.parametrize(
+    "state",
+    [
+        [],
+        {"sources": {"": [1, 2]}},
+        {"sources": [1]},
+        {"sources": {"": [1, 2, "x"]}, "documents": {}, "refs": []},
+        {"sources": {}, "documents": {"": {}}, "refs": [None]},
+    ],
+)
+def test_load_schemas_malformed_cache(schemas_file, state):
+    """A cache with a bad entry is rebuilt."""
+    load_schemas(schemas_file)
+    if isinstance(state, dict):
+        state = {
+            "version": oasld.loader.SCHEMA_CACHE_VERSION,
+            "path": str(schemas_file.resolve()),
+            **state,
+        }
+    _cache_path(schemas_file).write_text(json.dumps(state))
+
+    assert "Person" in load_schemas(schemas_file).schema
+    assert load_schemas(schemas_file).cache_info()["misses"] == 0
+
+
+def test_load_schemas_without_cache(schemas_file):
+    load_schemas(schemas_file, cache=False)
+    assert not _cache_path(schemas_file).exists()
+
+
+def test_load_schemas_cache_location(schemas_file, cache_home):
+    load_schemas(schemas_file)
+
+    assert _cache_path(schemas_file).parent == cache_home / "oasld"
+    assert (cache_home / "oasld").stat().st_mode & 0o777 == 0o700
+    # Nothing is written next to the schemas.
+    assert sorted(os.listdir(schemas_file.parent)) == ["cache", schemas_file.name]
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="requires POSIX permissions")
+def test_load_schemas_shared_cache_dir(schemas_file, cache_home, monkeypatch):
+    """A cache directory writable by other users is not trusted."""
+    load_schemas(schemas_file)
+    (cache_home / "oasld").chmod(0o777)
+    _forbid_parsing(monkeypatch)
+
+    with pytest.raises(AssertionError, match="must be loaded from the cache"):
+        load_schemas(schemas_file)
+
+
+def test_load_schemas_not_json(tmp_path):
+    """Documents that JSON cannot represent are not cached."""
+    path = tmp_path / "dates.yaml"
+    path.write_text("A: {example: {1: 2020-01-01}}\n")
+
+    assert load_schemas(path).schema["A"]["example"] == {1: datetime.date(2020, 1, 1)}
+    assert not _cache_path(path).exists()
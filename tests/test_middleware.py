@@ -0,0 +1,289 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+import oasld
+from oasld import sample_schema
+from oasld.middleware import (
+    INLINE,
+    JSONLD,
+    LINKED,
+    PLAIN,
+    Annotator,
+    ASGIMiddleware,
+    WSGIMiddleware,
+    negotiate,
+)
+
+PERSON = sample_schema["Person"]["example"]
+PERSONS = [
+    {"email": f"mailto:{i}@example", "birthplace": {"city": "Roma"}} for i in range(20)
+]
+OAS = {
+    "paths": {
+        "/persons/{id}": {
+            "get": {
+                "responses": {
+                    "200": {
+                        "content": {
+                            "application/json": {"schema": {"$ref": "#/Person"}}
+                        }
+                    }
+                }
+            }
+        },
+        "/persons": {
+            "get": {
+                "responses": {
+                    "200": {
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "array",
+                                    "items": {"$ref": "#/Person"},
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        },
+    },
+    **sample_schema,
+}
+LINKED_ACCEPT = f'{JSONLD}; profile="http://www.w3.org/ns/json-ld#context"'
+
+
+@pytest.mark.parametrize(
+    "accept,expected",
+    [
+        ("", PLAIN),
+        ("*/*", PLAIN),
+        ("application/json", PLAIN),
+        ("text/html", PLAIN),
+        (JSONLD, INLINE),
+        (f'{JSONLD};profile="http://www.w3.org/ns/json-ld#compacted"', INLINE),
+        (LINKED_ACCEPT, LINKED),
+        (f"application/json;q=0.5, {JSONLD}", INLINE),
+        (f"application/json, {JSONLD};q=0.9", PLAIN),
+        (f"{JSONLD};q=0, application/json", PLAIN),
+        (f"{JSONLD};q=invalid", PLAIN),
+    ],
+)
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+@pytest.fixture
+def annotator():
+    return Annotator.from_openapi(OAS, chunk_size=64)
+
+
+def test_annotator_routes(annotator):
+    assert annotator.target("/persons/123") == ("#/Person", False)
+    assert annotator.target("/persons") == ("#/Person", True)
+    assert annotator.target("/persons/123/x") is None
+    assert annotator.target("/other") is None
+
+
+def test_annotator_reuses_plans(annotator):
+    annotator.warm()
+    plan = annotator.plan("#/Person")
+    annotator.annotate(json.dumps(PERSON).encode(), ("#/Person", False), INLINE)
+    assert annotator.plan("#/Person") is plan
+
+
+def _wsgi(app, path, accept=None):
+    environ = {"PATH_INFO": path}
+    if accept:
+        environ["HTTP_ACCEPT"] = accept
+    setup_testing_defaults(environ)
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response.update(status=status, headers=dict(headers))
+
+    body = app(environ, start_response)
+    chunks = iter(body)
+    response["first"] = next(chunks, b"")
+    response["body"] = response["first"] + b"".join(chunks)
+    return response
+
+
+def _app(consumed=None, headers=()):
+    def app(environ, start_response):
+        path = environ["PATH_INFO"]
+        data = PERSONS if path == "/persons" else PERSON
+        start_response("200 OK", [("Content-Type", "application/json"), *headers])
+        body = json.dumps(data).encode()
+        for i in range(0, len(body), 10):
+            if consumed is not None:
+                consumed.append(i)
+            yield body[i : i + 10]  # noqa: E203
+
+    return app
+
+
+def test_wsgi_plain(annotator):
+    response = _wsgi(WSGIMiddleware(_app(), annotator), "/persons/1")
+    assert json.loads(response["body"]) == PERSON
+    assert response["headers"]["Content-Type"] == "application/json"
+    assert response["headers"]["Vary"] == "Accept"
+
+
+@pytest.mark.parametrize(
+    "vary, expected",
+    [
+        ("Origin, Accept-Encoding", "Origin, Accept-Encoding, Accept"),
+        ("origin, accept", "origin, accept"),
+        ("*", "*"),
+    ],
+)
+def test_wsgi_vary(annotator, vary, expected):
+    app = WSGIMiddleware(_app(headers=[("Vary", vary)]), annotator)
+    response = _wsgi(app, "/persons/1", JSONLD)
+    assert response["headers"]["Vary"] == expected
+
+
+def test_wsgi_inline(annotator):
+    response = _wsgi(WSGIMiddleware(_app(), annotator), "/persons/1", JSONLD)
+    assert response["headers"]["Content-Type"] == JSONLD
+    assert json.loads(response["body"]) == oasld.compile(
+        sample_schema, "Person"
+    ).annotate(PERSON)
+
+
+def test_wsgi_linked(annotator):
+    app = WSGIMiddleware(_app(), annotator)
+    response = _wsgi(app, "/persons/1", LINKED_ACCEPT)
+    ld = json.loads(response["body"])
+    assert ld["@type"] == "Person"
+
+    context = _wsgi(app, ld["@context"])
+    assert context["headers"]["Content-Type"] == JSONLD
+    assert json.loads(context["body"]) == {
+        "@context": oasld.compile(sample_schema, "Person").context
+    }
+
+
+def test_wsgi_arrays(annotator):
+    response = _wsgi(WSGIMiddleware(_app(), annotator), "/persons", JSONLD)
+
+    ld = json.loads(response["body"])
+    plan = oasld.compile(sample_schema, "Person")
+    assert ld == {
+        "@context": plan.context,
+        "@graph": [plan.annotate(p, with_context=False) for p in PERSONS],
+    }
+
+
+def test_wsgi_streams_lazily(annotator):
+    consumed = []
+    app = WSGIMiddleware(_app(consumed), annotator)
+    environ = {"PATH_INFO": "/persons", "HTTP_ACCEPT": JSONLD}
+    setup_testing_defaults(environ)
+    chunks = iter(app(environ, lambda status, headers, exc_info=None: None))
+    next(chunks)
+    assert len(consumed) < len(json.dumps(PERSONS)) // 10
+
+
+def test_wsgi_unmapped_route(annotator):
+    response = _wsgi(WSGIMiddleware(_app(), annotator), "/other", JSONLD)
+    assert response["headers"] == {"Content-Type": "application/json"}
+
+
+async def _asgi(app, path, accept=None, body=None):
+    headers = [(b"accept", accept.encode())] if accept else []
+    scope = {"type": "http", "method": "GET", "path": path, "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+def _asgi_app(data, headers=()):
+    body = json.dumps(data).encode()
+
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *headers,
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body[:10], "more_body": True})
+        await send({"type": "http.response.body", "body": body[10:]})
+
+    return app
+
+
+def test_asgi_plain(annotator):
+    app = ASGIMiddleware(_asgi_app(PERSON), annotator)
+    messages = asyncio.run(_asgi(app, "/persons/1"))
+    assert (
+        b"".join(m.get("body", b"") for m in messages[1:])
+        == json.dumps(PERSON).encode()
+    )
+    assert (b"vary", b"Accept") in messages[0]["headers"]
+
+
+@pytest.mark.parametrize("accept", [None, JSONLD])
+def test_asgi_vary(annotator, accept):
+    headers = [(b"vary", b"Origin"), (b"vary", b"Accept-Encoding")]
+    app = ASGIMiddleware(_asgi_app(PERSON, headers), annotator)
+    messages = asyncio.run(_asgi(app, "/persons/1", accept))
+    vary = [v for k, v in messages[0]["headers"] if k == b"vary"]
+    assert vary == [b"Origin, Accept-Encoding, Accept"]
+
+
+@pytest.mark.parametrize("offload_threshold", [0, 2**20])
+def test_asgi_inline(annotator, offload_threshold):
+    threads = []
+    annotate = annotator.annotate
+
+    def record(*args):
+        threads.append(threading.current_thread())
+        return annotate(*args)
+
+    annotator.annotate = record
+    with ThreadPoolExecutor(1) as executor:
+        app = ASGIMiddleware(
+            _asgi_app(PERSONS),
+            annotator,
+            offload_threshold=offload_threshold,
+            executor=executor,
+        )
+        messages = asyncio.run(_asgi(app, "/persons", JSONLD))
+
+    headers = dict(messages[0]["headers"])
+    body = b"".join(m["body"] for m in messages[1:])
+    assert headers[b"content-type"] == JSONLD.encode()
+    assert headers[b"content-length"] == str(len(body)).encode()
+    assert not messages[-1]["more_body"]
+    assert all(m["more_body"] for m in messages[1:-1])
+    assert json.loads(body)["@graph"][0]["@type"] == "Person"
+    assert (threads[0] is threading.main_thread()) == bool(offload_threshold)
+
+
+def test_asgi_linked(annotator):
+    app = ASGIMiddleware(_asgi_app(PERSON), annotator)
+    messages = asyncio.run(_asgi(app, "/persons/1", LINKED_ACCEPT))
+    ld = json.loads(b"".join(m["body"] for m in messages[1:]))
+
+    messages = asyncio.run(_asgi(app, ld["@context"]))
+    assert json.loads(messages[1]["body"])["@context"]["@vocab"]
@@ -0,0 +1,124 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import oasld
+from oasld import sample_schema
+
+DATADIR = Path(__file__).parent
+INSTANCES = [
+    {"email": f"mailto:{i}@example", "birthplace": {"city": "Roma"}} for i in range(50)
+]
+
+
+@pytest.mark.parametrize("jobs,chunk_size", [(1, 100), (2, 3), (3, 1)])
+def test_annotate_parallel(jobs, chunk_size):
+    expected = list(oasld.annotate_many(INSTANCES, "Person", sample_schema))
+
+    documents = list(
+        oasld.annotate_parallel(
+            INSTANCES, "Person", sample_schema, jobs=jobs, chunk_size=chunk_size
+        )
+    )
+    assert documents == expected
+
+
+def test_annotate_parallel_without_context():
+    context, documents = oasld.annotate_parallel(
+        iter(INSTANCES), "Person", sample_schema, jobs=2, with_context=False
+    )
+    assert context == oasld.compile(sample_schema, "Person").context
+    documents = list(documents)
+    assert len(documents) == len(INSTANCES)
+    assert "@context" not in documents[0]
+
+
+def test_annotate_stream_parallel():
+    fp_out = io.StringIO()
+    count = oasld.annotate_stream(
+        io.StringIO(json.dumps(INSTANCES)),
+        fp_out,
+        sample_schema,
+        "Person",
+        jobs=2,
+        chunk_size=7,
+    )
+    assert count == len(INSTANCES)
+    assert json.loads(fp_out.getvalue()) == {
+        "@context": oasld.compile(sample_schema, "Person").context,
+        "@graph": list(
+            oasld.annotate_many(INSTANCES, "Person", sample_schema, with_context=False)[
+                1
+            ]
+        ),
+    }
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_cli_annotate(tmp_path, jobs):
+    src = tmp_path / "instances.ndjson"
+    dst = tmp_path / "instances.jsonld"
+    src.write_text("\n".join(json.dumps(i) for i in INSTANCES))
+
+    ret = oasld.main(
+        [
+            "annotate",
+            str(DATADIR.parent / "schemas.yaml"),
+            "Citizen",
+            "--input",
+            str(src),
+            "--output",
+            str(dst),
+            "--input-format",
+            "ndjson",
+            "--jobs",
+            jobs,
+            "--chunk-size",
+            "10",
+        ]
+    )
+
+    assert ret == 0
+    result = json.loads(dst.read_text())
+    assert [x["email"] for x in result["@graph"]] == [x["email"] for x in INSTANCES]
+    assert result["@graph"][0]["birthplace"]["@type"].endswith("CLV/Feature")
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_cli_annotate_external_ref(tmp_path, monkeypatch, jobs):
+    """External $refs are relative to the schema file, not to the cwd."""
+    schemas = tmp_path / "schemas" / "main.yaml"
+    (tmp_path / "schemas" / "common").mkdir(parents=True)
+    schemas.write_text(
+        "Person:\n"
+        "  x-jsonld-context: {'@vocab': 'https://example.org/'}\n"
+        "  properties: {place: {$ref: 'common/place.yaml#/Place'}}\n"
+    )
+    (tmp_path / "schemas" / "common" / "place.yaml").write_text(
+        "Place: {type: object, x-jsonld-type: Place}\n"
+    )
+    src = tmp_path / "instances.ndjson"
+    src.write_text(json.dumps({"place": {"city": "Roma"}}))
+    dst = tmp_path / "instances.jsonld"
+    monkeypatch.chdir(tmp_path)
+
+    ret = oasld.main(
+        [
+            "annotate",
+            str(schemas),
+            "Person",
+            "-i",
+            str(src),
+            "-o",
+            str(dst),
+            "--input-format",
+            "ndjson",
+            "--jobs",
+            jobs,
+        ]
+    )
+
+    assert ret == 0
+    assert json.loads(dst.read_text())["@graph"][0]["place"]["@type"] == "Place"
@@ -0,0 +1,259 @@
+import random
+from copy import deepcopy
+
+import pytest
+from test_compose import PETS
+
+import oasld
+from benchmarks import synthetic
+from oasld import sample_schema
+from oasld.patch import PatchError, _merge, compile_patch
+
+PERSON = sample_schema["Person"]["example"]
+
+
+def _check(patcher, instance, document, update):
+    """The delta is the difference of the triples of the documents,
+    and the document is the annotation of the patched instance."""
+    assert update.document == patcher.plan.annotate(instance)
+    before = set(patcher.triples(document))
+    after = set(patcher.triples(update.document))
+    assert set(update.removed) == before - after
+    assert set(update.added) == after - before
+
+
+@pytest.mark.parametrize(
+    "operations, instance",
+    [
+        (
+            [{"op": "replace", "path": "/givenName", "value": "Bob"}],
+            {**PERSON, "givenName": "Bob"},
+        ),
+        (
+            [{"op": "remove", "path": "/birthplace/city"}],
+            {
+                **PERSON,
+                "birthplace": {
+                    k: v for k, v in PERSON["birthplace"].items() if k != "city"
+                },
+            },
+        ),
+        (
+            [
+                {
+                    "op": "add",
+                    "path": "/children/0",
+                    "value": {"email": "mailto:x@example", "birthplace": {"city": "X"}},
+                }
+            ],
+            {
+                **PERSON,
+                "children": [
+                    {"email": "mailto:x@example", "birthplace": {"city": "X"}},
+                    *PERSON["children"],
+                ],
+            },
+        ),
+        (
+            [{"op": "remove", "path": "/children/0"}],
+            {**PERSON, "children": PERSON["children"][1:]},
+        ),
+        (
+            [{"op": "replace", "path": "/email", "value": "mailto:z@example"}],
+            {**PERSON, "email": "mailto:z@example"},
+        ),
+        (
+            [{"op": "move", "from": "/children/0", "path": "/children/1"}],
+            {**PERSON, "children": PERSON["children"][::-1]},
+        ),
+        (
+            [{"op": "replace", "path": "", "value": {"email": "mailto:r@example"}}],
+            {"email": "mailto:r@example"},
+        ),
+        (
+            [{"op": "copy", "from": "/children/1", "path": "/children/0"}],
+            {**PERSON, "children": [PERSON["children"][1], *PERSON["children"]]},
+        ),
+        (
+            [{"op": "copy", "from": "/birthplace", "path": "/children/0/birthplace"}],
+            {
+                **PERSON,
+                "children": [
+                    {**PERSON["children"][0], "birthplace": PERSON["birthplace"]},
+                    PERSON["children"][1],
+                ],
+            },
+        ),
+        (
+            [
+                {"op": "add", "path": "/children/1/children", "value": []},
+                {"op": "copy", "from": "/children/0", "path": "/children/1/children/0"},
+                {"op": "move", "from": "/children/0", "path": "/children/-"},
+            ],
+            {
+                **PERSON,
+                "children": [
+                    {**PERSON["children"][1], "children": [PERSON["children"][0]]},
+                    PERSON["children"][0],
+                ],
+            },
+        ),
+        (
+            [
+                {"op": "copy", "from": "/children/0", "path": "/children/-"},
+                {"op": "remove", "path": "/children/0"},
+            ],
+            {**PERSON, "children": [*PERSON["children"][1:], PERSON["children"][0]]},
+        ),
+        (
+            [{"op": "move", "from": "/birthplace", "path": "/children/1/birthplace"}],
+            {
+                **{k: v for k, v in PERSON.items() if k != "birthplace"},
+                "children": [
+                    PERSON["children"][0],
+                    {**PERSON["children"][1], "birthplace": PERSON["birthplace"]},
+                ],
+            },
+        ),
+    ],
+)
+def test_apply(operations, instance):
+    patcher = compile_patch(sample_schema, "Person")
+    document = patcher.plan.annotate(PERSON)
+    original = deepcopy(document)
+
+    update = patcher.apply(document, operations)
+
+    assert document == original
+    _check(patcher, instance, document, update)
+
+
+def test_apply_same_value_twice():
+    """The blank nodes of a value added at two pointers are different."""
+    patcher = compile_patch(sample_schema, "Person")
+    document = patcher.plan.annotate(PERSON)
+    place = {"extra": {"city": "Napoli"}}
+    operations = [
+        {"op": "add", "path": "/birthplace", "value": place},
+        {"op": "add", "path": "/children/0/birthplace", "value": place},
+    ]
+
+    update = patcher.apply(document, operations)
+
+    children = [{**PERSON["children"][0], "birthplace": place}, PERSON["children"][1]]
+    _check(
+        patcher, {**PERSON, "birthplace": place, "children": children}, document, update
+    )
+    assert len([t for t in update.added if str(t[2]) == "Napoli"]) == 2
+
+
+def test_apply_random_copy_move():
+    patcher = compile_patch(sample_schema, "Person")
+    document = patcher.plan.annotate(PERSON)
+    pointers = ["/children/0", "/children/1", "/birthplace", "/children/0/birthplace"]
+    rnd = random.Random(0)
+    for _ in range(300):
+        operations = [
+            {
+                "op": rnd.choice(["copy", "move"]),
+                "from": rnd.choice(pointers),
+                "path": rnd.choice([*pointers, "/children/-", "/children/1/children"]),
+            }
+            for _ in range(rnd.randint(1, 3))
+        ]
+        try:
+            update = patcher.apply(document, operations)
+        except PatchError:
+            continue
+        before = set(patcher.triples(document))
+        after = set(patcher.triples(update.document))
+        assert set(update.removed) == before - after, operations
+        assert set(update.added) == after - before, operations
+
+
+def test_apply_one_of_branches():
+    """The changed properties use the context of their branch."""
+    patcher = compile_patch(PETS, "Pets")
+    rex = {"id": "https://example.org/rex", "kind": "dog", "name": "Rex"}
+    instance = {"pets": [{"kind": "cat", "name": "Tom"}, rex]}
+    document = patcher.plan.annotate(instance)
+
+    update = patcher.apply(
+        document, [{"op": "replace", "path": "/pets/1/name", "value": "Max"}]
+    )
+
+    pets = [instance["pets"][0], {**rex, "name": "Max"}]
+    _check(patcher, {"pets": pets}, document, update)
+    assert {(str(p), str(o)) for _, p, o in update.removed} == {
+        ("https://example.org/dog#name", "Rex")
+    }
+    operations = [
+        {"op": "replace", "path": "/pets/0/name", "value": "Kitty"},
+        {"op": "add", "path": "/pets/-", "value": {"kind": "dog", "name": "Fido"}},
+    ]
+    update = patcher.apply(document, operations)
+    pets = [{"kind": "cat", "name": "Kitty"}, rex, {"kind": "dog", "name": "Fido"}]
+    _check(patcher, {"pets": pets}, document, update)
+
+
+def test_apply_delta():
+    patcher = compile_patch(sample_schema, "Person")
+    document = patcher.plan.annotate(PERSON)
+
+    update = patcher.apply(
+        document, [{"op": "replace", "path": "/birthplace/city", "value": "Napoli"}]
+    )
+
+    assert [(str(p), str(o)) for _, p, o in update.removed] == [
+        ("https://w3id.org/italia/onto/CLV/hasCity", "Roma")
+    ]
+    assert [(str(p), str(o)) for _, p, o in update.added] == [
+        ("https://w3id.org/italia/onto/CLV/hasCity", "Napoli")
+    ]
+
+
+def test_merge():
+    patch = {"givenName": None, "birthplace": {"city": "Napoli"}}
+    patcher = compile_patch(sample_schema, "Person")
+    document = patcher.plan.annotate(PERSON)
+
+    update = patcher.merge(document, patch)
+
+    _check(patcher, _merge(PERSON, patch), document, update)
+
+
+def test_apply_errors():
+    patcher = compile_patch(sample_schema, "Person")
+    document = patcher.plan.annotate(PERSON)
+
+    with pytest.raises(PatchError):
+        patcher.apply(document, [{"op": "test", "path": "/givenName", "value": "Bob"}])
+    with pytest.raises(PatchError):
+        patcher.apply(document, [{"op": "remove", "path": "/children/5"}])
+    with pytest.raises(PatchError):
+        patcher.apply(document, [{"op": "copy", "path": "/a"}])
+    update = patcher.apply(
+        document, [{"op": "test", "path": "/givenName", "value": "Alice"}]
+    )
+    assert update == (document, [], [])
+
+
+@pytest.mark.parametrize(
+    "name, schemas, schema_name, instance", list(synthetic.shapes())
+)
+def test_apply_synthetic_shapes(name, schemas, schema_name, instance):
+    patcher = oasld.compile_patch(schemas, schema_name, safe_mode=False)
+    document = patcher.plan.annotate(instance)
+    operations = [{"op": "replace", "path": "/p0", "value": "v"}]
+    expected = {**instance, "p0": "v"}
+    if "items" in instance:
+        item = {"id": "https://example.org/new", "p0": "x"}
+        operations += [
+            {"op": "add", "path": "/items/0", "value": item},
+            {"op": "remove", "path": "/items/2"},
+        ]
+        expected["items"] = [item, instance["items"][0], *instance["items"][2:]]
+
+    update = patcher.apply(document, operations)
+
+    _check(patcher, expected, document, update)
@@ -0,0 +1,135 @@
+import json
+import threading
+
+import pytest
+import rdflib.compare
+from rdflib import Graph
+
+import oasld
+from benchmarks import synthetic
+from oasld import CTX, sample_schema
+from oasld.prune import ContextPruner
+
+PERSON = sample_schema["Person"]["example"]
+
+
+def _graph(ld):
+    g = Graph()
+    g.parse(data=json.dumps(ld), format="application/ld+json")
+    return rdflib.compare.to_isomorphic(g)
+
+
+@pytest.mark.parametrize(
+    "instance",
+    [
+        PERSON,
+        {"email": "mailto:a@example", "givenName": "Alice"},
+        {"email": "mailto:a@example", "birthplace": {"city": "Roma"}},
+        {"children": [{"email": "mailto:b@example"}]},
+        {},
+    ],
+)
+def test_pruned_context_same_rdf(instance):
+    plan = oasld.compile(sample_schema, "Person")
+    ld = plan.annotate(instance)
+    pruned = plan.annotate(instance, prune_context=True)
+
+    assert _graph(pruned) == _graph(ld)
+
+
+def test_pruned_context_drops_unused_terms():
+    plan = oasld.compile(sample_schema, "Person")
+    pruned = plan.annotate({"email": "mailto:a@example"}, prune_context=True)
+
+    assert pruned[CTX] == {"email": "@id", "@vocab": "https://w3.org/ns/person#"}
+
+
+def test_pruned_context_prunes_scoped_contexts():
+    plan = oasld.compile(sample_schema, "Person")
+    pruned = plan.annotate({"birthplace": {"city": "Roma"}}, prune_context=True)
+
+    assert pruned[CTX]["birthplace"][CTX] == {
+        "@vocab": "https://w3id.org/italia/onto/CLV/",
+        "city": "hasCity",
+    }
+
+
+def test_pruned_context_is_memoized():
+    plan = oasld.compile(sample_schema, "Person")
+    a = plan.annotate({"email": "mailto:a@example"}, prune_context=True)
+    b = plan.annotate({"email": "mailto:b@example"}, prune_context=True)
+    c = plan.annotate({"givenName": "Bob"}, prune_context=True)
+
+    assert a[CTX] is b[CTX]
+    assert c[CTX] is not a[CTX]
+
+
+def test_pruned_context_url():
+    plan = oasld.compile(sample_schema, "Person")
+    ld = plan.annotate(PERSON, context_url="https://example/c", prune_context=True)
+
+    assert ld[CTX] == "https://example/c"
+
+
+def test_prune_prefixes_and_types():
+    context = [
+        "https://example.org/remote.jsonld",
+        {
+            "schema": "https://schema.org/",
+            "ex": "https://example.org/",
+            "Person": "schema:Person",
+            "Unused": "ex:Unused",
+            "name": "schema:name",
+            "knows": {"@id": "schema:knows", "@type": "@id"},
+            "homepage": {"@id": "ex:homepage", "@type": "@id"},
+        },
+    ]
+    pruner = ContextPruner(context)
+    document = {"@type": "Person", "name": "Alice", "knows": "ex:bob"}
+
+    assert pruner.prune(document) == [
+        "https://example.org/remote.jsonld",
+        {
+            "schema": "https://schema.org/",
+            "ex": "https://example.org/",
+            "Person": "schema:Person",
+            "name": "schema:name",
+            "knows": {"@id": "schema:knows", "@type": "@id"},
+        },
+    ]
+
+
+def test_prune_threads():
+    """Concurrent misses evicting the same variant."""
+    context = {f"t{i}": f"https://example.org/{i}" for i in range(8)}
+    pruner = ContextPruner(context, max_variants=2)
+    documents = [{f"t{i}": 1} for i in range(8)]
+    errors = []
+
+    def run():
+        try:
+            for _ in range(200):
+                for document in documents:
+                    assert pruner.prune(document) == {k: context[k] for k in document}
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(pruner._variants) <= 2
+
+
+@pytest.mark.parametrize(
+    "name, schemas, schema_name, instance", list(synthetic.shapes())
+)
+def test_pruned_context_synthetic_shapes(name, schemas, schema_name, instance):
+    plan = oasld.compile(schemas, schema_name, safe_mode=False)
+    partial = {k: v for k, v in instance.items() if k != "items"}
+
+    for i in (instance, partial):
+        assert _graph(plan.annotate(i, prune_context=True)) == _graph(plan.annotate(i))
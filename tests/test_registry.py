@@ -0,0 +1,84 @@
+import gc
+import json
+import os
+import sys
+
+import pytest
+from test_middleware import LINKED_ACCEPT, OAS, PERSON, _app, _wsgi
+
+import oasld
+from oasld import sample_schema
+from oasld.middleware import JSONLD, Annotator, WSGIMiddleware
+from oasld.registry import Registry
+
+REFS = ["#/Person", "#/BirthPlace"]
+
+
+@pytest.fixture
+def registry():
+    return Registry(sample_schema, REFS)
+
+
+def test_registry_plans(registry):
+    plan = oasld.compile(sample_schema, "#/Person")
+
+    assert len(registry) == 2
+    assert "#/Person" in registry
+    assert registry.plan("#/Person").annotate(PERSON) == plan.annotate(PERSON)
+    assert registry.plan("#/Person").fingerprint in registry.contexts
+    with pytest.raises(KeyError):
+        registry.plan("#/Missing")
+    with pytest.raises(TypeError):
+        registry.plans["#/Missing"] = plan
+
+
+def test_registry_annotator():
+    registry = Registry(OAS, ["#/Person"], context_path="/contexts/")
+    annotator = Annotator.from_openapi(OAS, registry=registry)
+    plan = registry.plan("#/Person")
+
+    assert annotator.plan("#/Person") is plan
+    assert annotator.contexts is registry.contexts
+    assert annotator.context_document(f"/contexts/{plan.fingerprint}.jsonld")
+    with pytest.raises(ValueError, match="context_path"):
+        Annotator.from_openapi(OAS, registry=registry, context_path="/other/")
+
+
+def test_registry_wsgi_linked():
+    registry = Registry(OAS, ["#/Person"])
+    app = WSGIMiddleware(_app(), Annotator.from_openapi(OAS, registry=registry))
+
+    response = _wsgi(app, "/persons/1", LINKED_ACCEPT)
+    ld = json.loads(response["body"])
+    assert ld["@context"].startswith("/.well-known/jsonld/")
+
+    context = _wsgi(app, ld["@context"])
+    assert context["headers"]["Content-Type"] == JSONLD
+    assert json.loads(context["body"]) == {
+        "@context": registry.plan("#/Person").context
+    }
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "fork") or sys.platform == "darwin", reason="requires fork"
+)
+def test_registry_freeze_fork(registry):
+    expected = json.dumps(registry.plan("#/Person").annotate(PERSON))
+    assert registry.freeze() is registry
+    try:
+        assert registry.frozen
+        assert gc.get_freeze_count() > 0
+        read, write = os.pipe()
+        if (pid := os.fork()) == 0:
+            os.close(read)
+            try:
+                document = registry.plan("#/Person").annotate(PERSON)
+                os.write(write, json.dumps(document).encode())
+            finally:
+                os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as fp:
+            assert fp.read() == expected
+        os.waitpid(pid, 0)
+    finally:
+        gc.unfreeze()
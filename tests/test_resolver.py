@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+import yaml
+
+import oasld
+from oasld import RefResolutionError, RefResolver, sample_schema
+
+DATADIR = Path(__file__).parent
+
+
+@pytest.mark.parametrize(
+    "ref,expected",
+    [
+        ("/Person", sample_schema["Person"]),
+        ("#/Person", sample_schema["Person"]),
+        ("/Person/properties/birthplace", {"$ref": "#/BirthPlace"}),
+        ("/BirthPlace/required/1", "province"),
+        ("", sample_schema),
+    ],
+)
+def test_resolve(ref, expected):
+    assert RefResolver(sample_schema).resolve(ref) == expected
+
+
+def test_resolve_escaped():
+    schema = {"a/b": {"c~d": {"e f": 1}}}
+    assert RefResolver(schema).resolve("/a~1b/c~0d/e%20f") == 1
+
+
+@pytest.mark.parametrize("ref", ["/Missing", "/BirthPlace/required/9", "/Person/x/y"])
+def test_resolve_error(ref):
+    with pytest.raises(RefResolutionError):
+        RefResolver(sample_schema).resolve(ref)
+
+
+def test_resolve_components_schemas():
+    oas = yaml.safe_load((DATADIR / "section-1.oas3.yaml").read_text())
+    resolver = RefResolver(oas)
+    assert (
+        resolver.resolve("/components/schemas/CountryURI")
+        is oas["components"]["schemas"]["CountryURI"]
+    )
+
+
+def test_resolve_cache():
+    resolver = RefResolver(sample_schema)
+    for _ in range(3):
+        resolver.resolve("/Person")
+    assert resolver.cache_info() == {"hits": 2, "misses": 1, "size": 1}
+
+
+def test_compile_cyclic_schema_resolves_once():
+    resolver = RefResolver(sample_schema)
+    oasld.compile(sample_schema, "Person", resolver=resolver)
+    info = resolver.cache_info()
+    assert info["misses"] == info["size"] == 2
+
+
+def test_resolve_external(tmp_path):
+    (tmp_path / "common").mkdir()
+    (tmp_path / "common" / "place.yaml").write_text(
+        yaml.safe_dump(
+            {
+                "Place": {
+                    "type": "object",
+                    "properties": {"country": {"$ref": "#/Country"}},
+                },
+                "Country": {"type": "string"},
+                "Address": {"$ref": "address.yaml#/Address"},
+            }
+        )
+    )
+    (tmp_path / "common" / "address.yaml").write_text(
+        yaml.safe_dump({"Address": {"type": "object"}})
+    )
+    schema = {"Person": {"properties": {"place": {"$ref": "common/place.yaml#/Place"}}}}
+
+    resolver = RefResolver(schema, base_uri=tmp_path / "main.yaml")
+    place = resolver.resolve("common/place.yaml#/Place")
+    assert place["properties"]["country"]["$ref"] == "common/place.yaml#/Country"
+    assert resolver.resolve(place["properties"]["country"]["$ref"]) == {
+        "type": "string"
+    }
+    address = resolver.resolve("common/place.yaml#/Address")["$ref"]
+    assert resolver.resolve(address) == {"type": "object"}
+    assert resolver.resolve("common/address.yaml") == {"Address": {"type": "object"}}
+    # Each file is loaded once.
+    assert set(resolver.documents) == {
+        "",
+        "common/place.yaml",
+        "common/address.yaml",
+    }
+
+
+def test_resolve_dotted_directory(tmp_path):
+    base = tmp_path / "api.v2"
+    base.mkdir()
+    (base / "other.yaml").write_text(yaml.safe_dump({"Person": {"type": "object"}}))
+
+    resolver = RefResolver({}, base_uri=str(base))
+
+    assert resolver.resolve("other.yaml#/Person") == {"type": "object"}
+
+
+def test_resolve_external_missing(tmp_path):
+    resolver = RefResolver({}, base_uri=tmp_path)
+    with pytest.raises(RefResolutionError):
+        resolver.resolve("missing.yaml#/A")
+
+
+def test_resolve_threads():
+    resolver = RefResolver(sample_schema)
+    refs = ["/Person", "/BirthPlace", "/Person/properties"] * 1000
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(resolver.resolve, refs))
+
+    assert results[:3] == [
+        sample_schema["Person"],
+        sample_schema["BirthPlace"],
+        sample_schema["Person"]["properties"],
+    ]
+    assert resolver.cache_info() == {"hits": len(refs) - 3, "misses": 3, "size": 3}
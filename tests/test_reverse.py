@@ -0,0 +1,173 @@
+import json
+from copy import deepcopy
+
+import pyld
+import pytest
+from rdflib import Graph
+from test_compose import PETS, SCHEMAS
+
+import oasld
+from benchmarks import synthetic
+from oasld import sample_schema
+from oasld.reverse import compile_reverse
+
+PERSON = sample_schema["Person"]["example"]
+
+
+def _graph(triples):
+    g = Graph()
+    for t in triples:
+        g.add(t)
+    return g
+
+
+@pytest.fixture
+def expected():
+    """The example without the entries that are not mapped to RDF."""
+    ret = deepcopy(PERSON)
+    del ret["birthplace"]["interno"]
+    return ret
+
+
+def test_from_graph(expected):
+    plan = oasld.compile(sample_schema, "Person")
+    reverse = compile_reverse(sample_schema, "Person")
+
+    assert reverse.from_graph(_graph(plan.triples(PERSON))) == [expected]
+
+
+def test_from_expanded(expected):
+    ld = oasld.compile(sample_schema, "Person").annotate(PERSON)
+    reverse = compile_reverse(sample_schema, "Person")
+
+    assert reverse.from_expanded(pyld.jsonld.expand(ld)) == [expected]
+
+
+def test_from_graph_parsed(expected):
+    ld = oasld.compile(sample_schema, "Person").annotate(PERSON)
+    g = Graph().parse(data=json.dumps(ld), format="application/ld+json")
+
+    assert compile_reverse(sample_schema, "Person").from_graph(g) == [expected]
+
+
+def test_bulk():
+    plan = oasld.compile(sample_schema, "Person")
+    people = [
+        {
+            "email": f"mailto:{i}@example",
+            "birthplace": {"city": "Roma", "province": "RM", "country": "ITA"},
+        }
+        for i in range(50)
+    ]
+    g = _graph(t for p in people for t in plan.triples(p))
+    reverse = compile_reverse(sample_schema, "Person")
+
+    result = reverse.from_graph(g)
+    assert sorted(result, key=lambda p: p["email"]) == sorted(
+        people, key=lambda p: p["email"]
+    )
+    assert reverse.from_graph(g, subjects=["mailto:7@example"]) == [people[7]]
+
+
+def test_base_and_vocab_iris():
+    schemas = {
+        "Item": {
+            "type": "object",
+            "x-jsonld-type": "Item",
+            "x-jsonld-context": {
+                "@vocab": "https://w3id.org/item/",
+                "@base": "https://api.example/items/",
+                "id": "@id",
+                "status": {"@type": "@vocab"},
+                "tags": {"@container": "@list"},
+                "owner": {"@type": "@id"},
+            },
+            "additionalProperties": False,
+            "properties": {
+                "id": {"type": "string"},
+                "status": {"type": "string"},
+                "owner": {"type": "string"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "count": {"type": "integer"},
+            },
+        }
+    }
+    item = {
+        "id": "42",
+        "status": "open",
+        "owner": "alice",
+        "tags": ["b", "a"],
+        "count": 3,
+    }
+    plan = oasld.compile(schemas, "Item")
+    reverse = compile_reverse(schemas, "Item")
+
+    triples = plan.triples(dict(item, extra="dropped"))
+    assert reverse.from_graph(_graph(triples)) == [item]
+    expanded = pyld.jsonld.expand(plan.annotate(item))
+    assert reverse.from_expanded(expanded) == [item]
+
+    # IRIs outside @base are absolute.
+    triples = plan.triples(dict(item, owner="../users/alice"))
+    assert reverse.from_graph(_graph(triples))[0]["owner"] == (
+        "https://api.example/users/alice"
+    )
+
+
+def test_cyclic_nodes():
+    plan = oasld.compile(sample_schema, "Person")
+    reverse = compile_reverse(sample_schema, "Person")
+    person = {"email": "mailto:a@example", "children": [{"email": "mailto:a@example"}]}
+
+    g = _graph(plan.triples(person))
+    assert reverse.from_graph(g, subjects=["mailto:a@example"]) == [
+        {"email": "mailto:a@example", "children": [{"email": "mailto:a@example"}]}
+    ]
+
+
+def test_one_of_branches():
+    plan = oasld.compile(PETS, "Pets")
+    reverse = compile_reverse(PETS, "Pets")
+    instance = {
+        "pets": [{"kind": "cat", "name": "Tom"}, {"kind": "dog", "name": "Rex"}]
+    }
+
+    (result,) = reverse.from_graph(_graph(plan.triples(instance)))
+    assert sorted(result["pets"], key=lambda i: i["kind"]) == instance["pets"]
+    rex = {"id": "https://example.org/rex", "kind": "dog", "name": "Rex"}
+    assert compile_reverse(PETS, "Pet").from_graph(
+        _graph(oasld.compile(PETS, "Pet").triples(rex))
+    ) == [rex]
+
+
+def test_flattened_views():
+    plan = oasld.compile(SCHEMAS, "Animal")
+    instance = {
+        "id": "https://example.org/rex",
+        "kind": "dog",
+        "name": "Rex",
+        "owner": {"name": "Alice"},
+    }
+
+    g = _graph(plan.triples(instance))
+    assert compile_reverse(SCHEMAS, "Animal").from_graph(g) == [instance]
+
+
+def _sorted(instance):
+    """Sort the arrays of nodes by id, since graphs are unordered."""
+    if isinstance(instance, dict):
+        return {k: _sorted(v) for k, v in instance.items()}
+    if isinstance(instance, list):
+        return sorted(map(_sorted, instance), key=lambda i: i.get("id", ""))
+    return instance
+
+
+@pytest.mark.parametrize(
+    "name, schemas, schema_name, instance", list(synthetic.shapes())
+)
+def test_synthetic_shapes(name, schemas, schema_name, instance):
+    plan = oasld.compile(schemas, schema_name, safe_mode=False)
+    reverse = compile_reverse(schemas, schema_name, safe_mode=False)
+
+    result = reverse.from_graph(_graph(plan.triples(instance)))
+    assert [_sorted(i) for i in result] == [_sorted(instance)]
@@ -0,0 +1,125 @@
+import io
+import json
+
+import pytest
+
+import oasld
+from oasld import sample_schema
+
+ITEMS = [
+    {"email": f"mailto:{i}@example", "birthplace": {"city": "Roma", "zip": 100 + i}}
+    for i in range(20)
+]
+
+
+class NoReadAll(io.StringIO):
+    """Fail when the whole document is read at once."""
+
+    def read(self, size=-1):
+        assert size is not None and size > 0, "The stream must be read in chunks"
+        return super().read(size)
+
+
+@pytest.fixture
+def plan():
+    return oasld.compile(sample_schema, "Person")
+
+
+@pytest.mark.parametrize("buffer_size", [1, 7, 2**16])
+def test_annotate_stream_array(plan, buffer_size):
+    fp_in = NoReadAll(json.dumps(ITEMS, indent=2))
+    fp_out = io.StringIO()
+
+    count = oasld.annotate_stream(
+        fp_in, fp_out, sample_schema, "Person", buffer_size=buffer_size
+    )
+
+    assert count == len(ITEMS)
+    result = json.loads(fp_out.getvalue())
+    assert result["@context"] == plan.context
+    assert result["@graph"] == [
+        plan.annotate(i, with_context=False) for i in json.loads(json.dumps(ITEMS))
+    ]
+
+
+def test_annotate_stream_items_property(plan):
+    document = {"count": 20, "items": ITEMS, "next": {"href": "?page=2"}}
+    fp_in = NoReadAll(json.dumps(document))
+    fp_out = io.StringIO()
+
+    count = oasld.annotate_stream(
+        fp_in, fp_out, sample_schema, "Person", items_property="items", buffer_size=5
+    )
+
+    assert count == len(ITEMS)
+    result = json.loads(fp_out.getvalue())
+    assert set(result) == {"@context", "@graph"}
+    assert result["@graph"][3]["@type"] == "Person"
+
+
+def test_annotate_stream_items_property_missing():
+    with pytest.raises(KeyError):
+        oasld.annotate_stream(
+            io.StringIO('{"count": 0}'),
+            io.StringIO(),
+            sample_schema,
+            "Person",
+            items_property="items",
+        )
+
+
+@pytest.mark.parametrize("document", ["[]", "  [ ]  "])
+def test_annotate_stream_empty(plan, document):
+    fp_out = io.StringIO()
+    assert (
+        oasld.annotate_stream(io.StringIO(document), fp_out, sample_schema, "Person")
+        == 0
+    )
+    assert json.loads(fp_out.getvalue()) == {"@context": plan.context, "@graph": []}
+
+
+def test_annotate_stream_ndjson(plan):
+    fp_in = io.StringIO("\n".join(json.dumps(i) for i in ITEMS + [{}]) + "\n\n")
+    fp_out = io.StringIO()
+
+    count = oasld.annotate_stream(
+        fp_in,
+        fp_out,
+        sample_schema,
+        "Person",
+        input_format="ndjson",
+        output_format="ndjson",
+    )
+
+    assert count == len(ITEMS) + 1
+    lines = fp_out.getvalue().splitlines()
+    expected = [plan.annotate(i) for i in json.loads(json.dumps(ITEMS + [{}]))]
+    assert lines == [json.dumps(x) for x in expected]
+
+
+def test_annotate_stream_invalid_json():
+    with pytest.raises(ValueError):
+        oasld.annotate_stream(
+            io.StringIO('[{"email": '), io.StringIO(), sample_schema, "Person"
+        )
+
+
+@pytest.mark.parametrize(
+    "document, message",
+    [
+        ('[{"email": "x"}, 1]', "at index 1, found int"),
+        ('{"items": [[]]}', "at index 0, found list"),
+        ("[{}] [{}]", "Extra data after the JSON document: '\\['"),
+        ('{"items": []}}', "Extra data after the JSON document: '}'"),
+    ],
+)
+def test_annotate_stream_invalid_document(document, message):
+    with pytest.raises(ValueError, match=message):
+        oasld.annotate_stream(
+            io.StringIO(document),
+            io.StringIO(),
+            sample_schema,
+            "Person",
+            items_property="items" if document.startswith("{") else None,
+            buffer_size=3,
+        )
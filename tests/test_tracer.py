@@ -0,0 +1,82 @@
+import logging
+
+import oasld
+from oasld import Counters, CountersTracer, Tracer, sample_schema
+
+
+class Events(Tracer):
+    def __init__(self):
+        self.events = []
+
+    def resolve(self, ref, hit, seconds):
+        self.events.append(("resolve", ref, hit))
+
+    def merge_context(self, name):
+        self.events.append(("merge_context", name))
+
+    def property(self, name, key, seconds):
+        self.events.append(("property", name, key))
+
+    def instance(self, name, seconds, size):
+        self.events.append(("instance", name, size))
+
+
+def test_tracer_events():
+    tracer = Events()
+    instance = oasld.process_schema("Person", sample_schema, tracer=tracer)
+
+    assert tracer.events == [
+        ("merge_context", "Person"),
+        ("resolve", "#/BirthPlace", False),
+        ("merge_context", "#/BirthPlace"),
+        ("instance", "#/BirthPlace", 5),
+        ("property", "Person", "birthplace"),
+        ("resolve", "#/Person", False),
+        ("merge_context", "#/Person"),
+        ("instance", "#/Person", 2),
+        ("instance", "#/Person", 2),
+        ("property", "Person", "children"),
+        ("instance", "Person", len(instance.ld)),
+    ]
+
+
+def test_counters_tracer():
+    registry = Counters()
+    tracer = CountersTracer(registry)
+    for _ in range(3):
+        oasld.process_schema("Person", sample_schema, tracer=tracer)
+    oasld.compile(sample_schema, "Person").annotate({}, tracer=tracer)
+
+    values = registry.snapshot()
+    assert values["resolve.misses"] == 6
+    assert values["instance[Person].count"] == 4
+    assert values["instance[#/Person].count"] == 6
+    assert values["property[Person.children].count"] == 3
+    assert (
+        values["property[Person.children].seconds"]
+        >= values["property[Person.children].max"]
+        > 0
+    )
+    assert values["context.merges[#/BirthPlace]"] == 3
+
+    registry.reset()
+    assert registry.snapshot() == {}
+
+
+def test_counters_tracer_default_registry():
+    assert CountersTracer().registry is oasld.counters
+
+
+def test_debug_messages_are_lazy(caplog):
+    class Unprintable(dict):
+        def __str__(self):
+            raise AssertionError("The message must not be formatted.")
+
+        __repr__ = __str__
+
+    schema = {
+        "x-jsonld-context": {"@vocab": "https://example.org/"},
+        "properties": {"a": Unprintable()},
+    }
+    with caplog.at_level(logging.INFO, logger="oasld"):
+        oasld.Instance({"a": 1}, schema).process_instance(oasld.RefResolver({}))
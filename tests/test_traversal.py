@@ -0,0 +1,82 @@
+import sys
+
+import pytest
+
+import oasld
+from oasld import Instance, RefResolver, TraversalLimitError, sample_schema
+from oasld.core import _copy_json
+
+
+def _chain(depth):
+    instance = {"email": "mailto:0@example"}
+    node = instance
+    for i in range(depth):
+        node["children"] = [{"email": f"mailto:{i + 1}@example"}]
+        node = node["children"][0]
+    return instance
+
+
+def _process(instance, **limits):
+    i = Instance(instance, sample_schema["Person"])
+    i.process_instance(RefResolver(sample_schema), **limits)
+    return i
+
+
+def test_process_instance_deeper_than_recursion_limit():
+    depth = sys.getrecursionlimit() * 2
+    i = _process(_chain(depth))
+
+    node, levels = i.ld, 0
+    while node.get("children"):
+        assert node["@type"] == "Person"
+        node, levels = node["children"][0], levels + 1
+    assert levels == depth
+    assert node["@type"] == "Person"
+
+
+def test_process_instance_copies_instance():
+    instance = _chain(3)
+    shared = {"city": "Roma"}
+    instance["birthplace"] = shared
+    instance["children"].append({"email": "mailto:x@example"})
+
+    ld = _process(instance).ld
+    assert "@type" not in instance
+    assert ld["birthplace"] is not shared
+    assert ld["children"][1] == {"email": "mailto:x@example", "@type": "Person"}
+
+
+def test_copy_json_preserves_shared_entries():
+    shared = {"a": [1, 2]}
+    instance = {"x": shared, "y": [shared, "z"]}
+
+    copy = _copy_json(instance)
+    assert copy == instance
+    assert copy["x"] is copy["y"][0] is not shared
+    assert copy["x"]["a"] is not shared["a"]
+
+
+@pytest.mark.parametrize(
+    "limits",
+    [
+        {"max_depth": 4},
+        {"max_nodes": 5},
+    ],
+)
+def test_process_instance_limits(limits):
+    _process(_chain(4), **limits)
+    with pytest.raises(TraversalLimitError):
+        _process(_chain(5), **limits)
+
+
+def test_process_instance_max_nodes_counts_array_entries():
+    instance = {"children": [{"email": f"mailto:{i}@example"} for i in range(10)]}
+    _process(instance, max_nodes=11)
+    with pytest.raises(TraversalLimitError):
+        _process(instance, max_nodes=10)
+
+
+def test_process_schema_unchanged():
+    instance = oasld.process_schema("Person", sample_schema)
+    assert instance.ld["@context"]["birthplace"]["@context"]["city"] == "hasCity"
+    assert instance.ld["children"][0]["@type"] == "Person"
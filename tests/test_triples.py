@@ -0,0 +1,135 @@
+import json
+from pathlib import Path
+
+import pytest
+import rdflib.compare
+import yaml
+from rdflib import Graph, Literal, URIRef
+
+import oasld
+from oasld import sample_schema
+
+DATADIR = Path(__file__).parent
+SCHEMAS_YAML = yaml.safe_load((DATADIR.parent / "schemas.yaml").read_text())
+
+testfiles = [yaml.safe_load(x.read_text()) for x in DATADIR.glob("*.oas3.yaml")]
+testschemas = [
+    (f"#/components/schemas/{schema_name}", schema_content, f)
+    for f in testfiles
+    for schema_name, schema_content in f.get("components", {})
+    .get("schemas", {})
+    .items()
+    if schema_content.get("x-rdf")
+]
+
+
+def _isomorphic(triples):
+    g = Graph()
+    for triple in triples:
+        g.add(triple)
+    return rdflib.compare.to_isomorphic(g)
+
+
+def _jsonld_graph(ld):
+    g = Graph()
+    g.parse(data=json.dumps(ld), format="application/ld+json")
+    return rdflib.compare.to_isomorphic(g)
+
+
+@pytest.mark.parametrize("schema_name, schema_content, schemas", testschemas)
+def test_triples_oas_annotated_schemas(schema_name, schema_content, schemas):
+    plan = oasld.compile(schemas, schema_name)
+    example = schema_content["example"]
+
+    g = _isomorphic(plan.triples(example))
+    assert len(g) > 0
+    assert g == _jsonld_graph(plan.annotate(example))
+
+
+@pytest.mark.parametrize("schema_name", list(SCHEMAS_YAML))
+def test_triples_same_as_jsonld(schema_name):
+    plan = oasld.compile(SCHEMAS_YAML, schema_name, safe_mode=False)
+    example = SCHEMAS_YAML[schema_name]["example"]
+
+    assert _isomorphic(plan.triples(example)) == _jsonld_graph(plan.annotate(example))
+
+
+@pytest.mark.parametrize(
+    "context,instance",
+    [
+        (
+            {"@vocab": "https://schema.org/", "ex": "http://example.org/"},
+            {"ex:name": "a", "age": 3, "height": 1.5, "alive": True, "none": None},
+        ),
+        (
+            {
+                "@vocab": "https://schema.org/",
+                "@language": "it",
+                "name": {"@language": None},
+                "date": {
+                    "@id": "birthDate",
+                    "@type": "http://www.w3.org/2001/XMLSchema#date",
+                },
+            },
+            {"name": "Mario", "description": "Ciao", "date": "2000-01-01"},
+        ),
+        (
+            {"@vocab": "https://schema.org/", "items": {"@container": "@list"}},
+            {"items": ["a", "b", {"name": "c"}], "knows": [{"name": "d"}, ["e"]]},
+        ),
+        (
+            {
+                "@vocab": "https://schema.org/",
+                "@base": "http://example.org/a/b",
+                "id": "@id",
+            },
+            {
+                "id": "../c",
+                "url": {"@id": "d"},
+                "value": {"@value": "1", "@type": "Integer"},
+            },
+        ),
+        (
+            {
+                "@vocab": "https://schema.org/",
+                "color": {"@type": "@vocab"},
+                "Red": "http://example.org/red",
+            },
+            {
+                "color": "Red",
+                "other": {"@context": {"@vocab": "http://example.org/"}, "name": "x"},
+            },
+        ),
+    ],
+)
+def test_triples_context_features(context, instance):
+    schema = {"x-jsonld-context": context, "x-jsonld-type": "Thing"}
+    plan = oasld.compile({"S": schema}, "S")
+
+    assert _isomorphic(plan.triples(instance)) == _jsonld_graph(plan.annotate(instance))
+
+
+def test_to_ntriples():
+    plan = oasld.compile(sample_schema, "BirthPlace")
+    instance = {"city": 'Ro"ma\nCapitale', "province": "RM"}
+
+    nt = plan.to_ntriples(instance)
+    g = Graph()
+    g.parse(data=nt, format="nt")
+    assert (
+        None,
+        URIRef("https://w3id.org/italia/onto/CLV/hasCity"),
+        Literal('Ro"ma\nCapitale'),
+    ) in g
+    assert len(g) == 3
+
+    nq = plan.to_ntriples(instance, graph=URIRef("http://example.org/g"))
+    assert all(line.endswith("<http://example.org/g> .") for line in nq.splitlines())
+
+
+def test_triples_unsupported_context():
+    plan = oasld.compile(
+        {"S": {"x-jsonld-context": "http://example.org/context.jsonld"}}, "S"
+    )
+    with pytest.raises(NotImplementedError):
+        plan.triples({})
@@ -0,0 +1,154 @@
+import json
+from copy import deepcopy
+
+import jsonschema
+import pytest
+
+import oasld
+from benchmarks.synthetic import shapes
+from oasld import sample_schema
+from oasld.validate import compile_validating
+
+PERSON = sample_schema["Person"]["example"]
+
+SCHEMAS = {
+    "Order": {
+        "type": "object",
+        "x-jsonld-type": "Order",
+        "x-jsonld-context": {"@vocab": "https://w3id.org/order/"},
+        "required": ["id", "lines"],
+        "properties": {
+            "id": {"type": "string", "pattern": "^[0-9]+$"},
+            "status": {"enum": ["open", "closed"]},
+            "customer": {"$ref": "#/Person"},
+            "lines": {
+                "type": "array",
+                "minItems": 1,
+                "items": {"$ref": "#/Line"},
+            },
+            "note": {"allOf": [{"type": "string"}, {"maxLength": 5}]},
+        },
+    },
+    "Line": {
+        "type": "object",
+        "x-jsonld-type": "Line",
+        "additionalProperties": False,
+        "properties": {
+            "sku": {"type": "string"},
+            "quantity": {"type": "integer", "minimum": 1},
+        },
+    },
+    **deepcopy(sample_schema),
+}
+ORDER = {
+    "id": "42",
+    "status": "open",
+    "customer": PERSON,
+    "lines": [{"sku": "a", "quantity": 1}, {"sku": "b", "quantity": 2}],
+    "note": "ok",
+}
+INVALID_ORDERS = [
+    {},
+    {"id": 42, "lines": []},
+    {"id": "x", "status": "lost", "lines": [{"sku": 1, "quantity": 0, "extra": 1}]},
+    {
+        "id": "1",
+        "lines": [1, {"quantity": "1"}],
+        "customer": {"birthplace": {"city": 1}, "children": [{"email": 1}]},
+        "note": 1234567,
+    },
+    [],
+]
+
+
+def _errors(errors):
+    return [
+        (
+            e.message,
+            list(e.path),
+            list(e.schema_path),
+            e.validator,
+            e.validator_value,
+            e.instance,
+        )
+        for e in errors
+    ]
+
+
+def _two_pass(schemas, schema_name, instance, cls=jsonschema.Draft4Validator):
+    schema = schemas[schema_name]
+    resolver = jsonschema.RefResolver.from_schema(schemas)
+    errors = list(cls(schema, resolver=resolver).iter_errors(instance))
+    return oasld.compile(schemas, schema_name).annotate(instance), errors
+
+
+@pytest.mark.parametrize("instance", [ORDER, *INVALID_ORDERS])
+@pytest.mark.parametrize(
+    "cls", [jsonschema.Draft4Validator, jsonschema.Draft202012Validator]
+)
+def test_errors_match_jsonschema(instance, cls):
+    expected_ld, expected_errors = _two_pass(SCHEMAS, "Order", instance, cls)
+    plan = compile_validating(SCHEMAS, "Order", cls=cls)
+
+    ld, errors = plan.annotate_errors(instance)
+
+    assert _errors(errors) == _errors(expected_errors)
+    if isinstance(instance, dict):
+        assert ld == expected_ld
+
+
+def test_annotate_valid():
+    plan = compile_validating(SCHEMAS, "Order")
+    original = json.loads(json.dumps(ORDER))
+
+    ld = plan.annotate(ORDER)
+
+    assert ld == oasld.compile(SCHEMAS, "Order").annotate(ORDER)
+    assert ld["lines"][0]["@type"] == "Line"
+    assert ld["customer"]["birthplace"]["@type"] == (
+        "https://w3id.org/italia/onto/CLV/Feature"
+    )
+    assert ORDER == original
+
+
+def test_annotate_raises_first_error():
+    plan = compile_validating(SCHEMAS, "Order")
+    instance = INVALID_ORDERS[2]
+    with pytest.raises(jsonschema.ValidationError) as e:
+        plan.annotate(instance)
+    expected = jsonschema.Draft4Validator(
+        SCHEMAS["Order"], resolver=jsonschema.RefResolver.from_schema(SCHEMAS)
+    )
+    assert _errors([e.value]) == _errors([next(expected.iter_errors(instance))])
+
+
+def test_ref_siblings():
+    schemas = {
+        "A": {"$ref": "#/B", "type": "string"},
+        "B": {"type": "object", "x-jsonld-type": "B"},
+    }
+    for cls in (jsonschema.Draft4Validator, jsonschema.Draft202012Validator):
+        _, expected = _two_pass(schemas, "A", {}, cls)
+        _, errors = compile_validating(schemas, "A", cls=cls).annotate_errors({})
+        assert _errors(errors) == _errors(expected)
+
+
+@pytest.mark.parametrize(
+    "name,schemas,schema_name,instance", list(shapes()), ids=lambda x: ""
+)
+def test_synthetic_shapes(name, schemas, schema_name, instance):
+    expected_ld, expected_errors = _two_pass(schemas, schema_name, instance)
+    ld, errors = compile_validating(schemas, schema_name).annotate_errors(instance)
+
+    assert not errors and not expected_errors
+    assert ld == expected_ld
+
+
+def test_oas_document():
+    schemas = json.loads(json.dumps(SCHEMAS).replace('"#/', '"#/components/schemas/'))
+    document = {"components": {"schemas": schemas}}
+    ref = "#/components/schemas/Order"
+    plan = compile_validating(document, ref)
+    assert plan.annotate(ORDER)["@type"] == "Order"
+    _, errors = plan.annotate_errors(INVALID_ORDERS[3])
+    assert len(errors) == len(_two_pass(SCHEMAS, "Order", INVALID_ORDERS[3])[1])
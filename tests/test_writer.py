@@ -0,0 +1,106 @@
+import io
+import json
+
+import pytest
+
+import oasld
+from benchmarks import synthetic
+from oasld import Instance, RefResolver, sample_schema
+from oasld.writer import compile_writer
+
+PERSON = sample_schema["Person"]["example"]
+
+
+@pytest.mark.parametrize(
+    "instance",
+    [
+        PERSON,
+        {"@type": "Other", **PERSON},
+        {"@context": "https://example/c", "email": "mailto:a@example"},
+        {"children": [{"email": "mailto:b@example"}, "mailto:c@example", None]},
+        {"givenName": "Zoë", "age": float("nan"), "birthplace": {}},
+        {},
+    ],
+)
+@pytest.mark.parametrize(
+    "kwargs",
+    [{}, {"with_context": False}, {"context_url": "https://example/ctx.jsonld"}],
+)
+def test_dumps_same_bytes(instance, kwargs):
+    plan = oasld.compile(sample_schema, "Person")
+    writer = compile_writer(sample_schema, "Person")
+
+    assert (
+        writer.dumps(instance, **kwargs)
+        == json.dumps(plan.annotate(instance, **kwargs)).encode()
+    )
+
+
+def test_dumps_same_bytes_as_instance():
+    i = Instance(PERSON, sample_schema["Person"])
+    i.process_instance(resolver=RefResolver(sample_schema))
+    writer = compile_writer(sample_schema, "Person")
+
+    assert writer.dumps(PERSON) == json.dumps(i.ld).encode()
+
+
+def test_dump():
+    writer = compile_writer(sample_schema, "Person")
+    fp = io.BytesIO()
+
+    assert writer.dump(PERSON, fp) == len(fp.getvalue())
+    assert fp.getvalue() == writer.dumps(PERSON)
+
+
+def test_dumps_does_not_modify_instance():
+    instance = json.loads(json.dumps(PERSON))
+    writer = compile_writer(sample_schema, "Person")
+
+    writer.dumps(instance)
+
+    assert instance == PERSON
+
+
+def test_dumps_not_serializable():
+    writer = compile_writer(sample_schema, "Person")
+
+    with pytest.raises(TypeError):
+        writer.dumps({"givenName": object()})
+
+
+def test_dumps_circular():
+    writer = compile_writer(sample_schema, "Person")
+    instance = {"givenName": "Alice"}
+    instance["knows"] = [instance]
+
+    with pytest.raises(ValueError, match="Circular reference"):
+        json.dumps(instance)
+    with pytest.raises(ValueError, match="Circular reference"):
+        writer.dumps(instance)
+
+
+def test_dumps_after_errors():
+    """The encoder forgets the objects of a failed call."""
+    writer = compile_writer(sample_schema, "Person")
+    nested = {"name": object()}
+    instance = {"givenName": "Alice", "other": [nested]}
+
+    with pytest.raises(TypeError):
+        writer.dumps(instance)
+    nested["name"] = "x"
+    assert (
+        writer.dumps(instance)
+        == json.dumps(
+            oasld.compile(sample_schema, "Person").annotate(instance)
+        ).encode()
+    )
+
+
+@pytest.mark.parametrize(
+    "name, schemas, schema_name, instance", list(synthetic.shapes())
+)
+def test_dumps_synthetic_shapes(name, schemas, schema_name, instance):
+    plan = oasld.compile(schemas, schema_name, safe_mode=False)
+    writer = oasld.compile_writer(schemas, schema_name, safe_mode=False)
+
+    assert writer.dumps(instance) == json.dumps(plan.annotate(instance)).encode()